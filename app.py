@@ -1,9 +1,5 @@
 import os
 import logging
-from flask import Flask
-from flask_smorest import Api
-from services.api_service import get_app, initialize_api
-from services.init_service import initialize_app
 
 # Configure logging
 logging.basicConfig(
@@ -18,33 +14,53 @@ CONFIG_PATH = os.environ.get('CONFIG_PATH', './config/config.yml')
 SYNC_INTERVAL_MINUTES = int(os.environ.get('SYNC_INTERVAL_MINUTES', 15))
 NOTIFY_INTERVAL_SECONDS = int(os.environ.get('NOTIFY_INTERVAL_SECONDS', 60))
 
-# Get Flask app instance
-app = get_app()
+_app = None
 
-# Configure Flask-Smorest API
-app.config["API_TITLE"] = "ICS Bot API"
-app.config["API_VERSION"] = "v1"
-app.config["OPENAPI_VERSION"] = "3.0.2"
-app.config["OPENAPI_URL_PREFIX"] = "/api"
-app.config["OPENAPI_REDOC_PATH"] = "/redoc"
-app.config["OPENAPI_SWAGGER_UI_PATH"] = "/swagger-ui"
-app.config["OPENAPI_SWAGGER_UI_URL"] = "https://cdn.jsdelivr.net/npm/swagger-ui-dist/"
-
-# Initialize Flask-Smorest API
-api = Api(app)
-
-# Initialize API endpoints
-initialize_api(api)
+def create_app():
+    """Build the Flask app with Flask-Smorest and all API endpoints registered"""
+    from flask_smorest import Api
+    from services.api_service import get_app, initialize_api
+    from services.profiling import init_profiling
+    
+    # Get Flask app instance
+    app = get_app()
+    
+    # Configure Flask-Smorest API
+    app.config["API_TITLE"] = "ICS Bot API"
+    app.config["API_VERSION"] = "v1"
+    app.config["OPENAPI_VERSION"] = "3.0.2"
+    app.config["OPENAPI_URL_PREFIX"] = "/api"
+    app.config["OPENAPI_REDOC_PATH"] = "/redoc"
+    app.config["OPENAPI_SWAGGER_UI_PATH"] = "/swagger-ui"
+    app.config["OPENAPI_SWAGGER_UI_URL"] = "https://cdn.jsdelivr.net/npm/swagger-ui-dist/"
+    
+    # Initialize Flask-Smorest API
+    api = Api(app)
+    
+    # Initialize API endpoints
+    initialize_api(api)
+    
+    # Opt-in per-request profiling (Server-Timing headers, cProfile dumps)
+    init_profiling(app)
+    
+    logger.debug(f"App has {len(app.view_functions)} view functions")
+    return app
 
-# Print debug info
-print(f"App has {len(app.view_functions)} view functions")
-for endpoint, view_func in app.view_functions.items():
-    print(f"  {endpoint} -> {view_func}")
+def __getattr__(name):
+    """Build the app lazily on first access of app.app, not at import time"""
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == '__main__':
+    from services.init_service import initialize_app
+    
     # Initialize application
     initialize_app(SYNC_INTERVAL_MINUTES, NOTIFY_INTERVAL_SECONDS)
     
     # Run Flask app
-    app.run(host='0.0.0.0', port=5800, debug=False)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=5800, debug=False)
\ No newline at end of file
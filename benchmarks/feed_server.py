@@ -0,0 +1,47 @@
+"""
+Local HTTP stand-in that serves generated ICS feeds from memory.
+"""
+
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class FeedServer:
+    """Serve {path: ics_content} on 127.0.0.1 in a background thread"""
+    
+    def __init__(self, feeds: dict):
+        self.feeds = {path: content.encode('utf-8') for path, content in feeds.items()}
+        feeds_by_path = self.feeds
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = feeds_by_path.get(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/calendar; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+    
+    def url(self, path: str) -> str:
+        return self.base_url + path
+    
+    def __enter__(self):
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,85 @@
+"""
+Synthetic ICS feed generator for the ICS-Gate benchmarks.
+
+Feeds contain a mix of plain, all-day, recurring and timezone-qualified
+events with optionally large descriptions. Start times are spread around
+the current time so that part of every feed falls into the notification
+window used by get_pending_events.
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+TIMEZONES = ['Europe/Berlin', 'America/New_York', 'Asia/Tokyo', 'Europe/Moscow']
+
+def _format_utc(dt: datetime) -> str:
+    return dt.strftime('%Y%m%dT%H%M%SZ')
+
+def _format_local(dt: datetime) -> str:
+    return dt.strftime('%Y%m%dT%H%M%S')
+
+def _fold(line: str) -> str:
+    """Fold a content line at 75 octets as required by RFC 5545"""
+    if len(line) <= 75:
+        return line
+    parts = [line[:75]]
+    line = line[75:]
+    while line:
+        parts.append(' ' + line[:74])
+        line = line[74:]
+    return '\r\n'.join(parts)
+
+def generate_ics(calendar_index: int, events: int, description_size: int = 200,
+                 pending_ratio: float = 0.1, seed: int = None, now: datetime = None) -> str:
+    """Generate one ICS feed with the given number of events"""
+    rng = random.Random(seed if seed is not None else calendar_index)
+    now = now or datetime.now(timezone.utc)
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:-//ICS-Gate Benchmarks//Calendar {calendar_index}//EN',
+    ]
+    
+    for event_index in range(events):
+        if rng.random() < pending_ratio:
+            # Inside the default 24 hour notification window
+            start = now + timedelta(minutes=rng.randint(5, 23 * 60))
+        else:
+            start = now + timedelta(days=rng.randint(2, 60), minutes=rng.randint(0, 1439))
+        start = start.replace(second=0, microsecond=0)
+        end = start + timedelta(minutes=rng.choice([15, 30, 60, 90]))
+        kind = event_index % 10
+        
+        lines.append('BEGIN:VEVENT')
+        lines.append(f'UID:bench-{calendar_index}-{event_index}@icsgate.test')
+        lines.append(f'DTSTAMP:{_format_utc(now)}')
+        if kind == 0:
+            # All-day event
+            lines.append(f'DTSTART;VALUE=DATE:{start.strftime("%Y%m%d")}')
+            lines.append(f'DTEND;VALUE=DATE:{(start + timedelta(days=1)).strftime("%Y%m%d")}')
+        elif kind in (1, 2):
+            # Timezone-qualified event
+            tzid = TIMEZONES[event_index % len(TIMEZONES)]
+            lines.append(f'DTSTART;TZID={tzid}:{_format_local(start)}')
+            lines.append(f'DTEND;TZID={tzid}:{_format_local(end)}')
+        else:
+            lines.append(f'DTSTART:{_format_utc(start)}')
+            lines.append(f'DTEND:{_format_utc(end)}')
+        if kind == 3:
+            # Recurring event
+            lines.append('RRULE:FREQ=WEEKLY;COUNT=10')
+        lines.append(f'SUMMARY:Benchmark event {event_index} of calendar {calendar_index}')
+        description = ('Lorem ipsum dolor sit amet ' * (description_size // 27 + 1))[:description_size]
+        lines.append(_fold(f'DESCRIPTION:{description}'))
+        lines.append(f'LOCATION:Room {rng.randint(1, 500)}')
+        lines.append('END:VEVENT')
+    
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(lines) + '\r\n'
+
+def generate_feeds(calendars: int, events: int, **kwargs) -> dict:
+    """Generate {path: ics_content} for N calendars with M events each"""
+    return {
+        f'/calendars/{index}.ics': generate_ics(index, events, **kwargs)
+        for index in range(calendars)
+    }
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the ICS-Gate sync, parse and pending-query hot paths.
+
+Generates N synthetic calendars with M events each, serves them from a
+local HTTP stand-in and measures parse_ics_content, sync_calendar,
+sync_all_calendars, get_pending_events and GET /events/pending against a
+throwaway database. Results can be saved as a JSON baseline and compared
+on later runs so that regressions show up. The baseline records the commit
+it was taken at; re-record it in the same change whenever a change
+intentionally alters a measured path (ICS parsing, the sync write path, the
+event schema or the pending query), or when the default parameters or the
+benchmark machine change, otherwise later comparisons are meaningless.
+
+Usage:
+    python benchmarks/run_benchmarks.py --calendars 20 --events 500
+    python benchmarks/run_benchmarks.py --save-baseline
+    python benchmarks/run_benchmarks.py --compare
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import logging
+import argparse
+import platform
+import subprocess
+import resource
+import tempfile
+import contextlib
+from typing import Callable, Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.ics_generator import generate_feeds
+from benchmarks.feed_server import FeedServer
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+BENCHMARK_API_KEY = 'benchmark-key'
+
+def setup_logging(verbose: bool = False):
+    """Setup logging configuration"""
+    logging.basicConfig(
+        level=logging.INFO if verbose else logging.WARNING,
+        format='[%(asctime)s] %(levelname)s: %(message)s'
+    )
+    return logging.getLogger(__name__)
+
+def peak_rss_kb() -> int:
+    """Peak resident set size of this process in KiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB on Linux
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def current_commit() -> str:
+    """Short hash of the checked-out commit, or None outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def measure(name: str, func: Callable, iterations: int, items: int = 1,
+            setup: Callable = None) -> Dict:
+    """Time func over a number of iterations and summarize the samples.
+    
+    items is the number of units of work (events, calendars, requests) done
+    by one call and is used to compute throughput. setup runs before each
+    iteration and is not timed. One untimed warmup call is made first.
+    """
+    samples = []
+    # Library code still prints on every connection; keep it off the terminal
+    with contextlib.redirect_stdout(io.StringIO()) as sink:
+        if setup:
+            setup()
+        func()
+        for _ in range(iterations):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+            sink.seek(0)
+            sink.truncate()
+    
+    total = sum(samples)
+    return {
+        'name': name,
+        'iterations': iterations,
+        'items_per_iteration': items,
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 3),
+        'mean_ms': round(total / iterations * 1000, 3),
+        'throughput_per_s': round(items * iterations / total, 1) if total else None,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+def run_benchmarks(calendars: int, events: int, iterations: int,
+                   description_size: int, pending_ratio: float) -> Dict:
+    """Run every benchmark against a temporary database and return the results"""
+    os.environ['ICS_GATE_API_KEY'] = BENCHMARK_API_KEY
+    
+    from services.database import set_db_path, init_db, create_user, create_calendar
+    from services.database import get_calendars, get_pending_events, get_db_connection
+    from services.ics_parser import parse_ics_content
+    from services.calendar_service import sync_calendar, sync_all_calendars
+    
+    feeds = generate_feeds(calendars, events, description_size=description_size,
+                           pending_ratio=pending_ratio)
+    results = []
+    
+    with tempfile.TemporaryDirectory() as temp_dir, FeedServer(feeds) as server:
+        set_db_path(os.path.join(temp_dir, 'benchmark.db'))
+        with contextlib.redirect_stdout(io.StringIO()):
+            init_db()
+            for index, path in enumerate(feeds):
+                user = create_user(f'bench_user_{index}')
+                create_calendar(user.id, server.url(path))
+        
+        def reset_sync_hashes():
+            conn = get_db_connection()
+            conn.execute('UPDATE calendars SET sync_hash = NULL')
+            conn.commit()
+            conn.close()
+        
+        first_feed = next(iter(feeds.values()))
+        results.append(measure('parse_ics_content', lambda: parse_ics_content(first_feed),
+                               iterations, items=events))
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            calendar = get_calendars()[0]._replace(sync_hash=None)
+        results.append(measure('sync_calendar', lambda: sync_calendar(calendar),
+                               iterations, items=events))
+        
+        results.append(measure('sync_calendar_unchanged',
+                               lambda: sync_calendar(get_calendars()[0]), iterations, items=1))
+        
+        results.append(measure('sync_all_calendars', sync_all_calendars, iterations,
+                               items=calendars * events, setup=reset_sync_hashes))
+        
+        results.append(measure('get_pending_events', get_pending_events, iterations, items=1))
+        results.append(measure('get_pending_events_user',
+                               lambda: get_pending_events('bench_user_0'), iterations, items=1))
+        
+        from app import create_app
+        client = create_app().test_client()
+        headers = {'X-API-Key': BENCHMARK_API_KEY}
+        
+        def fetch_pending():
+            response = client.get('/events/pending', headers=headers)
+            assert response.status_code == 200, response.status_code
+        
+        results.append(measure('GET /events/pending', fetch_pending, iterations, items=1))
+    
+    return {
+        'parameters': {
+            'calendars': calendars,
+            'events': events,
+            'iterations': iterations,
+            'description_size': description_size,
+            'pending_ratio': pending_ratio,
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'commit': current_commit(),
+        },
+        'results': results,
+    }
+
+def compare_to_baseline(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a description of every benchmark whose p50 regressed beyond tolerance"""
+    if baseline.get('parameters') != report['parameters']:
+        logging.getLogger(__name__).warning("Baseline was recorded with different parameters")
+    commit = baseline.get('environment', {}).get('commit')
+    print(f"Comparing with the baseline recorded at {commit or 'an unknown commit'}")
+    
+    previous = {result['name']: result for result in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        before = previous.get(result['name'])
+        if not before or not before['p50_ms']:
+            continue
+        ratio = result['p50_ms'] / before['p50_ms']
+        result['p50_vs_baseline'] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append(f"{result['name']}: p50 {before['p50_ms']}ms -> "
+                               f"{result['p50_ms']}ms ({ratio:.2f}x)")
+    return regressions
+
+def print_report(report: Dict):
+    """Print the results as a table"""
+    params = report['parameters']
+    print(f"{params['calendars']} calendars x {params['events']} events, "
+          f"{params['iterations']} iterations")
+    print(f"{'benchmark':<26}{'p50 ms':>10}{'p99 ms':>10}{'items/s':>12}{'peak RSS KiB':>14}{'vs base':>9}")
+    for result in report['results']:
+        ratio = result.get('p50_vs_baseline')
+        print(f"{result['name']:<26}{result['p50_ms']:>10}{result['p99_ms']:>10}"
+              f"{result['throughput_per_s']:>12}{result['peak_rss_kb']:>14}"
+              f"{(str(ratio) + 'x') if ratio else '-':>9}")
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='ICS-Gate hot path benchmarks')
+    parser.add_argument('--calendars', type=int, default=10, help='Number of synthetic calendars')
+    parser.add_argument('--events', type=int, default=200, help='Events per calendar')
+    parser.add_argument('--iterations', type=int, default=20, help='Timed iterations per benchmark')
+    parser.add_argument('--description-size', type=int, default=2000,
+                        help='Characters per event description')
+    parser.add_argument('--pending-ratio', type=float, default=0.1,
+                        help='Fraction of events inside the notification window')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH, help='Baseline JSON path')
+    parser.add_argument('--save-baseline', action='store_true', help='Store the results as the baseline')
+    parser.add_argument('--compare', action='store_true',
+                        help='Compare with the baseline and fail on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed p50 slowdown before a regression is reported')
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    parser.add_argument('--verbose', action='store_true', help='Show application logging')
+    
+    args = parser.parse_args()
+    logger = setup_logging(args.verbose)
+    
+    report = run_benchmarks(args.calendars, args.events, args.iterations,
+                            args.description_size, args.pending_ratio)
+    
+    regressions = []
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            logger.error(f"Baseline {args.baseline} not found, run with --save-baseline first")
+            sys.exit(2)
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.tolerance)
+    
+    print_report(report)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    
+    if regressions:
+        print("Regressions against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
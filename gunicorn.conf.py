@@ -0,0 +1,55 @@
+"""
+Gunicorn configuration for production serving of ICS-Gate.
+
+The master runs migrations and config seeding once before forking the API
+workers, then starts the dedicated scheduler process (scheduler.py). Set
+ICS_GATE_RUN_SCHEDULER=0 when the scheduler runs in its own container.
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+
+# Server settings
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5800')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+accesslog = '-'
+
+# Application settings
+SYNC_INTERVAL_MINUTES = int(os.environ.get('SYNC_INTERVAL_MINUTES', 15))
+NOTIFY_INTERVAL_SECONDS = int(os.environ.get('NOTIFY_INTERVAL_SECONDS', 60))
+RUN_SCHEDULER = os.environ.get('ICS_GATE_RUN_SCHEDULER', '1') != '0'
+SCHEDULER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scheduler.py')
+
+# Workers and the scheduler process share their metrics through this directory
+# (inherited by the scheduler through the environment), so /metrics on any
+# worker serves the totals
+os.environ.setdefault('METRICS_MULTIPROC_DIR', '/tmp/icsgate-metrics')
+
+def on_starting(server):
+    """Prepare the database once in the master, before any worker starts"""
+    from services.metrics import clear_multiprocess_dir
+    clear_multiprocess_dir()
+    
+    from services.init_service import prepare_app
+    prepare_app(SYNC_INTERVAL_MINUTES, NOTIFY_INTERVAL_SECONDS)
+
+def when_ready(server):
+    """Start the dedicated scheduler process"""
+    server.scheduler_process = None
+    if RUN_SCHEDULER:
+        server.scheduler_process = subprocess.Popen([sys.executable, SCHEDULER_SCRIPT])
+        server.log.info(f"Started scheduler process {server.scheduler_process.pid}")
+
+def on_exit(server):
+    """Stop the scheduler process together with the master"""
+    process = getattr(server, 'scheduler_process', None)
+    if process is not None and process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
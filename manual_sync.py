@@ -1,19 +1,26 @@
 #!/usr/bin/env python3
 """
 Manual calendar synchronization script for ICS-Gate.
-This script allows manual triggering of calendar synchronization for debugging purposes.
+This script allows manual triggering of calendar synchronization for debugging purposes,
+and backfilling many calendars after an outage with parallel, resumable runs.
 """
 
 import sys
 import os
+import re
+import time
 import logging
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 
 # Add the services directory to the path so we can import modules
 sys.path.append(os.path.join(os.path.dirname(__file__), 'services'))
 
-from services.database import init_db, get_calendars, get_calendar_by_id
-from services.calendar_service import sync_calendar
+from services.database import init_db, get_calendars, get_calendar_by_id, get_sync_history_summary
+from services.calendar_service import sync_calendar, sync_feed, preview_calendar_sync, group_calendars_by_feed
+from services.calendar_service import SyncResult
 
 def setup_logging():
     """Setup logging configuration"""
@@ -23,7 +30,116 @@ def setup_logging():
     )
     return logging.getLogger(__name__)
 
-def sync_specific_calendar(calendar_id):
+def parse_since(value):
+    """Parse --since as a duration (30m, 12h, 2d) or an ISO timestamp into a cutoff datetime"""
+    match = re.fullmatch(r'(\d+)([smhd])', value.strip())
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        seconds = amount * {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[unit]
+        return datetime.now() - timedelta(seconds=seconds)
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid --since value {value!r}, use e.g. 30m, 12h, 2d or an ISO timestamp")
+
+def select_calendars(calendars, since=None, failed_only=False):
+    """Filter calendars by their sync history.
+    
+    since keeps calendars without a successful sync at or after the cutoff;
+    failed_only keeps calendars whose latest recorded sync failed.
+    """
+    if since is None and not failed_only:
+        return calendars
+    
+    history = get_sync_history_summary()
+    selected = []
+    for calendar in calendars:
+        last_success_at, last_failed = history.get(calendar.id, (None, False))
+        if failed_only and not last_failed:
+            continue
+        if since is not None and last_success_at and datetime.fromisoformat(last_success_at) >= since:
+            continue
+        selected.append(calendar)
+    return selected
+
+class Checkpoint:
+    """Append-only file of finished calendar IDs, so an interrupted run can resume"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.completed = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2 and parts[1] == 'ok':
+                        self.completed.add(int(parts[0]))
+        self._file = open(path, 'a')
+    
+    def record(self, calendar_id, success):
+        with self._lock:
+            self._file.write(f"{calendar_id} {'ok' if success else 'failed'}\n")
+            self._file.flush()
+            if success:
+                self.completed.add(calendar_id)
+    
+    def close(self):
+        self._file.close()
+
+class Progress:
+    """Single-line progress bar with throughput on stderr"""
+    
+    def __init__(self, total, stream=None, width=30):
+        self.total = total
+        self.stream = stream or sys.stderr
+        self.width = width
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self.interactive = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self._lock = threading.Lock()
+    
+    def update(self, success):
+        with self._lock:
+            self.done += 1
+            if not success:
+                self.failed += 1
+            if self.interactive or self.done == self.total:
+                self.stream.write(('\r' if self.interactive else '') + self.render())
+                if self.done == self.total:
+                    self.stream.write('\n')
+                self.stream.flush()
+    
+    def render(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        rate = self.done / elapsed
+        fraction = self.done / self.total if self.total else 1.0
+        filled = int(self.width * fraction)
+        eta = (self.total - self.done) / rate if rate else 0
+        return (f"[{'#' * filled}{'.' * (self.width - filled)}] {self.done}/{self.total} "
+                f"{fraction:6.1%} {rate:6.2f} cal/s ok {self.done - self.failed} failed {self.failed} "
+                f"ETA {int(eta) // 60}m{int(eta) % 60:02d}s")
+
+def preview_calendar(calendar):
+    """Download and diff one calendar without writing; returns True if the feed could be read"""
+    logger = logging.getLogger(__name__)
+    try:
+        preview = preview_calendar_sync(calendar)
+    except Exception as e:
+        logger.error(f"[dry-run] Calendar {calendar.id}: download failed: {e}")
+        return False
+    
+    if preview['unchanged']:
+        logger.info(f"[dry-run] Calendar {calendar.id}: unchanged ({preview['bytes']} bytes)")
+    else:
+        changes = preview['changes']
+        logger.info(f"[dry-run] Calendar {calendar.id}: {preview['events']} events, "
+                    f"would insert {changes.inserted}, update {changes.updated}, delete {changes.deleted} "
+                    f"({preview['bytes']} bytes)")
+    return True
+
+def sync_specific_calendar(calendar_id, dry_run=False):
     """Sync a specific calendar by ID"""
     logger = logging.getLogger(__name__)
     
@@ -36,6 +152,9 @@ def sync_specific_calendar(calendar_id):
         logger.error(f"Calendar with ID {calendar_id} not found")
         return False
     
+    if dry_run:
+        return preview_calendar(calendar)
+    
     # Sync the calendar
     logger.info(f"Manually syncing calendar {calendar_id}")
     success = sync_calendar(calendar)
@@ -47,29 +166,66 @@ def sync_specific_calendar(calendar_id):
     
     return success
 
-def sync_all_calendars_manual():
-    """Sync all calendars manually"""
+def sync_all_calendars_manual(workers=1, since=None, failed_only=False, checkpoint_path=None,
+                              dry_run=False, show_progress=True):
+    """Sync all calendars manually, optionally in parallel and resumable from a checkpoint"""
     logger = logging.getLogger(__name__)
     
     # Initialize database
     init_db()
     
     # Get all calendars
-    calendars = get_calendars()
+    calendars = select_calendars(get_calendars(), since, failed_only)
+    
+    checkpoint = Checkpoint(checkpoint_path) if checkpoint_path and not dry_run else None
+    if checkpoint and checkpoint.completed:
+        before = len(calendars)
+        calendars = [calendar for calendar in calendars if calendar.id not in checkpoint.completed]
+        logger.info(f"Resuming from {checkpoint_path}: skipping {before - len(calendars)} finished calendars")
+    
     if not calendars:
         logger.info("No calendars found to sync")
+        if checkpoint:
+            checkpoint.close()
         return True
     
-    logger.info(f"Found {len(calendars)} calendars to sync")
+    logger.info(f"Found {len(calendars)} calendars to {'preview' if dry_run else 'sync'} with {workers} workers")
     
+    # A sync downloads each feed once for all of its calendars; a preview diffs one calendar
+    if dry_run:
+        jobs = [[calendar] for calendar in calendars]
+        def sync(job):
+            return {job[0].id: SyncResult(preview_calendar(job[0]))}
+    else:
+        jobs = group_calendars_by_feed(calendars)
+        sync = sync_feed
+    progress = Progress(len(calendars)) if show_progress else None
     success_count = 0
-    for calendar in calendars:
-        logger.info(f"Syncing calendar {calendar.id} from {calendar.url}")
-        if sync_calendar(calendar):
-            success_count += 1
-            logger.info(f"Calendar {calendar.id} synced successfully")
-        else:
-            logger.error(f"Failed to sync calendar {calendar.id}")
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {executor.submit(sync, job): job for job in jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to sync calendars {[calendar.id for calendar in job]}: {e}")
+                    results = {}
+                
+                for calendar in job:
+                    success = results.get(calendar.id, SyncResult(False)).success
+                    if success:
+                        success_count += 1
+                    else:
+                        logger.error(f"Failed to sync calendar {calendar.id}")
+                    if checkpoint:
+                        checkpoint.record(calendar.id, success)
+                    if progress:
+                        progress.update(success)
+    finally:
+        if checkpoint:
+            checkpoint.close()
     
     logger.info(f"Manual sync complete: {success_count}/{len(calendars)} successful")
     return success_count == len(calendars)
@@ -81,6 +237,13 @@ def main():
     parser = argparse.ArgumentParser(description='Manual calendar synchronization for ICS-Gate')
     parser.add_argument('--calendar-id', type=int, help='Sync specific calendar by ID')
     parser.add_argument('--all', action='store_true', help='Sync all calendars')
+    parser.add_argument('--workers', type=int, default=1, help='Number of calendars fetched concurrently (with --all)')
+    parser.add_argument('--since', type=parse_since,
+                        help='Only calendars without a successful sync since this time (30m, 12h, 2d or ISO timestamp)')
+    parser.add_argument('--failed-only', action='store_true', help='Only calendars whose latest sync failed')
+    parser.add_argument('--checkpoint', help='Checkpoint file; finished calendars are skipped when re-run')
+    parser.add_argument('--dry-run', action='store_true', help='Download and diff calendars without writing')
+    parser.add_argument('--no-progress', action='store_true', help='Do not show the progress bar')
     
     args = parser.parse_args()
     
@@ -91,9 +254,16 @@ def main():
     
     # Execute sync based on arguments
     if args.calendar_id:
-        success = sync_specific_calendar(args.calendar_id)
+        success = sync_specific_calendar(args.calendar_id, dry_run=args.dry_run)
     elif args.all:
-        success = sync_all_calendars_manual()
+        success = sync_all_calendars_manual(
+            workers=args.workers,
+            since=args.since,
+            failed_only=args.failed_only,
+            checkpoint_path=args.checkpoint,
+            dry_run=args.dry_run,
+            show_progress=not args.no_progress
+        )
     else:
         parser.print_help()
         return 1
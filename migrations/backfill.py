@@ -0,0 +1,103 @@
+import os
+import time
+import logging
+from typing import Callable
+from services.database import retry_on_locked
+from migrations.migration_manager import migration_connection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Global variables
+BACKFILL_BATCH_SIZE = int(os.environ.get('BACKFILL_BATCH_SIZE', 1000))
+BACKFILL_PAUSE_SECONDS = float(os.environ.get('BACKFILL_PAUSE_SECONDS', 0.05))
+
+def init_checkpoint_table(conn=None):
+    """Initialize the migration_checkpoints table"""
+    with migration_connection(conn) as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS migration_checkpoints (
+                name TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL DEFAULT 0,
+                completed BOOLEAN NOT NULL DEFAULT FALSE,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+class BatchedMigration:
+    """A data migration that processes a table in resumable batches of rows.
+    
+    Rows are visited in id order. Each batch runs in its own short
+    transaction together with the checkpoint update, so the write lock is
+    only held for one batch at a time and an interrupted run resumes after
+    the last committed batch.
+    
+    process_batch(conn, first_id, last_id) handles the rows with ids in
+    [first_id, last_id] and returns the number of rows it changed.
+    """
+    
+    def __init__(self, name: str, table: str, process_batch: Callable,
+                 batch_size: int = None, pause_seconds: float = None):
+        self.name = name
+        self.table = table
+        self.process_batch = process_batch
+        self.batch_size = batch_size or BACKFILL_BATCH_SIZE
+        self.pause_seconds = BACKFILL_PAUSE_SECONDS if pause_seconds is None else pause_seconds
+    
+    def get_checkpoint(self, conn=None):
+        """Get (last_id, completed) for this migration"""
+        with migration_connection(conn) as conn:
+            init_checkpoint_table(conn)
+            row = conn.execute(
+                'SELECT last_id, completed FROM migration_checkpoints WHERE name = ?',
+                (self.name,)
+            ).fetchone()
+        return (row[0], bool(row[1])) if row else (0, False)
+    
+    @retry_on_locked
+    def run_batch(self, last_id: int, conn=None):
+        """Process the next batch after last_id; returns (new_last_id, changed) or None when done"""
+        with migration_connection(conn) as conn:
+            rows = conn.execute(
+                f'SELECT id FROM {self.table} WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, self.batch_size)
+            ).fetchall()
+            
+            if not rows:
+                conn.execute('''
+                    INSERT INTO migration_checkpoints (name, last_id, completed) VALUES (?, ?, TRUE)
+                    ON CONFLICT(name) DO UPDATE SET completed = TRUE, updated_at = CURRENT_TIMESTAMP
+                ''', (self.name, last_id))
+                return None
+            
+            first_id, batch_last_id = rows[0][0], rows[-1][0]
+            changed = self.process_batch(conn, first_id, batch_last_id) or 0
+            conn.execute('''
+                INSERT INTO migration_checkpoints (name, last_id) VALUES (?, ?)
+                ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id, updated_at = CURRENT_TIMESTAMP
+            ''', (self.name, batch_last_id))
+            return batch_last_id, changed
+    
+    def run(self, conn=None):
+        """Run (or resume) the migration until every row has been processed"""
+        last_id, completed = self.get_checkpoint(conn)
+        if completed:
+            logger.info(f"Backfill {self.name} already completed")
+            return
+        
+        logger.info(f"Starting backfill {self.name} on {self.table} from id {last_id}")
+        batches = 0
+        total_changed = 0
+        while True:
+            result = self.run_batch(last_id, conn)
+            if result is None:
+                break
+            last_id, changed = result
+            batches += 1
+            total_changed += changed
+            
+            # Give other writers a chance to take the lock between batches
+            if self.pause_seconds:
+                time.sleep(self.pause_seconds)
+        
+        logger.info(f"Completed backfill {self.name}: {batches} batches, {total_changed} rows changed")
@@ -1,24 +1,19 @@
 import logging
-from services.database import get_db_connection
+from migrations.migration_manager import migration_connection
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def run():
+def run(conn=None):
     logger.info(f"Starting {__file__} migration")
     
-    conn = get_db_connection()
-    cursor = conn.cursor()    
     try:
-        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_calendars_events_unique ON events (calendar_id, uid)')
-        conn.commit()
+        with migration_connection(conn) as conn:
+            conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_calendars_events_unique ON events (calendar_id, uid)')
         logger.info("Completed idx_calendars_events_unique migration")
         
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error during migration: {e}")
         raise
-    finally:
-        conn.close()
     
-    logger.info(f"Completed {__file__} migration")
\ No newline at end of file
+    logger.info(f"Completed {__file__} migration")
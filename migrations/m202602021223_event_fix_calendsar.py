@@ -1,24 +1,31 @@
 import logging
-from services.database import get_db_connection
+from migrations.backfill import BatchedMigration
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def run():
+# Processed in resumable batches outside the schema migration transaction
+ONLINE = True
+
+def delete_orphan_events(conn, first_id: int, last_id: int) -> int:
+    """Delete events in the id range whose calendar no longer exists"""
+    cursor = conn.execute('''
+        DELETE FROM events
+        WHERE id BETWEEN ? AND ?
+          AND calendar_id NOT IN (SELECT id FROM calendars)
+    ''', (first_id, last_id))
+    return cursor.rowcount
+
+BACKFILL = BatchedMigration("m202602021223_event_fix_calendsar", "events", delete_orphan_events)
+
+def run(conn=None):
     logger.info(f"Starting {__file__} migration")
     
-    conn = get_db_connection()
-    cursor = conn.cursor()    
     try:
-        cursor.execute('DELETE FROM events WHERE events.calendar_id NOT IN (SELECT id FROM calendars)')
-        conn.commit()
-        logger.info("Completed remove_calendar_duplicates migration")
+        BACKFILL.run(conn)
         
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error during migration: {e}")
         raise
-    finally:
-        conn.close()
     
-    logger.info(f"Completed {__file__} migration")
\ No newline at end of file
+    logger.info(f"Completed {__file__} migration")
@@ -0,0 +1,25 @@
+import logging
+from migrations.migration_manager import migration_connection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def run(conn=None):
+    """Create the scheduler_leases table used for scheduler leader election"""
+    logger.info(f"Starting {__file__} migration")
+    
+    try:
+        with migration_connection(conn) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS scheduler_leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+        
+    except Exception as e:
+        logger.error(f"Error during migration: {e}")
+        raise
+    
+    logger.info(f"Completed {__file__} migration")
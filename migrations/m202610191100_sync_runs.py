@@ -0,0 +1,37 @@
+import logging
+from migrations.migration_manager import migration_connection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def run(conn=None):
+    """Create the sync_runs ring buffer holding the most recent syncs of each calendar"""
+    logger.info(f"Starting {__file__} migration")
+    
+    try:
+        with migration_connection(conn) as conn:
+            # One row per (calendar, slot); slot = seq % retention, so new runs
+            # overwrite the oldest ones instead of growing the table
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sync_runs (
+                    calendar_id INTEGER NOT NULL,
+                    slot INTEGER NOT NULL,
+                    seq INTEGER NOT NULL,
+                    started_at TEXT NOT NULL,
+                    duration_ms REAL NOT NULL,
+                    bytes INTEGER,
+                    http_status INTEGER,
+                    inserted INTEGER NOT NULL DEFAULT 0,
+                    updated INTEGER NOT NULL DEFAULT 0,
+                    deleted INTEGER NOT NULL DEFAULT 0,
+                    skipped BOOLEAN NOT NULL DEFAULT FALSE,
+                    error TEXT,
+                    PRIMARY KEY (calendar_id, slot)
+                ) WITHOUT ROWID
+            ''')
+        
+    except Exception as e:
+        logger.error(f"Error during migration: {e}")
+        raise
+    
+    logger.info(f"Completed {__file__} migration")
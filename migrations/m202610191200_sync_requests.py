@@ -0,0 +1,32 @@
+import logging
+from migrations.migration_manager import migration_connection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def run(conn=None):
+    """Create the sync_requests table for on-demand calendar syncs"""
+    logger.info(f"Starting {__file__} migration")
+    
+    try:
+        with migration_connection(conn) as conn:
+            # One row per calendar: repeated triggers coalesce into the
+            # pending or running request instead of queueing more fetches
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sync_requests (
+                    calendar_id INTEGER PRIMARY KEY,
+                    generation INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    requested_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    run_seq INTEGER,
+                    error TEXT
+                )
+            ''')
+        
+    except Exception as e:
+        logger.error(f"Error during migration: {e}")
+        raise
+    
+    logger.info(f"Completed {__file__} migration")
@@ -0,0 +1,34 @@
+import logging
+from migrations.migration_manager import migration_connection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Columns tracking failed syncs for backoff: (name, definition)
+FAILURE_COLUMNS = [
+    ('consecutive_failures', 'INTEGER NOT NULL DEFAULT 0'),
+    ('next_sync_after', 'REAL'),
+    ('last_error', 'TEXT'),
+]
+
+def run(conn=None):
+    """Add sync failure and backoff columns to the calendars table"""
+    logger.info(f"Starting {__file__} migration")
+    
+    try:
+        with migration_connection(conn) as conn:
+            cursor = conn.cursor()
+            
+            # Check which columns already exist
+            cursor.execute("PRAGMA table_info(calendars)")
+            columns = {column[1] for column in cursor.fetchall()}
+            
+            for name, definition in FAILURE_COLUMNS:
+                if name not in columns:
+                    cursor.execute(f'ALTER TABLE calendars ADD COLUMN {name} {definition}')
+        
+    except Exception as e:
+        logger.error(f"Error during migration: {e}")
+        raise
+    
+    logger.info(f"Completed {__file__} migration")
@@ -0,0 +1,69 @@
+import logging
+from urllib.parse import urlsplit, urlunsplit
+from migrations.migration_manager import migration_connection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def normalize_feed_url(url: str) -> str:
+    """Normalize a feed URL as services.database did when this migration was written.
+    
+    Kept as a copy, so that later changes to the service code cannot change
+    what this migration does.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f'[{host}]'
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or port == _DEFAULT_PORTS.get(scheme) else f'{host}:{port}'
+    if parts.username is not None:
+        userinfo = parts.username + (f':{parts.password}' if parts.password is not None else '')
+        netloc = f'{userinfo}@{netloc}'
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+def run(conn=None):
+    """Create the feeds table and link every calendar to the feed of its URL"""
+    logger.info(f"Starting {__file__} migration")
+    
+    try:
+        with migration_connection(conn) as conn:
+            cursor = conn.cursor()
+            
+            # One row per distinct normalized feed URL, shared by its subscriptions
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS feeds (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT UNIQUE NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            cursor.execute("PRAGMA table_info(calendars)")
+            columns = {column[1] for column in cursor.fetchall()}
+            if 'feed_id' not in columns:
+                cursor.execute('ALTER TABLE calendars ADD COLUMN feed_id INTEGER REFERENCES feeds (id)')
+            
+            # Link existing calendars
+            calendars = cursor.execute('SELECT id, url FROM calendars WHERE feed_id IS NULL').fetchall()
+            for calendar_id, url in calendars:
+                feed_url = normalize_feed_url(url)
+                cursor.execute('INSERT OR IGNORE INTO feeds (url) VALUES (?)', (feed_url,))
+                cursor.execute('UPDATE calendars SET feed_id = (SELECT id FROM feeds WHERE url = ?) WHERE id = ?',
+                               (feed_url, calendar_id))
+            
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_calendars_feed_id ON calendars (feed_id)')
+            
+            logger.info(f"Linked {len(calendars)} calendars to feeds")
+        
+    except Exception as e:
+        logger.error(f"Error during migration: {e}")
+        raise
+    
+    logger.info(f"Completed {__file__} migration")
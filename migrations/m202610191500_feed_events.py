@@ -0,0 +1,94 @@
+import logging
+from migrations.migration_manager import migration_connection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def run(conn=None):
+    """Move event content into feed_events, shared by all subscriptions of a feed.
+    
+    events keeps one narrow row per subscribed calendar and feed event, with
+    the ids of the existing rows, so event ids seen by API clients stay valid.
+    Events whose calendar no longer exists are dropped.
+    """
+    logger.info(f"Starting {__file__} migration")
+    
+    try:
+        with migration_connection(conn) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("PRAGMA table_info(events)")
+            columns = {column[1] for column in cursor.fetchall()}
+            if 'feed_event_id' in columns:
+                logger.info("Events already reference feed events, skipping")
+                return
+            
+            # Event content, stored once per feed
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS feed_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    feed_id INTEGER NOT NULL,
+                    uid TEXT NOT NULL,
+                    title TEXT,
+                    description TEXT,
+                    location TEXT,
+                    start_datetime TIMESTAMP NOT NULL,
+                    end_datetime TIMESTAMP NOT NULL,
+                    all_day BOOLEAN DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (feed_id) REFERENCES feeds (id) ON DELETE CASCADE,
+                    UNIQUE(feed_id, uid)
+                )
+            ''')
+            
+            # Per-calendar copies of a feed's events collapse into one row, the oldest
+            cursor.execute('''
+                INSERT OR IGNORE INTO feed_events (feed_id, uid, title, description, location,
+                                                   start_datetime, end_datetime, all_day, created_at)
+                SELECT c.feed_id, e.uid, e.title, e.description, e.location,
+                       e.start_datetime, e.end_datetime, e.all_day, e.created_at
+                FROM events e
+                JOIN calendars c ON e.calendar_id = c.id
+                WHERE c.feed_id IS NOT NULL
+                ORDER BY e.id
+            ''')
+            
+            # Subscriptions of calendars to feed events, with their notification state
+            cursor.execute('''
+                CREATE TABLE events_new (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    calendar_id INTEGER NOT NULL,
+                    feed_event_id INTEGER NOT NULL,
+                    notified BOOLEAN DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (calendar_id) REFERENCES calendars (id) ON DELETE CASCADE,
+                    FOREIGN KEY (feed_event_id) REFERENCES feed_events (id) ON DELETE CASCADE
+                )
+            ''')
+            cursor.execute('''
+                INSERT INTO events_new (id, calendar_id, feed_event_id, notified, created_at)
+                SELECT e.id, e.calendar_id, f.id, e.notified, e.created_at
+                FROM events e
+                JOIN calendars c ON e.calendar_id = c.id
+                JOIN feed_events f ON f.feed_id = c.feed_id AND f.uid = e.uid
+            ''')
+            moved = cursor.rowcount
+            
+            cursor.execute('DROP TABLE events')
+            cursor.execute('ALTER TABLE events_new RENAME TO events')
+            
+            # The first sync of every calendar subscribes it to all events of its feed
+            cursor.execute('UPDATE calendars SET sync_hash = NULL')
+            
+            # Create indexes
+            cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_calendars_events_unique ON events (calendar_id, feed_event_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_feed_event_id ON events (feed_event_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_notified ON events (notified)')
+            
+            logger.info(f"Moved {moved} events onto shared feed events")
+        
+    except Exception as e:
+        logger.error(f"Error during migration: {e}")
+        raise
+    
+    logger.info(f"Completed {__file__} migration")
@@ -0,0 +1,50 @@
+import logging
+from migrations.migration_manager import migration_connection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def run(conn=None):
+    """Move notification delivery state out of events into event_notifications"""
+    logger.info(f"Starting {__file__} migration")
+    
+    try:
+        with migration_connection(conn) as conn:
+            cursor = conn.cursor()
+            
+            # Delivery state, one narrow row per event, written by the notifier only
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS event_notifications (
+                    event_id INTEGER PRIMARY KEY,
+                    notified BOOLEAN NOT NULL DEFAULT FALSE,
+                    notified_at TIMESTAMP,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    claimed_by TEXT,
+                    claimed_at REAL,
+                    FOREIGN KEY (event_id) REFERENCES events (id) ON DELETE CASCADE
+                )
+            ''')
+            
+            cursor.execute("PRAGMA table_info(events)")
+            columns = {column[1] for column in cursor.fetchall()}
+            if 'notified' in columns:
+                cursor.execute('''
+                    INSERT OR IGNORE INTO event_notifications (event_id, notified)
+                    SELECT id, COALESCE(notified, FALSE) FROM events
+                ''')
+                logger.info(f"Moved notification state of {cursor.rowcount} events")
+                
+                cursor.execute('DROP INDEX IF EXISTS idx_events_notified')
+                cursor.execute('ALTER TABLE events DROP COLUMN notified')
+            
+            # Only undelivered notifications are indexed
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_event_notifications_pending
+                ON event_notifications (event_id) WHERE notified = 0
+            ''')
+        
+    except Exception as e:
+        logger.error(f"Error during migration: {e}")
+        raise
+    
+    logger.info(f"Completed {__file__} migration")
@@ -0,0 +1,71 @@
+import time
+import logging
+from migrations.migration_manager import migration_connection
+from services.config_service import get_notify_before_minutes
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Reminder schedule columns: (table, name, definition)
+REMINDER_COLUMNS = [
+    ('users', 'reminder_offsets', 'TEXT'),
+    ('calendars', 'reminder_offsets', 'TEXT'),
+    ('feed_events', 'alarm_offsets', 'TEXT'),
+]
+
+def run(conn=None):
+    """Add reminder schedules and the reminders table of precomputed fire times"""
+    logger.info(f"Starting {__file__} migration")
+    
+    try:
+        with migration_connection(conn) as conn:
+            cursor = conn.cursor()
+            
+            for table, name, definition in REMINDER_COLUMNS:
+                cursor.execute(f"PRAGMA table_info({table})")
+                if name not in {column[1] for column in cursor.fetchall()}:
+                    cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+            
+            # One row per event and reminder offset; times are Unix timestamps
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS reminders (
+                    event_id INTEGER NOT NULL,
+                    offset_minutes INTEGER NOT NULL,
+                    fire_at REAL NOT NULL,
+                    start_at REAL NOT NULL,
+                    delivered_at REAL,
+                    PRIMARY KEY (event_id, offset_minutes)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_reminders_due
+                ON reminders (fire_at) WHERE delivered_at IS NULL
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_reminders_start_at ON reminders (start_at)')
+            
+            # The pending query is driven by idx_reminders_due now
+            cursor.execute('DROP INDEX IF EXISTS idx_event_notifications_pending')
+            
+            # Schedule one reminder per upcoming event at the configured offset, as no
+            # schedules or alarms exist yet; those of notified events are delivered
+            offset_minutes = get_notify_before_minutes()
+            cursor.execute('''
+                INSERT OR IGNORE INTO reminders (event_id, offset_minutes, fire_at, start_at, delivered_at)
+                SELECT event_id, ?, start_at - ? * 60, start_at, CASE WHEN notified THEN ? END
+                FROM (
+                    SELECT e.id AS event_id, n.notified,
+                           (julianday(f.start_datetime) - 2440587.5) * 86400.0 AS start_at
+                    FROM events e
+                    JOIN feed_events f ON e.feed_event_id = f.id
+                    JOIN event_notifications n ON n.event_id = e.id
+                )
+                WHERE start_at > ?
+            ''', (offset_minutes, offset_minutes, time.time(), time.time()))
+            
+            logger.info(f"Scheduled reminders for {cursor.rowcount} upcoming events")
+        
+    except Exception as e:
+        logger.error(f"Error during migration: {e}")
+        raise
+    
+    logger.info(f"Completed {__file__} migration")
@@ -0,0 +1,39 @@
+import logging
+from migrations.migration_manager import migration_connection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def run(conn=None):
+    """Add the event_changes log of event inserts, updates and deletes"""
+    logger.info(f"Starting {__file__} migration")
+    
+    try:
+        with migration_connection(conn) as conn:
+            cursor = conn.cursor()
+            
+            # AUTOINCREMENT so that sequence numbers are never reused after pruning
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS event_changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event_id INTEGER NOT NULL,
+                    calendar_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    op TEXT NOT NULL,
+                    changed_at REAL NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_event_changes_calendar_seq
+                ON event_changes (calendar_id, seq)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_event_changes_user_seq
+                ON event_changes (user_id, seq)
+            ''')
+        
+    except Exception as e:
+        logger.error(f"Error during migration: {e}")
+        raise
+    
+    logger.info(f"Completed {__file__} migration")
@@ -0,0 +1,33 @@
+import logging
+from migrations.migration_manager import migration_connection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def run(conn=None):
+    """Index feed events by feed and UTC start time for event range queries"""
+    logger.info(f"Starting {__file__} migration")
+    
+    try:
+        with migration_connection(conn) as conn:
+            cursor = conn.cursor()
+            
+            # Start as a Unix timestamp, so that start times with different UTC offsets sort correctly
+            cursor.execute("PRAGMA table_xinfo(feed_events)")
+            if 'start_at' not in {column[1] for column in cursor.fetchall()}:
+                cursor.execute('''
+                    ALTER TABLE feed_events ADD COLUMN start_at REAL
+                    GENERATED ALWAYS AS (ROUND((julianday(start_datetime) - 2440587.5) * 86400.0, 3)) VIRTUAL
+                ''')
+            
+            # A calendar subscribes to one feed, so this serves (calendar, start) range scans
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_feed_events_feed_start
+                ON feed_events (feed_id, start_at)
+            ''')
+        
+    except Exception as e:
+        logger.error(f"Error during migration: {e}")
+        raise
+    
+    logger.info(f"Completed {__file__} migration")
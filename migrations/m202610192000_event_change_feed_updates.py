@@ -0,0 +1,65 @@
+import logging
+from migrations.migration_manager import migration_connection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def run(conn=None):
+    """Log content updates once per feed event instead of once per subscription"""
+    logger.info(f"Starting {__file__} migration")
+    
+    try:
+        with migration_connection(conn) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("PRAGMA table_info(event_changes)")
+            if 'feed_event_id' not in {column[1] for column in cursor.fetchall()}:
+                # Rebuilt, as the subscription columns become nullable for feed event updates
+                cursor.execute('ALTER TABLE event_changes RENAME TO event_changes_old')
+                cursor.execute('DROP INDEX IF EXISTS idx_event_changes_calendar_seq')
+                cursor.execute('DROP INDEX IF EXISTS idx_event_changes_user_seq')
+                cursor.execute('''
+                    CREATE TABLE event_changes (
+                        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                        event_id INTEGER,
+                        calendar_id INTEGER,
+                        user_id INTEGER,
+                        feed_id INTEGER,
+                        feed_event_id INTEGER,
+                        op TEXT NOT NULL,
+                        changed_at REAL NOT NULL
+                    )
+                ''')
+                cursor.execute('''
+                    INSERT INTO event_changes (seq, event_id, calendar_id, user_id, op, changed_at)
+                    SELECT seq, event_id, calendar_id, user_id, op, changed_at FROM event_changes_old
+                ''')
+                logger.info(f"Copied {cursor.rowcount} event changes")
+                
+                # Carry the sequence over, so numbers are not reused when the old log was pruned empty
+                cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'event_changes'")
+                cursor.execute('''
+                    INSERT INTO sqlite_sequence (name, seq)
+                    SELECT 'event_changes', seq FROM sqlite_sequence WHERE name = 'event_changes_old'
+                ''')
+                cursor.execute('DROP TABLE event_changes_old')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_event_changes_calendar_seq
+                ON event_changes (calendar_id, seq)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_event_changes_user_seq
+                ON event_changes (user_id, seq)
+            ''')
+            # Feed event updates are found by the feeds of the requested calendars
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_event_changes_feed_seq
+                ON event_changes (feed_id, seq) WHERE feed_event_id IS NOT NULL
+            ''')
+        
+    except Exception as e:
+        logger.error(f"Error during migration: {e}")
+        raise
+    
+    logger.info(f"Completed {__file__} migration")
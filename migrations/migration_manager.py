@@ -1,7 +1,10 @@
 import sqlite3
 import os
+import importlib
 import logging
-from typing import List
+import threading
+from contextlib import contextmanager
+from typing import List, Set
 from services.database import get_db_connection
 
 # Configure logging
@@ -13,98 +16,201 @@ class Migration:
         self.name = name
         self.executed_at = executed_at
 
-def init_migration_table():
-    """Initialize the migrations table"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+# Migrations in execution order: (recorded name, module in the migrations package)
+MIGRATIONS = [
+    ("initial_schema", "initial_schema"),
+    ("remove_calendar_duplicates", "remove_calendar_duplicates"),
+    ("add_calendar_timezone", "add_calendar_timezone"),
+    ("enforce_calendar_unique_constraint", "enforce_calendar_unique_constraint"),
+    ("m20260201_unique_event", "m20260201_unique_event"),
+    ("m202602021223_event_fix_calendsar", "m202602021223_event_fix_calendsar"),
+    ("m202610191000_scheduler_lease", "m202610191000_scheduler_lease"),
+    ("m202610191100_sync_runs", "m202610191100_sync_runs"),
+    ("m202610191200_sync_requests", "m202610191200_sync_requests"),
+    ("m202610191300_calendar_sync_failures", "m202610191300_calendar_sync_failures"),
+    ("m202610191400_feeds", "m202610191400_feeds"),
+    ("m202610191500_feed_events", "m202610191500_feed_events"),
+    ("m202610191600_event_notifications", "m202610191600_event_notifications"),
+    ("m202610191700_reminders", "m202610191700_reminders"),
+    ("m202610191800_event_changes", "m202610191800_event_changes"),
+    ("m202610191900_feed_event_start", "m202610191900_feed_event_start"),
+    ("m202610192000_event_change_feed_updates", "m202610192000_event_change_feed_updates"),
+]
+
+# Names a migration was recorded under by earlier versions of the runner
+MIGRATION_ALIASES = {
+    "m20260201_unique_event": ["migrations/m20260201_unique_event"],
+}
+
+# Stored in PRAGMA user_version once every migration above has run. Bump it
+# with each migration added to MIGRATIONS and never lower it, so a database
+# migrated by a newer release is never mistaken for an older schema.
+SCHEMA_VERSION = 17
+
+@contextmanager
+def migration_connection(conn=None):
+    """Yield the runner's shared connection, or a fresh one committed on success.
     
-    # Check if migrations table exists
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='migrations'")
-    table_exists = cursor.fetchone()
+    Migrations take an optional connection so the runner can execute all
+    pending migrations in one transaction, while a migration can still be
+    run on its own.
+    """
+    if conn is not None:
+        yield conn
+        return
     
-    if not table_exists:
-        cursor.execute('''
-            CREATE TABLE migrations (
+    conn = get_db_connection()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def init_migration_table(conn=None):
+    """Initialize the migrations table"""
+    with migration_connection(conn) as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS migrations (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT UNIQUE NOT NULL,
                 executed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
-        logger.info("Created migrations table")
-    else:
-        logger.info("Migrations table already exists")
-    
-    conn.commit()
-    conn.close()
 
-def get_executed_migrations() -> List[Migration]:
+def get_executed_migrations(conn=None) -> List[Migration]:
     """Get list of executed migrations"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM migrations ORDER BY id')
-        rows = cursor.fetchall()
-        conn.close()
+        with migration_connection(conn) as conn:
+            rows = conn.execute('SELECT * FROM migrations ORDER BY id').fetchall()
         
         return [Migration(row['id'], row['name'], row['executed_at']) for row in rows]
     except Exception as e:
         logger.error(f"Error getting executed migrations: {e}")
         return []
 
-def record_migration(name: str):
+def get_executed_migration_names(conn=None) -> Set[str]:
+    """Get the names of executed migrations, with legacy aliases resolved"""
+    executed = {migration.name for migration in get_executed_migrations(conn)}
+    for name, aliases in MIGRATION_ALIASES.items():
+        if executed.intersection(aliases):
+            executed.add(name)
+    return executed
+
+def record_migration(name: str, conn=None):
     """Record a migration as executed"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute('INSERT INTO migrations (name) VALUES (?)', (name,))
-        conn.commit()
+        with migration_connection(conn) as conn:
+            conn.execute('INSERT INTO migrations (name) VALUES (?)', (name,))
         logger.info(f"Recorded migration: {name}")
     except sqlite3.IntegrityError:
         logger.warning(f"Migration {name} already recorded")
-    finally:
-        conn.close()
 
-def run_migration(name: str, migration_func):
+def get_schema_version(conn=None) -> int:
+    """Get the schema version recorded in the database header"""
+    with migration_connection(conn) as conn:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def set_schema_version(version: int, conn=None):
+    """Record the schema version in the database header"""
+    with migration_connection(conn) as conn:
+        conn.execute(f'PRAGMA user_version = {int(version)}')
+
+def run_migration(name: str, migration_func, conn=None):
     """Run a migration if it hasn't been executed yet"""
-    executed_migrations = get_executed_migrations()
-    executed_names = [m.name for m in executed_migrations]
-    
-    if name in executed_names:
+    if name in get_executed_migration_names(conn):
         logger.info(f"Migration {name} already executed, skipping")
         return False
     
     logger.info(f"Running migration: {name}")
-    migration_func()
-    record_migration(name)
+    migration_func(conn)
+    record_migration(name, conn)
     return True
 
-def run_all_migrations():
-    """Run all migrations"""
-    logger.info("Running all migrations")
-    init_migration_table()
+def run_online_migrations(migrations):
+    """Run online (batched) migrations and record each one once it completes"""
+    for name, migration in migrations:
+        logger.info(f"Running online migration: {name}")
+        migration.run()
+        record_migration(name)
     
+    # The schema version is only advanced once nothing is pending any more
+    set_schema_version(SCHEMA_VERSION)
+    logger.info(f"Online migrations completed ({len(migrations)} applied)")
+
+def _run_online_migrations_in_background(migrations):
+    """Background thread target; failures are logged and retried on next startup"""
     try:
-        # Import migrations here to avoid circular imports
-        from migrations import initial_schema
-        from migrations import remove_calendar_duplicates
-        from migrations import add_calendar_timezone
-        from migrations import enforce_calendar_unique_constraint
-        from migrations import m20260201_unique_event
-        from migrations import m202602021223_event_fix_calendsar
-        
+        run_online_migrations(migrations)
+    except Exception as e:
+        logger.error(f"Error running online migrations: {e}")
+
+def run_all_migrations(background_online: bool = False):
+    """Run all pending migrations in a single connection and transaction.
+    
+    Schema migrations run first, together, in one transaction. Online
+    migrations (modules with ONLINE = True) process rows in resumable
+    batches afterwards, either inline or, with background_online, in a
+    daemon thread so startup does not wait for them.
+    """
+    conn = get_db_connection()
+    # Manage the transaction explicitly so that DDL is part of it as well
+    conn.isolation_level = None
+    online = []
+    
+    try:
+        # Fast path: a single header read when nothing is pending
+        if get_schema_version(conn) >= SCHEMA_VERSION:
+            logger.info(f"Database schema is up to date (version {SCHEMA_VERSION}), skipping migrations")
+            return
         
-        # Run migrations in order
-        run_migration("initial_schema", initial_schema.run)
-        run_migration("remove_calendar_duplicates", remove_calendar_duplicates.run)
-        run_migration("add_calendar_timezone", add_calendar_timezone.run)
-        run_migration("enforce_calendar_unique_constraint", enforce_calendar_unique_constraint.run)
-        run_migration("migrations/m20260201_unique_event", m20260201_unique_event.run)
-        run_migration("m20260201_unique_event", m20260201_unique_event.run)
-        run_migration("m202602021223_event_fix_calendsar", m202602021223_event_fix_calendsar.run)
+        logger.info("Running all migrations")
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            init_migration_table(conn)
+            
+            # Read the applied set once, under the write lock
+            executed = get_executed_migration_names(conn)
+            pending = [(name, module_name) for name, module_name in MIGRATIONS if name not in executed]
+            
+            for name, module_name in pending:
+                # Import migrations here to avoid circular imports
+                migration = importlib.import_module(f"migrations.{module_name}")
+                if getattr(migration, 'ONLINE', False):
+                    online.append((name, migration))
+                    continue
+                
+                logger.info(f"Running migration: {name}")
+                migration.run(conn)
+                record_migration(name, conn)
+            
+            if not online:
+                set_schema_version(SCHEMA_VERSION, conn)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
         
-        logger.info("All migrations completed")
+        logger.info(f"Schema migrations completed ({len(pending) - len(online)} applied)")
     except Exception as e:
         logger.error(f"Error running migrations: {e}")
-        raise
\ No newline at end of file
+        raise
+    finally:
+        conn.close()
+    
+    if not online:
+        return
+    
+    if background_online:
+        thread = threading.Thread(
+            target=_run_online_migrations_in_background,
+            args=(online,),
+            name='online-migrations',
+            daemon=True
+        )
+        thread.start()
+        logger.info(f"Started {len(online)} online migrations in the background")
+    else:
+        run_online_migrations(online)
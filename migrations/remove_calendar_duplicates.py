@@ -1,59 +1,39 @@
 import logging
-from services.database import get_db_connection
+from migrations.backfill import BatchedMigration
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def run():
+def delete_duplicate_calendars(conn, first_id: int, last_id: int) -> int:
+    """Delete calendars in the id range that duplicate an older calendar (same user_id and url)"""
+    cursor = conn.execute('''
+        DELETE FROM calendars
+        WHERE id BETWEEN ? AND ?
+          AND EXISTS (
+              SELECT 1 FROM calendars AS older
+              WHERE older.user_id = calendars.user_id
+                AND older.url = calendars.url
+                AND older.id < calendars.id
+          )
+    ''', (first_id, last_id))
+    if cursor.rowcount:
+        logger.info(f"Deleted {cursor.rowcount} duplicate calendars with ids {first_id}-{last_id}")
+    return cursor.rowcount
+
+# Runs in the schema migration transaction rather than online, as it has to
+# finish before enforce_calendar_unique_constraint builds the unique index
+BACKFILL = BatchedMigration("remove_calendar_duplicates", "calendars", delete_duplicate_calendars,
+                            pause_seconds=0)
+
+def run(conn=None):
     """Remove duplicate calendars, keeping only the one with the smallest ID"""
     logger.info("Starting remove_calendar_duplicates migration")
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        # Find duplicate calendars (same user_id and url)
-        cursor.execute('''
-            SELECT user_id, url, COUNT(*) as count
-            FROM calendars
-            GROUP BY user_id, url
-            HAVING COUNT(*) > 1
-        ''')
-        
-        duplicates = cursor.fetchall()
-        logger.info(f"Found {len(duplicates)} sets of duplicate calendars")
-        
-        removed_count = 0
-        for duplicate in duplicates:
-            user_id, url, count = duplicate
-            
-            # Get all IDs for this duplicate set, ordered by ID (ascending)
-            cursor.execute('''
-                SELECT id
-                FROM calendars
-                WHERE user_id = ? AND url = ?
-                ORDER BY id ASC
-            ''', (user_id, url))
-            
-            calendar_ids = [row['id'] for row in cursor.fetchall()]
-            
-            # Keep the first one (smallest ID), delete the rest
-            ids_to_delete = calendar_ids[1:]  # All except the first
-            
-            # Delete duplicate calendars (this will also delete their events due to CASCADE)
-            for calendar_id in ids_to_delete:
-                cursor.execute('DELETE FROM calendars WHERE id = ?', (calendar_id,))
-                removed_count += 1
-                logger.info(f"Deleted duplicate calendar {calendar_id} for user {user_id}")
-        
-        conn.commit()
-        logger.info(f"Removed {removed_count} duplicate calendars")
+        BACKFILL.run(conn)
         
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error during migration: {e}")
         raise
-    finally:
-        conn.close()
     
-    logger.info("Completed remove_calendar_duplicates migration")
\ No newline at end of file
+    logger.info("Completed remove_calendar_duplicates migration")
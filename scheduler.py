@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+Dedicated scheduler process for ICS-Gate.
+
+Runs calendar synchronization and notification checks while holding the
+scheduler lease in the database, so that any number of scheduler processes
+can be started but only one of them runs the jobs at a time.
+"""
+
+import os
+from services.init_service import run_scheduler_process
+
+# Global variables
+SYNC_INTERVAL_MINUTES = int(os.environ.get('SYNC_INTERVAL_MINUTES', 15))
+NOTIFY_INTERVAL_SECONDS = int(os.environ.get('NOTIFY_INTERVAL_SECONDS', 60))
+
+if __name__ == '__main__':
+    run_scheduler_process(SYNC_INTERVAL_MINUTES, NOTIFY_INTERVAL_SECONDS)
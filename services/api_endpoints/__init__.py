@@ -3,20 +3,25 @@ API Endpoints Package
 Each API endpoint is implemented in a separate file.
 """
 
-from flask import Flask
-from .health_endpoint import health_blp as health_blueprint
-from .calendar_endpoint import calendar_blp as calendar_blueprint
-from .notification_endpoint import notification_blp as notification_blueprint
-from .pending_events_endpoint import pending_events_blp as pending_events_blueprint
-from .openapi_endpoint import openapi_blp as openapi_blueprint
-
 def get_endpoints():
     """
     Get all API endpoint blueprints.
     
+    Endpoint modules are imported here rather than at package import, so
+    importing a single endpoint module does not load all of them.
+    
     Returns:
         dict: A dictionary of blueprints
     """
+    from .health_endpoint import health_blp as health_blueprint
+    from .calendar_endpoint import calendar_blp as calendar_blueprint
+    from .notification_endpoint import notification_blp as notification_blueprint
+    from .pending_events_endpoint import pending_events_blp as pending_events_blueprint
+    from .openapi_endpoint import openapi_blp as openapi_blueprint
+    from .metrics_endpoint import metrics_blp as metrics_blueprint
+    from .users_endpoint import users_blp as users_blueprint
+    from .events_endpoint import events_blp as events_blueprint
+    
     # Dictionary to store blueprints
     blueprints = {}
     
@@ -26,5 +31,8 @@ def get_endpoints():
     blueprints['notification'] = notification_blueprint
     blueprints['pending_events'] = pending_events_blueprint
     blueprints['openapi'] = openapi_blueprint
+    blueprints['metrics'] = metrics_blueprint
+    blueprints['users'] = users_blueprint
+    blueprints['events'] = events_blueprint
     
     return blueprints
\ No newline at end of file
@@ -1,8 +1,12 @@
 import logging
+from datetime import datetime, timezone
 from flask import request, jsonify
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate
 from services.config_service import get_api_key
 from services.database import create_user, create_calendar, get_calendars, delete_calendar, get_calendar_by_id
+from services.database import get_sync_runs, request_calendar_sync, get_sync_request
+from services.database import set_calendar_reminder_offsets, parse_reminder_offsets
+from services.calendar_service import get_sync_stats, wait_for_sync_request
 from services.api_utils import validate_api_key
 from services.api_docs import Blueprint
 
@@ -16,6 +20,71 @@ calendar_blp = Blueprint('calendars', __name__, url_prefix='/calendars')
 class ListCalendarsSchema(Schema):
     user_id = fields.Str(required=False, metadata={"description": "Filter calendars by user ID"})
 
+class SyncHistorySchema(Schema):
+    user_id = fields.Str(required=False, metadata={"description": "Only allow calendars of this user ID"})
+    limit = fields.Int(required=False, load_default=20, metadata={"description": "Number of recent runs to return"})
+
+class SyncTriggerSchema(Schema):
+    user_id = fields.Str(required=False, metadata={"description": "Only allow calendars of this user ID"})
+    wait = fields.Float(required=False, load_default=0, metadata={"description": "Seconds to wait for the sync to finish (max 60)"})
+
+class SyncStatusSchema(Schema):
+    user_id = fields.Str(required=False, metadata={"description": "Only allow calendars of this user ID"})
+
+class ReminderOwnerSchema(Schema):
+    user_id = fields.Str(required=False, metadata={"description": "Only allow calendars of this user ID"})
+
+# Limits of a reminder schedule: number of offsets, and the longest offset (one year) in minutes
+MAX_REMINDER_OFFSETS = 10
+MAX_REMINDER_OFFSET_MINUTES = 366 * 24 * 60
+
+class ReminderScheduleSchema(Schema):
+    offsets = fields.List(
+        fields.Int(validate=validate.Range(min=0, max=MAX_REMINDER_OFFSET_MINUTES)),
+        required=True,
+        allow_none=True,
+        validate=validate.Length(max=MAX_REMINDER_OFFSETS),
+        metadata={"description": "Minutes before the event start to send reminders at, e.g. [1440, 60, 10]; "
+                                 "null to inherit the default schedule"}
+    )
+
+# Upper bound for ?wait= on sync triggers, in seconds
+MAX_SYNC_WAIT_SECONDS = 60
+
+def _calendar_access_error(calendar_id, user_id):
+    """Return an error response if the calendar does not exist or is not owned by user_id"""
+    calendar = get_calendar_by_id(calendar_id)
+    if not calendar:
+        return jsonify({'error': {'code': 404, 'message': 'Calendar not found'}}), 404
+    
+    if user_id and calendar_id not in {c.id for c in get_calendars(user_id)}:
+        return jsonify({'error': {'code': 403, 'message': 'Forbidden: You do not have access to this calendar'}}), 403
+    
+    return None
+
+def _isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp else None
+
+def serialize_sync_request(sync_request, coalesced=None):
+    """Serialize a SyncRequest, with its sync run once finished"""
+    data = {
+        'calendar_id': sync_request.calendar_id,
+        'generation': sync_request.generation,
+        'status': sync_request.status,
+        'requested_at': _isoformat(sync_request.requested_at),
+        'started_at': _isoformat(sync_request.started_at),
+        'finished_at': _isoformat(sync_request.finished_at),
+        'error': sync_request.error,
+        'run': None,
+    }
+    if coalesced is not None:
+        data['coalesced'] = coalesced
+    if sync_request.run_seq is not None:
+        run = next((run for run in get_sync_runs(sync_request.calendar_id) if run.seq == sync_request.run_seq), None)
+        if run:
+            data['run'] = dict(run._asdict(), skipped=bool(run.skipped))
+    return data
+
 class CreateCalendarSchema(Schema):
     user_id = fields.Str(required=True, metadata={"description": "User ID"})
     url = fields.Str(required=True, metadata={"description": "Calendar URL"})
@@ -140,10 +209,143 @@ def delete_calendar_api(calendar_id):
         logger.error(f"Error deleting calendar: {e}")
         return jsonify({'error': {'code': 500, 'message': 'Internal Server Error'}}), 500
 
+@calendar_blp.route('/<int:calendar_id>/syncs', methods=['GET'])
+@calendar_blp.arguments(SyncHistorySchema, location="query")
+@calendar_blp.doc(
+    summary="Calendar sync history",
+    description="Returns recent sync runs of a calendar and statistics over the retained history",
+    security=[{"ApiKeyAuth": []}]
+)
+def calendar_syncs_api(args, calendar_id):
+    """Get sync history and stats for a calendar"""
+    if not validate_api_key():
+        return jsonify({'error': {'code': 401, 'message': 'Unauthorized'}}), 401
+    
+    try:
+        # Optional ownership check, as for deletion
+        error = _calendar_access_error(calendar_id, args.get('user_id'))
+        if error:
+            return error
+        
+        runs = get_sync_runs(calendar_id, max(0, args.get('limit', 20)))
+        
+        return jsonify({
+            'calendar_id': calendar_id,
+            'stats': get_sync_stats(calendar_id),
+            'runs': [dict(run._asdict(), skipped=bool(run.skipped)) for run in runs]
+        })
+    except ValueError as e:
+        # Handle user not found error
+        logger.warning(f"User not found: {e}")
+        return jsonify({'error': {'code': 404, 'message': 'User not found'}}), 404
+    except Exception as e:
+        logger.error(f"Error getting sync history: {e}")
+        return jsonify({'error': {'code': 500, 'message': 'Internal Server Error'}}), 500
+
+@calendar_blp.route('/<int:calendar_id>/sync', methods=['POST'])
+@calendar_blp.arguments(SyncTriggerSchema, location="query")
+@calendar_blp.doc(
+    summary="Sync calendar now",
+    description="Requests an immediate sync of a calendar by the background scheduler. "
+                "Triggers while a sync of the calendar is pending or running join that sync. "
+                "Pass wait=<seconds> to wait for the result, otherwise poll GET /calendars/<id>/sync",
+    security=[{"ApiKeyAuth": []}]
+)
+def trigger_calendar_sync_api(args, calendar_id):
+    """Request an on-demand calendar sync"""
+    if not validate_api_key():
+        return jsonify({'error': {'code': 401, 'message': 'Unauthorized'}}), 401
+    
+    try:
+        error = _calendar_access_error(calendar_id, args.get('user_id'))
+        if error:
+            return error
+        
+        sync_request, coalesced = request_calendar_sync(calendar_id)
+        
+        wait = min(max(args.get('wait', 0), 0), MAX_SYNC_WAIT_SECONDS)
+        if wait:
+            sync_request = wait_for_sync_request(calendar_id, sync_request.generation, wait) or sync_request
+        
+        finished = sync_request.status in ('done', 'failed')
+        return jsonify({'sync': serialize_sync_request(sync_request, coalesced)}), 200 if finished else 202
+    except ValueError as e:
+        # Handle user not found error
+        logger.warning(f"User not found: {e}")
+        return jsonify({'error': {'code': 404, 'message': 'User not found'}}), 404
+    except Exception as e:
+        logger.error(f"Error requesting calendar sync: {e}")
+        return jsonify({'error': {'code': 500, 'message': 'Internal Server Error'}}), 500
+
+@calendar_blp.route('/<int:calendar_id>/sync', methods=['GET'])
+@calendar_blp.arguments(SyncStatusSchema, location="query")
+@calendar_blp.doc(
+    summary="On-demand sync status",
+    description="Returns the state of the latest on-demand sync request of a calendar",
+    security=[{"ApiKeyAuth": []}]
+)
+def calendar_sync_status_api(args, calendar_id):
+    """Get the status of the latest on-demand sync request"""
+    if not validate_api_key():
+        return jsonify({'error': {'code': 401, 'message': 'Unauthorized'}}), 401
+    
+    try:
+        error = _calendar_access_error(calendar_id, args.get('user_id'))
+        if error:
+            return error
+        
+        sync_request = get_sync_request(calendar_id)
+        if not sync_request:
+            return jsonify({'error': {'code': 404, 'message': 'No sync requested for this calendar'}}), 404
+        
+        return jsonify({'sync': serialize_sync_request(sync_request)})
+    except ValueError as e:
+        # Handle user not found error
+        logger.warning(f"User not found: {e}")
+        return jsonify({'error': {'code': 404, 'message': 'User not found'}}), 404
+    except Exception as e:
+        logger.error(f"Error getting calendar sync status: {e}")
+        return jsonify({'error': {'code': 500, 'message': 'Internal Server Error'}}), 500
+
+@calendar_blp.route('/<int:calendar_id>/reminders', methods=['PUT'])
+@calendar_blp.arguments(ReminderOwnerSchema, location="query")
+@calendar_blp.arguments(ReminderScheduleSchema)
+@calendar_blp.doc(
+    summary="Set calendar reminders",
+    description="Sets the reminder schedule of a calendar, overriding the schedule of its user. "
+                "Reminders of upcoming events are rescheduled; VALARMs of the feed apply in addition",
+    security=[{"ApiKeyAuth": []}]
+)
+def set_calendar_reminders_api(args, schedule, calendar_id):
+    """Set the reminder schedule of a calendar"""
+    if not validate_api_key():
+        return jsonify({'error': {'code': 401, 'message': 'Unauthorized'}}), 401
+    
+    try:
+        error = _calendar_access_error(calendar_id, args.get('user_id'))
+        if error:
+            return error
+        
+        set_calendar_reminder_offsets(calendar_id, schedule['offsets'], args.get('user_id'))
+        calendar = get_calendar_by_id(calendar_id)
+        
+        return jsonify({
+            'calendar_id': calendar_id,
+            'reminder_offsets': parse_reminder_offsets(calendar.reminder_offsets)
+        })
+    except ValueError as e:
+        # Handle user not found error
+        logger.warning(f"User not found: {e}")
+        return jsonify({'error': {'code': 404, 'message': 'User not found'}}), 404
+    except Exception as e:
+        logger.error(f"Error setting calendar reminders: {e}")
+        return jsonify({'error': {'code': 500, 'message': 'Internal Server Error'}}), 500
+
 def register_calendar_endpoint(app):
     """Register calendar endpoints"""
     # Register the blueprint with the app
     app.register_blueprint(calendar_blp)
     
     # Return the view functions
-    return [create_calendar_api, list_calendars_api, delete_calendar_api]
\ No newline at end of file
+    return [create_calendar_api, list_calendars_api, delete_calendar_api, calendar_syncs_api,
+            trigger_calendar_sync_api, calendar_sync_status_api, set_calendar_reminders_api]
\ No newline at end of file
@@ -0,0 +1,179 @@
+import logging
+from datetime import datetime, timezone
+from flask import jsonify
+from marshmallow import Schema, fields, validate
+from services.database import get_event_changes, get_event_change_bounds, query_events
+from services.api_utils import validate_api_key
+from services.api_docs import Blueprint
+from services.api_endpoints.pending_events_endpoint import convert_datetime_to_timezone
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Upper bound for ?limit= on event queries
+MAX_EVENTS_PAGE_SIZE = 1000
+
+# Create a blueprint for this endpoint
+events_blp = Blueprint('event_queries', __name__, url_prefix='/events')
+
+class ListEventsSchema(Schema):
+    calendar_id = fields.Int(required=False, metadata={"description": "Only events of this calendar"})
+    user_id = fields.Str(required=False, metadata={"description": "Only events of calendars of this user ID"})
+    start_from = fields.DateTime(required=False, data_key="from", metadata={"description": "Only events starting at or after this time (ISO 8601, UTC if no offset)"})
+    start_to = fields.DateTime(required=False, data_key="to", metadata={"description": "Only events starting before this time (ISO 8601, UTC if no offset)"})
+    q = fields.Str(required=False, metadata={"description": "Text to search for in title, description and location"})
+    cursor = fields.Str(required=False, metadata={"description": "next_cursor of the previous page"})
+    limit = fields.Int(required=False, load_default=100, validate=validate.Range(min=1, max=MAX_EVENTS_PAGE_SIZE), metadata={"description": "Number of events to return (max 1000)"})
+
+class EventChangesSchema(Schema):
+    since = fields.Int(required=True, validate=validate.Range(min=0), metadata={"description": "Return changes after this sequence number; 0 for all retained changes"})
+    limit = fields.Int(required=False, load_default=100, validate=validate.Range(min=1, max=MAX_EVENTS_PAGE_SIZE), metadata={"description": "Number of changes to return (max 1000)"})
+    calendar_id = fields.Int(required=False, metadata={"description": "Only changes of this calendar"})
+    user_id = fields.Str(required=False, metadata={"description": "Only changes of calendars of this user ID"})
+
+def _timestamp(value):
+    """Unix timestamp of a datetime, taken as UTC when it has no offset"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def encode_cursor(event) -> str:
+    """Keyset cursor after an event: its start time and ID"""
+    return f"{event.start_at!r}:{event.id}"
+
+def decode_cursor(cursor: str) -> tuple:
+    """Parse a cursor from encode_cursor, raising ValueError if it is malformed"""
+    start_at, event_id = cursor.split(':')
+    return float(start_at), int(event_id)
+
+def serialize_event(event):
+    """Serialize an Event, with its times in the calendar timezone"""
+    calendar_timezone = event.calendar_timezone
+    return {
+        'id': event.id,
+        'calendar_id': event.calendar_id,
+        'uid': event.uid,
+        'user_id': event.user_id,
+        'title': event.title,
+        'description': event.description,
+        'location': event.location,
+        'start_datetime': convert_datetime_to_timezone(event.start_datetime, calendar_timezone),
+        'end_datetime': convert_datetime_to_timezone(event.end_datetime, calendar_timezone),
+        'all_day': bool(event.all_day),
+        'calendar_timezone': calendar_timezone,
+    }
+
+@events_blp.route('', methods=['GET'])
+@events_blp.arguments(ListEventsSchema, location="query")
+@events_blp.doc(
+    summary="List events",
+    description="Returns events of a calendar or of a user ordered by start time, filtered by start "
+                "time range and text. calendar_id or user_id is required. "
+                "Pages are at most limit events; pass next_cursor as cursor for the next one",
+    security=[{"ApiKeyAuth": []}]
+)
+def list_events_api(args):
+    """List events with filters and keyset pagination"""
+    if not validate_api_key():
+        return jsonify({'error': {'code': 401, 'message': 'Unauthorized'}}), 401
+    
+    try:
+        after = decode_cursor(args['cursor']) if 'cursor' in args else None
+    except ValueError:
+        return jsonify({'error': {'code': 400, 'message': 'Invalid cursor'}}), 400
+    if 'calendar_id' not in args and not args.get('user_id'):
+        return jsonify({'error': {'code': 400, 'message': 'calendar_id or user_id is required'}}), 400
+    
+    try:
+        limit = args['limit']
+        events = query_events(args.get('calendar_id'), args.get('user_id'),
+                              _timestamp(args.get('start_from')), _timestamp(args.get('start_to')),
+                              args.get('q'), after, limit + 1)
+        has_more = len(events) > limit
+        events = events[:limit]
+        
+        return jsonify({
+            'events': [serialize_event(event) for event in events],
+            'next_cursor': encode_cursor(events[-1]) if has_more else None,
+        })
+    except ValueError as e:
+        # Handle user not found error
+        logger.warning(f"User not found: {e}")
+        return jsonify({'error': {'code': 404, 'message': 'User not found'}}), 404
+    except Exception as e:
+        logger.error(f"Error listing events: {e}")
+        return jsonify({'error': {'code': 500, 'message': 'Internal Server Error'}}), 500
+
+def serialize_event_change(change):
+    """Serialize an EventChange, with the current event content unless it was deleted"""
+    event = None
+    if change.uid is not None:
+        event = {
+            'uid': change.uid,
+            'title': change.title,
+            'description': change.description,
+            'location': change.location,
+            'start_datetime': change.start_datetime,
+            'end_datetime': change.end_datetime,
+            'all_day': bool(change.all_day),
+        }
+    return {
+        'seq': change.seq,
+        'op': change.op,
+        'event_id': change.event_id,
+        'calendar_id': change.calendar_id,
+        'changed_at': datetime.fromtimestamp(change.changed_at, timezone.utc).isoformat(),
+        'event': event,
+    }
+
+@events_blp.route('/changes', methods=['GET'])
+@events_blp.arguments(EventChangesSchema, location="query")
+@events_blp.doc(
+    summary="Event changes",
+    description="Returns inserts, updates and deletes of events after a sequence number, in order. "
+                "Pass next_since as since to get the next page; 410 means the cursor is older than "
+                "the retained log and the events have to be listed again",
+    security=[{"ApiKeyAuth": []}]
+)
+def get_event_changes_api(args):
+    """Page through the event change log"""
+    if not validate_api_key():
+        return jsonify({'error': {'code': 401, 'message': 'Unauthorized'}}), 401
+    
+    try:
+        since = args['since']
+        first_retained, latest = get_event_change_bounds()
+        if since < first_retained - 1:
+            return jsonify({'error': {'code': 410, 'message': 'Changes after this sequence number were pruned'}}), 410
+        
+        limit = args['limit']
+        changes, has_more = get_event_changes(since, limit, args.get('calendar_id'), args.get('user_id'))
+        
+        # Without more matching changes the cursor can skip to the end of the log
+        next_since = changes[-1].seq if changes else since
+        if not has_more:
+            next_since = max(next_since, latest)
+        
+        return jsonify({
+            'changes': [serialize_event_change(change) for change in changes],
+            'next_since': next_since,
+            'has_more': has_more,
+            'latest_seq': latest,
+        })
+    except ValueError as e:
+        # Handle user not found error
+        logger.warning(f"User not found: {e}")
+        return jsonify({'error': {'code': 404, 'message': 'User not found'}}), 404
+    except Exception as e:
+        logger.error(f"Error getting event changes: {e}")
+        return jsonify({'error': {'code': 500, 'message': 'Internal Server Error'}}), 500
+
+def register_events_endpoint(app):
+    """Register event query endpoints"""
+    # Register the blueprint with the app
+    app.register_blueprint(events_blp)
+    
+    # Return the view functions
+    return [list_events_api, get_event_changes_api]
\ No newline at end of file
@@ -0,0 +1,27 @@
+import logging
+from flask import Response
+from ..api_docs import Blueprint
+from ..metrics import render_metrics, CONTENT_TYPE
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create a Blueprint for the metrics endpoint
+metrics_blp = Blueprint('metrics', __name__, url_prefix='/metrics')
+
+@metrics_blp.route('', methods=['GET'])
+@metrics_blp.doc(
+    summary="Prometheus metrics",
+    description="Returns sync, query and notification metrics of this process in the Prometheus text format"
+)
+def metrics():
+    """Metrics endpoint"""
+    return Response(render_metrics(), mimetype=None, content_type=CONTENT_TYPE)
+
+def register_metrics_endpoint(app):
+    """Register metrics endpoint"""
+    # Register the blueprint with the app
+    app.register_blueprint(metrics_blp)
+    
+    # Return the view function
+    return metrics
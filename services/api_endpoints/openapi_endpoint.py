@@ -20,11 +20,17 @@ def get_openapi_spec():
     # Note: We don't require API key authentication for the OpenAPI spec
     # as it's typically public documentation
     
+    # The spec is built on the first request and cached on the app
+    openapi_spec = current_app.extensions.get('icsgate-openapi-spec')
+    if openapi_spec is not None:
+        return jsonify(openapi_spec)
+    
     # Try to get the auto-generated spec from Flask-Smorest
     try:
         # Get the spec from the Flask app
         if hasattr(current_app, 'extensions') and 'flask-smorest' in current_app.extensions:
-            api = current_app.extensions['flask-smorest']
+            apis = current_app.extensions['flask-smorest']['apis']
+            api = next(iter(apis.values()))['ext_obj']
             openapi_spec = api.spec.to_dict()
         else:
             # Fallback to manual spec if auto-generation fails
@@ -174,6 +180,7 @@ def get_openapi_spec():
             "paths": {}
         }
     
+    current_app.extensions['icsgate-openapi-spec'] = openapi_spec
     return jsonify(openapi_spec)
 
 def register_openapi_endpoint(app):
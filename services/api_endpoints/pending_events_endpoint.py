@@ -1,15 +1,24 @@
+import os
+import json
 import logging
-from flask import request, jsonify
+from flask import request, jsonify, Response
 from marshmallow import Schema, fields
 from dateutil import tz
 from services.config_service import get_api_key
-from services.notification_service import get_pending_events_for_api
+from services.notification_service import get_pending_events_for_api, wait_for_pending_events, pending_event_key
 from services.api_utils import validate_api_key
 from services.api_docs import Blueprint
+from services.profiling import span
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Global variables
+PENDING_STREAM_HEARTBEAT_SECONDS = float(os.environ.get('PENDING_STREAM_HEARTBEAT_SECONDS', 15))
+
+# Upper bound for ?wait= on pending events, in seconds
+MAX_PENDING_WAIT_SECONDS = 60
+
 # Timezone cache to avoid recreating timezone objects
 _timezone_cache = {}
 
@@ -36,18 +45,60 @@ def convert_datetime_to_timezone(dt_string, timezone_name):
         logger.warning(f"Error converting datetime {dt_string} to timezone {timezone_name}: {e}")
         return dt_string  # Return original if conversion fails
 
+def serialize_pending_event(event):
+    """Serialize a pending Event tuple into its JSON response representation"""
+    calendar_timezone = event.calendar_timezone
+    return {
+        'id': event.id,
+        'uid': event.uid,
+        'user_id': event.user_id,
+        'title': event.title,
+        'description': event.description,
+        'location': event.location,
+        'start_datetime': convert_datetime_to_timezone(event.start_datetime, calendar_timezone),
+        'end_datetime': convert_datetime_to_timezone(event.end_datetime, calendar_timezone),
+        'all_day': event.all_day,
+        'calendar_timezone': calendar_timezone,
+        'reminder_minutes': event.reminder_minutes,
+    }
+
 # Create a blueprint for this endpoint
 pending_events_blp = Blueprint('events', __name__, url_prefix='/events')
 
 # Define schema for query parameters
 class PendingEventsSchema(Schema):
     user_id = fields.Str(required=False, metadata={"description": "Filter events by user ID"})
+    wait = fields.Float(required=False, load_default=0, metadata={"description": "Seconds to wait for an event to become due when none is pending (max 60)"})
+
+class PendingStreamSchema(Schema):
+    user_id = fields.Str(required=False, metadata={"description": "Filter events by user ID"})
+
+def stream_pending_events(user_id=None, events=(), heartbeat_seconds=None):
+    """Yield server-sent events for pending events, starting with events, as they become due.
+    
+    Each due reminder of an event is sent once per stream. A comment line
+    is sent as a keepalive when nothing became due for heartbeat_seconds.
+    """
+    heartbeat_seconds = heartbeat_seconds or PENDING_STREAM_HEARTBEAT_SECONDS
+    seen = set()
+    while True:
+        new_events = [event for event in events if pending_event_key(event) not in seen]
+        for event in new_events:
+            yield f"event: pending\ndata: {json.dumps(serialize_pending_event(event))}\n\n"
+        if not new_events:
+            yield ": keepalive\n\n"
+        
+        # Only remember reminders that are still pending
+        seen = {pending_event_key(event) for event in events}
+        events = wait_for_pending_events(user_id, heartbeat_seconds, seen)
 
 @pending_events_blp.route('/pending', methods=['GET'])
 @pending_events_blp.arguments(PendingEventsSchema, location="query")
 @pending_events_blp.doc(
     summary="Get pending events",
-    description="Returns a list of events that are ready for notification",
+    description="Returns a list of events that are ready for notification. "
+                "With wait=<seconds> and nothing pending, the request is held until an event "
+                "becomes due or the wait expires (long poll)",
     security=[{"ApiKeyAuth": []}]
 )
 def get_events_pending(args):
@@ -57,27 +108,17 @@ def get_events_pending(args):
     
     try:
         user_id = args.get('user_id') if args else None
-        pending_events = get_pending_events_for_api(user_id)
+        wait = min(max(args.get('wait', 0), 0), MAX_PENDING_WAIT_SECONDS) if args else 0
+        if wait:
+            pending_events = wait_for_pending_events(user_id, wait)
+        else:
+            pending_events = get_pending_events_for_api(user_id)
         
-        events_data = []
-        for event in pending_events:
-            calendar_timezone = getattr(event, 'calendar_timezone', 'GMT+3')
-            event_data = {
-                'id': event.id,
-                'uid': event.uid,
-                'user_id': event.user_id,
-                'title': event.title,
-                'description': event.description,
-                'location': event.location,
-                'start_datetime': convert_datetime_to_timezone(event.start_datetime, calendar_timezone),
-                'end_datetime': convert_datetime_to_timezone(event.end_datetime, calendar_timezone),
-                'all_day': event.all_day,
-                'calendar_timezone': calendar_timezone,
-            }
-            
-            events_data.append(event_data)
+        with span('convert'):
+            events_data = [serialize_pending_event(event) for event in pending_events]
         
-        return jsonify({'events': events_data})
+        with span('serialize'):
+            return jsonify({'events': events_data})
     except ValueError as e:
         # Handle user not found error
         logger.warning(f"User not found: {e}")
@@ -86,10 +127,39 @@ def get_events_pending(args):
         logger.error(f"Error getting pending events: {e}")
         return jsonify({'error': {'code': 500, 'message': 'Internal Server Error'}}), 500
 
+@pending_events_blp.route('/pending/stream', methods=['GET'])
+@pending_events_blp.arguments(PendingStreamSchema, location="query")
+@pending_events_blp.doc(
+    summary="Stream pending events",
+    description="Server-sent events stream pushing each event as one of its reminders becomes due. "
+                "Events stay in the stream until marked as delivered; a keepalive comment is sent "
+                "while nothing becomes due",
+    security=[{"ApiKeyAuth": []}]
+)
+def stream_events_pending(args):
+    """Stream pending events as server-sent events"""
+    if not validate_api_key():
+        return jsonify({'error': {'code': 401, 'message': 'Unauthorized'}}), 401
+    
+    try:
+        user_id = args.get('user_id') if args else None
+        # Query once up front so an unknown user is reported before the stream starts
+        pending_events = get_pending_events_for_api(user_id)
+        
+        return Response(stream_pending_events(user_id, pending_events), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    except ValueError as e:
+        # Handle user not found error
+        logger.warning(f"User not found: {e}")
+        return jsonify({'error': {'code': 404, 'message': 'User not found'}}), 404
+    except Exception as e:
+        logger.error(f"Error streaming pending events: {e}")
+        return jsonify({'error': {'code': 500, 'message': 'Internal Server Error'}}), 500
+
 def register_pending_events_endpoint(app):
     """Register pending events endpoint"""
     # Register the blueprint with the app
     app.register_blueprint(pending_events_blp)
     
-    # Return the view function
-    return get_events_pending
\ No newline at end of file
+    # Return the view functions
+    return [get_events_pending, stream_events_pending]
\ No newline at end of file
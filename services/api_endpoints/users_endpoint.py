@@ -0,0 +1,48 @@
+import logging
+from flask import jsonify
+from services.database import set_user_reminder_offsets, parse_reminder_offsets
+from services.api_utils import validate_api_key
+from services.api_docs import Blueprint
+from services.api_endpoints.calendar_endpoint import ReminderScheduleSchema
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create a blueprint for this endpoint
+users_blp = Blueprint('users', __name__, url_prefix='/users')
+
+@users_blp.route('/<user_id>/reminders', methods=['PUT'])
+@users_blp.arguments(ReminderScheduleSchema)
+@users_blp.doc(
+    summary="Set user reminders",
+    description="Sets the default reminder schedule of a user's calendars. "
+                "Calendars with their own schedule keep it; reminders of upcoming events are rescheduled",
+    security=[{"ApiKeyAuth": []}]
+)
+def set_user_reminders_api(schedule, user_id):
+    """Set the default reminder schedule of a user"""
+    if not validate_api_key():
+        return jsonify({'error': {'code': 401, 'message': 'Unauthorized'}}), 401
+    
+    try:
+        user = set_user_reminder_offsets(user_id, schedule['offsets'])
+        
+        return jsonify({
+            'user_id': user.user_id,
+            'reminder_offsets': parse_reminder_offsets(user.reminder_offsets)
+        })
+    except ValueError as e:
+        # Handle user not found error
+        logger.warning(f"User not found: {e}")
+        return jsonify({'error': {'code': 404, 'message': 'User not found'}}), 404
+    except Exception as e:
+        logger.error(f"Error setting user reminders: {e}")
+        return jsonify({'error': {'code': 500, 'message': 'Internal Server Error'}}), 500
+
+def register_users_endpoint(app):
+    """Register user endpoints"""
+    # Register the blueprint with the app
+    app.register_blueprint(users_blp)
+    
+    # Return the view function
+    return set_user_reminders_api
\ No newline at end of file
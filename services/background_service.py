@@ -1,7 +1,12 @@
 import logging
+import os
+import socket
+import threading
+import time
 from apscheduler.schedulers.background import BackgroundScheduler
-from .calendar_service import sync_all_calendars
+from .calendar_service import sync_all_calendars, process_sync_requests
 from .notification_service import check_pending_notifications
+from .database import try_acquire_lease, release_lease
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -9,6 +14,9 @@ logger = logging.getLogger(__name__)
 # Global variables
 SYNC_INTERVAL_MINUTES = None  # This will be set from the main app
 NOTIFY_INTERVAL_SECONDS = None  # This will be set from the main app
+SCHEDULER_LEASE_NAME = 'scheduler'
+SCHEDULER_LEASE_TTL_SECONDS = float(os.environ.get('SCHEDULER_LEASE_TTL_SECONDS', 30))
+SYNC_REQUEST_POLL_SECONDS = float(os.environ.get('SYNC_REQUEST_POLL_SECONDS', 2))
 
 def start_background_processes():
     """Start background processes"""
@@ -22,6 +30,16 @@ def start_background_processes():
         id='ics_sync'
     )
     
+    # Add on-demand sync request job
+    scheduler.add_job(
+        process_sync_requests,
+        'interval',
+        seconds=SYNC_REQUEST_POLL_SECONDS,
+        id='sync_requests',
+        max_instances=1,
+        coalesce=True
+    )
+    
     # Add notification check job
     scheduler.add_job(
         check_pending_notifications,
@@ -33,4 +51,62 @@ def start_background_processes():
     scheduler.start()
     logger.info("Background processes started")
     
-    return scheduler
\ No newline at end of file
+    return scheduler
+
+def run_scheduler_as_leader(stop_event: threading.Event = None):
+    """Run background processes only while this process holds the scheduler lease.
+    
+    Blocks until stop_event is set. Every process that calls this competes for
+    the same database lease, so exactly one of them runs the sync and
+    notification jobs; another takes over once the lease expires. A renewal
+    that raises (e.g. the database stayed locked through a long sync write)
+    keeps leadership until the last renewed lease would expire; only a
+    renewal that finds the lease held by another holder gives it up at once.
+    Jobs are always allowed to finish before the lease is released.
+    """
+    stop_event = stop_event or threading.Event()
+    holder = f"{socket.gethostname()}:{os.getpid()}"
+    renew_interval = SCHEDULER_LEASE_TTL_SECONDS / 3
+    scheduler = None
+    lease_expires_at = 0.0
+    
+    logger.info(f"Scheduler candidate {holder} waiting for leadership")
+    try:
+        while not stop_event.is_set():
+            renewing_at = time.monotonic()
+            try:
+                is_leader = try_acquire_lease(SCHEDULER_LEASE_NAME, holder, SCHEDULER_LEASE_TTL_SECONDS)
+                if is_leader:
+                    lease_expires_at = renewing_at + SCHEDULER_LEASE_TTL_SECONDS
+            except Exception as e:
+                # Our lease row is still ours until it expires; stop before the next check would be too late
+                is_leader = scheduler is not None and time.monotonic() + renew_interval < lease_expires_at
+                logger.error(f"Error renewing scheduler lease: {e}")
+            
+            if is_leader and scheduler is None:
+                logger.info(f"Scheduler candidate {holder} acquired leadership")
+                scheduler = start_background_processes()
+            elif not is_leader and scheduler is not None:
+                logger.warning(f"Scheduler candidate {holder} lost leadership, stopping jobs")
+                scheduler.shutdown(wait=True)
+                scheduler = None
+            
+            stop_event.wait(renew_interval)
+    finally:
+        if scheduler is not None:
+            _shutdown_holding_lease(scheduler, holder, renew_interval)
+            release_lease(SCHEDULER_LEASE_NAME, holder)
+            logger.info(f"Scheduler candidate {holder} released leadership")
+
+def _shutdown_holding_lease(scheduler, holder: str, renew_interval: float):
+    """Shut the scheduler down once its running jobs finish, renewing the lease until then
+    so that the next leader does not start the same jobs alongside them"""
+    stopper = threading.Thread(target=scheduler.shutdown, kwargs={'wait': True}, daemon=True)
+    stopper.start()
+    stopper.join(renew_interval)
+    while stopper.is_alive():
+        try:
+            try_acquire_lease(SCHEDULER_LEASE_NAME, holder, SCHEDULER_LEASE_TTL_SECONDS)
+        except Exception as e:
+            logger.error(f"Error renewing scheduler lease while stopping jobs: {e}")
+        stopper.join(renew_interval)
@@ -1,103 +1,474 @@
+import os
+import time
 import logging
-from typing import List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from collections import Counter
+from typing import List, Dict, NamedTuple
 from .database import get_calendars, create_calendar as db_create_calendar, update_calendar_sync
-from .ics_parser import download_ics_content, parse_ics_content, calculate_content_hash
-from .database import create_event, Calendar
+from .ics_parser import download_ics, parse_ics_content, calculate_content_hash, HostCircuitOpenError
+from .circuit_breaker import host_breakers
+from .pending_signal import pending_signal
+from .database import create_event, Calendar, get_db_connection, get_read_connection, retry_on_locked
+from .database import record_sync_run, get_sync_runs, get_calendar_by_id
+from .database import record_calendar_failure, reset_calendar_failures
+from .database import refresh_event_reminders, format_reminder_offsets
+from .database import log_event_changes, log_feed_event_updates, prune_event_changes
+from .database import claim_sync_requests, complete_sync_request, get_sync_request, SyncRequest
+from .metrics import CALENDAR_DOWNLOAD_BYTES, CALENDAR_DOWNLOAD_SECONDS, CALENDAR_PARSE_SECONDS
+from .metrics import CALENDAR_EVENTS_UPSERTED, CALENDAR_EVENTS_DELETED, CALENDAR_SYNC_SKIPPED
+from .metrics import CALENDAR_SYNC_FAILURES, SYNC_CYCLE_SECONDS, SYNC_BACKOFF_SKIPPED
+from .metrics import SYNC_CIRCUIT_OPEN_SKIPPED
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def sync_calendar(calendar: Calendar) -> bool:
-    """Sync a single calendar using upsert logic"""
+# Global variables
+SYNC_REQUEST_WORKERS = int(os.environ.get('SYNC_REQUEST_WORKERS', 4))
+
+# Syncs currently running in this process, by calendar ID
+_in_flight_syncs = {}
+_in_flight_lock = threading.Lock()
+
+class SyncResult(NamedTuple):
+    """Outcome of one calendar's sync and the sequence number of the run recorded for it"""
+    success: bool
+    run_seq: int = None
+    error: str = None
+
+class _InFlightSync:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = SyncResult(False)
+
+class EventChanges(NamedTuple):
+    inserted: int
+    updated: int
+    deleted: int
+
+def _event_content(event_data: Dict) -> tuple:
+    return (event_data['summary'], event_data['description'], event_data['location'],
+            event_data['start'], event_data['end'], event_data['all_day'],
+            format_reminder_offsets(event_data.get('alarms') or None))
+
+@retry_on_locked
+def store_feed_events(feed_id: int, events: List[Dict], relink_calendar_ids=()) -> Dict[int, EventChanges]:
+    """Upsert the parsed events of a feed once and keep its subscriptions in step.
+    
+    Runs in a single transaction. Feed events whose content is unchanged are
+    not rewritten. New feed events are subscribed by every calendar of the
+    feed and removed ones are dropped from all of them; calendars in
+    relink_calendar_ids (new subscriptions) are subscribed to every feed
+    event. Reminders of new and changed subscriptions are rescheduled, and
+    every change is appended to the event change log. Returns the changes
+    as seen by each calendar of the feed.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
     try:
-        logger.info(f"Syncing calendar {calendar.id} from {calendar.url}")
+        # Get existing feed events
+        cursor.execute('SELECT uid, id FROM feed_events WHERE feed_id = ?', (feed_id,))
+        existing = dict(cursor.fetchall())
+        last_existing_id = max(existing.values(), default=0)
         
-        # Download ICS content
-        ics_content = download_ics_content(calendar.url)
+        cursor.execute('SELECT id, user_id FROM calendars WHERE feed_id = ?', (feed_id,))
+        calendar_users = dict(cursor.fetchall())
         
-        # Calculate hash to detect changes
-        content_hash = calculate_content_hash(ics_content)
-        
-        # Skip if no changes
-        if calendar.sync_hash == content_hash:
-            logger.info(f"Calendar {calendar.id} unchanged, skipping")
-            return True
-        
-        # Parse events
-        events = parse_ics_content(ics_content)
-        
-        # Update database
-        from .database import get_db_connection
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get existing event UIDs for this calendar
-        cursor.execute('SELECT uid FROM events WHERE calendar_id = ?', (calendar.id,))
-        existing_uids = {row[0] for row in cursor.fetchall()}
-        
-        # Track which events we're updating/inserting
-        updated_uids = set()
+        seen_uids = set()
+        updated_ids = set()
         
         # Upsert events
         for event_data in events:
             uid = event_data['uid']
-            updated_uids.add(uid)
+            seen_uids.add(uid)
+            content = _event_content(event_data)
             
-            # Try to update existing event
-            cursor.execute('''
-                UPDATE events
-                SET title = ?, description = ?, location = ?,
-                    start_datetime = ?, end_datetime = ?, all_day = ?
-                WHERE calendar_id = ? AND uid = ?
-            ''', (event_data['summary'], event_data['description'],
-                  event_data['location'], event_data['start'],
-                  event_data['end'], event_data['all_day'],
-                  calendar.id, uid))
-            
-            # If no rows were affected, insert new event
-            if cursor.rowcount == 0:
+            if uid in existing:
+                # Update the existing event only if something changed
+                cursor.execute('''
+                    UPDATE feed_events
+                    SET title = ?, description = ?, location = ?,
+                        start_datetime = ?, end_datetime = ?, all_day = ?, alarm_offsets = ?
+                    WHERE id = ?
+                      AND (title IS NOT ? OR description IS NOT ? OR location IS NOT ?
+                           OR start_datetime IS NOT ? OR end_datetime IS NOT ? OR all_day IS NOT ?
+                           OR alarm_offsets IS NOT ?)
+                ''', (*content, existing[uid], *content))
+                if cursor.rowcount:
+                    updated_ids.add(existing[uid])
+            else:
                 cursor.execute('''
-                    INSERT INTO events (calendar_id, uid, title, description, location,
-                                       start_datetime, end_datetime, all_day)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (calendar.id, uid, event_data['summary'],
-                      event_data['description'], event_data['location'],
-                      event_data['start'], event_data['end'], event_data['all_day']))
+                    INSERT INTO feed_events (feed_id, uid, title, description, location,
+                                             start_datetime, end_datetime, all_day, alarm_offsets)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (feed_id, uid, *content))
+                existing[uid] = cursor.lastrowid
+        
+        # Delete events that no longer exist in the feed, from every subscription
+        deleted = Counter()
+        removed_ids = [existing[uid] for uid in existing.keys() - seen_uids]
+        for i in range(0, len(removed_ids), 500):
+            batch = removed_ids[i:i + 500]
+            placeholders = ','.join('?' * len(batch))
+            cursor.execute(f'DELETE FROM events WHERE feed_event_id IN ({placeholders}) RETURNING id, calendar_id',
+                           batch)
+            removed_events = cursor.fetchall()
+            deleted.update(calendar_id for _, calendar_id in removed_events)
+            log_event_changes(cursor, 'delete', [(event_id, calendar_id, calendar_users.get(calendar_id))
+                                                 for event_id, calendar_id in removed_events])
+            cursor.executemany('DELETE FROM event_notifications WHERE event_id = ?',
+                               [(event_id,) for event_id, _ in removed_events])
+            cursor.executemany('DELETE FROM reminders WHERE event_id = ?',
+                               [(event_id,) for event_id, _ in removed_events])
+            cursor.execute(f'DELETE FROM feed_events WHERE id IN ({placeholders})', batch)
+        
+        # Subscribe all calendars of the feed to its new events, and new calendars to all of them
+        linked = cursor.execute('''
+            INSERT OR IGNORE INTO events (calendar_id, feed_event_id)
+            SELECT c.id, f.id FROM calendars c JOIN feed_events f ON f.feed_id = c.feed_id
+            WHERE c.feed_id = ? AND f.id > ?
+            RETURNING id, calendar_id, feed_event_id
+        ''', (feed_id, last_existing_id)).fetchall()
+        for calendar_id in relink_calendar_ids:
+            linked += cursor.execute('''
+                INSERT OR IGNORE INTO events (calendar_id, feed_event_id)
+                SELECT ?, id FROM feed_events WHERE feed_id = ?
+                RETURNING id, calendar_id, feed_event_id
+            ''', (calendar_id, feed_id)).fetchall()
+        cursor.executemany('INSERT OR IGNORE INTO event_notifications (event_id) VALUES (?)',
+                           [(event_id,) for event_id, _, _ in linked])
         
-        # Delete events that no longer exist in the calendar
-        deleted_uids = existing_uids - updated_uids
-        if deleted_uids:
-            placeholders = ','.join('?' * len(deleted_uids))
-            cursor.execute(f'''
-                DELETE FROM events
-                WHERE calendar_id = ? AND uid IN ({placeholders})
-            ''', (calendar.id, *deleted_uids))
+        # Schedule reminders of new subscriptions and reschedule those of changed events
+        linked_ids = {event_id for event_id, _, _ in linked}
+        updated_events = []
+        updated_list = list(updated_ids)
+        for i in range(0, len(updated_list), 500):
+            batch = updated_list[i:i + 500]
+            placeholders = ','.join('?' * len(batch))
+            cursor.execute(f'SELECT id, calendar_id FROM events WHERE feed_event_id IN ({placeholders})', batch)
+            updated_events.extend(row for row in cursor.fetchall() if row[0] not in linked_ids)
+        refresh_event_reminders(cursor, linked_ids.union(event_id for event_id, _ in updated_events))
+        
+        log_event_changes(cursor, 'insert', [(event_id, calendar_id, calendar_users.get(calendar_id))
+                                             for event_id, calendar_id, _ in linked])
+        log_feed_event_updates(cursor, feed_id, updated_ids)
+        
+        inserted = Counter(calendar_id for _, calendar_id, _ in linked)
+        inserted_updates = Counter(calendar_id for _, calendar_id, feed_event_id in linked
+                                   if feed_event_id in updated_ids)
         
         conn.commit()
+        pending_signal.notify()
+        return {calendar_id: EventChanges(inserted[calendar_id],
+                                          len(updated_ids) - inserted_updates[calendar_id],
+                                          deleted[calendar_id])
+                for calendar_id in calendar_users}
+    finally:
         conn.close()
+
+def store_calendar_events(calendar_id: int, events: List[Dict]) -> EventChanges:
+    """Store parsed events in the feed of a calendar and return the changes seen by that calendar"""
+    calendar = get_calendar_by_id(calendar_id)
+    return store_feed_events(calendar.feed_id, events, [calendar_id])[calendar_id]
+
+def diff_calendar_events(calendar_id: int, events: List[Dict]) -> EventChanges:
+    """Count the changes storing events would make to a calendar, without writing"""
+    conn = get_read_connection()
+    try:
+        rows = conn.execute('''
+            SELECT f.uid, f.title, f.description, f.location, f.start_datetime, f.end_datetime, f.all_day,
+                   f.alarm_offsets
+            FROM events e JOIN feed_events f ON e.feed_event_id = f.id
+            WHERE e.calendar_id = ?
+        ''', (calendar_id,)).fetchall()
+    finally:
+        conn.close()
+    existing = {row[0]: tuple(row[1:]) for row in rows}
+    
+    seen_uids = set()
+    inserted = updated = 0
+    for event_data in events:
+        uid = event_data['uid']
+        if uid in seen_uids:
+            continue
+        seen_uids.add(uid)
         
-        # Update sync metadata
-        update_calendar_sync(calendar.id, content_hash)
-        
-        logger.info(f"Synced calendar {calendar.id}: {len(events)} events, {len(deleted_uids)} deleted")
-        return True
+        current = existing.get(uid)
+        if current is None:
+            inserted += 1
+        elif current != _event_content(event_data):
+            updated += 1
+    
+    return EventChanges(inserted, updated, len(existing.keys() - seen_uids))
+
+def preview_calendar_sync(calendar: Calendar) -> Dict:
+    """Download a calendar and report what a sync would change, without writing anything"""
+    download = download_ics(calendar.url, calendar.sync_hash)
+    content_hash = calendar.sync_hash if download.unchanged else _content_hash(download)
+    if calendar.sync_hash == content_hash:
+        return {'bytes': download.size, 'unchanged': True, 'events': None,
+                'changes': EventChanges(0, 0, 0)}
+    
+    events = parse_ics_content(download.content)
+    return {'bytes': download.size, 'unchanged': False, 'events': len(events),
+            'changes': diff_calendar_events(calendar.id, events)}
+
+def _content_hash(download) -> str:
+    """Hash of the raw feed bytes, computed while streaming unless the download came from elsewhere"""
+    return download.content_hash or calculate_content_hash(download.content)
+
+def sync_calendar(calendar: Calendar) -> bool:
+    """Sync a single calendar using upsert logic and record the run in the sync history"""
+    return sync_feed([calendar])[calendar.id].success
+
+def sync_feed(calendars: List[Calendar]) -> Dict[int, SyncResult]:
+    """Download and parse one feed once and store its events for each of its subscribed calendars.
+    
+    All calendars must subscribe to the same feed. Every calendar gets its
+    own sync run in the history; download and parse metrics are recorded
+    once, against the first calendar. Returns the result by calendar ID.
+    """
+    started_at = datetime.now().isoformat()
+    started = time.perf_counter()
+    lead = calendars[0]
+    results = {}
+    
+    # The body is only left undecoded if every subscription already holds it
+    known_hashes = {calendar.sync_hash for calendar in calendars}
+    known_hash = known_hashes.pop() if len(known_hashes) == 1 else None
+    
+    try:
+        logger.info(f"Syncing feed {lead.url} for calendars {[calendar.id for calendar in calendars]}")
+        with CALENDAR_DOWNLOAD_SECONDS.time():
+            download = download_ics(lead.url, known_hash)
+        CALENDAR_DOWNLOAD_BYTES.inc(download.size, calendar_id=lead.id)
+    except Exception as e:
+        for calendar in calendars:
+            run = {}
+            success = _fail_calendar_sync(calendar, e, run)
+            run_seq = _record_sync_run(calendar.id, started_at, (time.perf_counter() - started) * 1000, run)
+            results[calendar.id] = SyncResult(success, run_seq, run.get('error'))
+        return results
+    
+    content_hash = known_hash if download.unchanged else _content_hash(download)
+    events = feed_changes = None
+    for calendar in calendars:
+        run = {'bytes': download.size, 'http_status': download.status_code}
+        success = False
+        try:
+            # Skip if no changes; the body of an unchanged feed is never decoded
+            if calendar.sync_hash == content_hash:
+                CALENDAR_SYNC_SKIPPED.inc(calendar_id=calendar.id)
+                run['skipped'] = True
+                if calendar.consecutive_failures:
+                    reset_calendar_failures(calendar.id)
+                logger.info(f"Calendar {calendar.id} unchanged, skipping")
+                success = True
+                continue
+            
+            # Parse and store events, once per feed
+            if feed_changes is None:
+                with CALENDAR_PARSE_SECONDS.time():
+                    events = parse_ics_content(download.content)
+                feed_changes = store_feed_events(lead.feed_id, events,
+                                                 [c.id for c in calendars if c.sync_hash is None])
+            changes = feed_changes.get(calendar.id, EventChanges(0, 0, 0))
+            run.update(changes._asdict())
+            CALENDAR_EVENTS_UPSERTED.inc(changes.inserted + changes.updated, calendar_id=calendar.id)
+            CALENDAR_EVENTS_DELETED.inc(changes.deleted, calendar_id=calendar.id)
+            
+            # Update sync metadata
+            update_calendar_sync(calendar.id, content_hash)
+            
+            logger.info(f"Synced calendar {calendar.id}: {len(events)} events, {changes.inserted} inserted, "
+                        f"{changes.updated} updated, {changes.deleted} deleted")
+            success = True
+        except Exception as e:
+            success = _fail_calendar_sync(calendar, e, run)
+        finally:
+            run_seq = _record_sync_run(calendar.id, started_at, (time.perf_counter() - started) * 1000, run)
+            results[calendar.id] = SyncResult(success, run_seq, run.get('error'))
+    
+    return results
+
+def _fail_calendar_sync(calendar: Calendar, error: Exception, run: Dict) -> bool:
+    """Count a failed calendar sync, note the error in its run and back the calendar off"""
+    CALENDAR_SYNC_FAILURES.inc(calendar_id=calendar.id)
+    response = getattr(error, 'response', None)
+    if response is not None:
+        run['http_status'] = response.status_code
+    run['error'] = str(error)[:500]
+    logger.error(f"Error syncing calendar {calendar.id}: {error}")
+    # A rejected download says nothing new about this feed, only about its host
+    if not isinstance(error, HostCircuitOpenError):
+        _record_calendar_failure(calendar.id, run['error'])
+    return False
+
+def _record_calendar_failure(calendar_id: int, error: str):
+    """Back off a failing calendar; failing to record it never fails the sync"""
+    try:
+        delay = record_calendar_failure(calendar_id, error)
+        logger.warning(f"Calendar {calendar_id} backing off for {delay:.0f}s")
+    except Exception as e:
+        logger.warning(f"Could not record sync failure for calendar {calendar_id}: {e}")
+
+def _record_sync_run(calendar_id: int, started_at: str, duration_ms: float, run: Dict) -> int:
+    """Store a sync run in the history and return its sequence number; failing to record it never fails the sync"""
+    try:
+        return record_sync_run(calendar_id, started_at, round(duration_ms, 3), **run)
+    except Exception as e:
+        logger.warning(f"Could not record sync run for calendar {calendar_id}: {e}")
+        return None
+
+def get_sync_stats(calendar_id: int) -> Dict:
+    """Summarize the recorded sync runs of a calendar"""
+    runs = get_sync_runs(calendar_id)
+    durations = sorted(run.duration_ms for run in runs)
+    sizes = [run.bytes for run in runs if run.bytes is not None]
+    failures = [run for run in runs if run.error]
+    successes = [run for run in runs if not run.error]
+    
+    return {
+        'runs': len(runs),
+        'failures': len(failures),
+        'skipped_unchanged': sum(1 for run in runs if run.skipped),
+        'duration_ms': {
+            'avg': round(sum(durations) / len(durations), 3) if durations else None,
+            'p50': durations[(len(durations) - 1) // 2] if durations else None,
+            'p95': durations[max(0, -(-len(durations) * 95 // 100) - 1)] if durations else None,
+            'max': durations[-1] if durations else None,
+        },
+        'bytes': {
+            'avg': round(sum(sizes) / len(sizes)) if sizes else None,
+            'max': max(sizes) if sizes else None,
+        },
+        'events': {
+            'inserted': sum(run.inserted for run in runs),
+            'updated': sum(run.updated for run in runs),
+            'deleted': sum(run.deleted for run in runs),
+        },
+        'last_success_at': successes[0].started_at if successes else None,
+        'last_error': failures[0].error if failures else None,
+    }
+
+def sync_calendar_coalesced(calendar: Calendar) -> SyncResult:
+    """Sync a calendar, joining a sync of the same calendar already running in this process"""
+    return sync_feed_coalesced([calendar])[calendar.id]
+
+def sync_feed_coalesced(calendars: List[Calendar]) -> Dict[int, SyncResult]:
+    """Sync the calendars of one feed, joining syncs of any of them already running in this process"""
+    owned, joined = [], {}
+    with _in_flight_lock:
+        for calendar in calendars:
+            flight = _in_flight_syncs.get(calendar.id)
+            if flight is None:
+                _in_flight_syncs[calendar.id] = _InFlightSync()
+                owned.append(calendar)
+            else:
+                joined[calendar.id] = flight
+    
+    results = {}
+    try:
+        if owned:
+            results = sync_feed(owned)
+    finally:
+        with _in_flight_lock:
+            flights = [_in_flight_syncs.pop(calendar.id) for calendar in owned]
+        for calendar, flight in zip(owned, flights):
+            flight.result = results.get(calendar.id, SyncResult(False))
+            flight.done.set()
+    
+    for calendar_id, flight in joined.items():
+        logger.info(f"Calendar {calendar_id} sync already in flight, waiting for it")
+        flight.done.wait()
+        results[calendar_id] = flight.result
+    return results
+
+def _process_sync_request(request: SyncRequest):
+    """Run one claimed on-demand sync request and store its outcome"""
+    try:
+        calendar = get_calendar_by_id(request.calendar_id)
+        if not calendar:
+            complete_sync_request(request.calendar_id, request.generation, False, error='Calendar not found')
+            return
         
+        # A joined sync reports the run recorded by the sync it joined
+        result = sync_calendar_coalesced(calendar)
+        complete_sync_request(calendar.id, request.generation, result.success,
+                              run_seq=result.run_seq, error=result.error)
     except Exception as e:
-        logger.error(f"Error syncing calendar {calendar.id}: {e}")
-        return False
+        logger.error(f"Error processing sync request for calendar {request.calendar_id}: {e}")
+        complete_sync_request(request.calendar_id, request.generation, False, error=str(e)[:500])
+
+def process_sync_requests() -> int:
+    """Run all pending on-demand sync requests; returns the number processed"""
+    requests = claim_sync_requests()
+    if not requests:
+        return 0
+    
+    logger.info(f"Processing {len(requests)} on-demand sync requests")
+    with ThreadPoolExecutor(max_workers=min(SYNC_REQUEST_WORKERS, len(requests))) as executor:
+        list(executor.map(_process_sync_request, requests))
+    return len(requests)
+
+def wait_for_sync_request(calendar_id: int, generation: int, timeout: float,
+                          poll_interval: float = 0.2) -> SyncRequest:
+    """Poll a sync request until it finishes or the timeout expires and return its latest state"""
+    deadline = time.monotonic() + timeout
+    while True:
+        request = get_sync_request(calendar_id)
+        if (request is None or request.generation != generation
+                or request.status in ('done', 'failed') or time.monotonic() >= deadline):
+            return request
+        time.sleep(min(poll_interval, max(0.0, deadline - time.monotonic())))
+
+def group_calendars_by_feed(calendars: List[Calendar]) -> List[List[Calendar]]:
+    """Group calendars by the feed they subscribe to, in order of first appearance"""
+    feeds = {}
+    for calendar in calendars:
+        feeds.setdefault(calendar.feed_id if calendar.feed_id is not None else calendar.url, []).append(calendar)
+    return list(feeds.values())
 
 def sync_all_calendars():
     """Sync all calendars"""
     logger.info("Starting calendar synchronization")
+    started = time.perf_counter()
     
-    calendars = get_calendars()
+    # Calendars that failed recently wait out their backoff
+    now = time.time()
+    all_calendars = get_calendars()
+    calendars = [calendar for calendar in all_calendars
+                 if not calendar.next_sync_after or calendar.next_sync_after <= now]
+    backing_off = len(all_calendars) - len(calendars)
+    if backing_off:
+        SYNC_BACKOFF_SKIPPED.inc(backing_off)
+        logger.info(f"Skipping {backing_off} calendars in failure backoff")
     success_count = 0
+    circuit_open_count = 0
     
-    for calendar in calendars:
-        if sync_calendar(calendar):
-            success_count += 1
+    # Each feed is downloaded and parsed once for all of its subscriptions
+    feeds = group_calendars_by_feed(calendars)
+    
+    for feed_calendars in feeds:
+        # Checked per feed, so a host that goes down mid-cycle stops costing timeouts
+        if host_breakers.is_open(feed_calendars[0].url):
+            circuit_open_count += len(feed_calendars)
+            continue
+        success_count += sum(result.success for result in sync_feed_coalesced(feed_calendars).values())
+    
+    if circuit_open_count:
+        SYNC_CIRCUIT_OPEN_SKIPPED.inc(circuit_open_count)
+        logger.info(f"Skipped {circuit_open_count} calendars on hosts with an open circuit")
+    
+    pruned = prune_event_changes()
+    if pruned:
+        logger.info(f"Pruned {pruned} event changes")
     
-    logger.info(f"Calendar synchronization complete: {success_count}/{len(calendars)} successful")
+    SYNC_CYCLE_SECONDS.observe(time.perf_counter() - started)
+    logger.info(f"Calendar synchronization complete: {success_count}/{len(calendars) - circuit_open_count} "
+                f"successful from {len(feeds)} feeds")
 
 def create_calendar(user_id: int, url: str) -> Calendar:
     """Create a new calendar for a user"""
@@ -0,0 +1,123 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict
+from urllib.parse import urlsplit
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Global variables
+HOST_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('HOST_BREAKER_FAILURE_THRESHOLD', 3))
+HOST_BREAKER_RESET_SECONDS = float(os.environ.get('HOST_BREAKER_RESET_SECONDS', 60))
+HOST_BREAKER_MAX_RESET_SECONDS = float(os.environ.get('HOST_BREAKER_MAX_RESET_SECONDS', 3600))
+HOST_BREAKER_PROBE_TIMEOUT_SECONDS = float(os.environ.get('HOST_BREAKER_PROBE_TIMEOUT_SECONDS', 120))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe.
+    
+    After failure_threshold consecutive failures the breaker opens and
+    rejects calls for reset_seconds. Then one probe call is let through
+    (half-open): success closes the breaker, failure opens it again with the
+    open period doubled, up to max_reset_seconds. A probe that reports
+    neither within probe_timeout_seconds is considered lost, and the next
+    call becomes a new probe.
+    """
+    
+    def __init__(self, failure_threshold: int = None, reset_seconds: float = None,
+                 max_reset_seconds: float = None, probe_timeout_seconds: float = None,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold or HOST_BREAKER_FAILURE_THRESHOLD
+        self.reset_seconds = reset_seconds or HOST_BREAKER_RESET_SECONDS
+        self.max_reset_seconds = max_reset_seconds or HOST_BREAKER_MAX_RESET_SECONDS
+        self.probe_timeout_seconds = probe_timeout_seconds or HOST_BREAKER_PROBE_TIMEOUT_SECONDS
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.open_seconds = self.reset_seconds
+        self.opened_until = 0.0
+        self.probe_deadline = 0.0
+        self._lock = threading.Lock()
+    
+    def is_open(self) -> bool:
+        """True if calls are currently rejected (open and not yet due for a probe, or probing)"""
+        with self._lock:
+            if self.state == OPEN:
+                return self.clock() < self.opened_until
+            return self.state == HALF_OPEN and self.clock() < self.probe_deadline
+    
+    def allow_request(self) -> bool:
+        """Check whether a call may proceed; moves an expired open breaker to half-open"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = self.clock()
+            if ((self.state == OPEN and now >= self.opened_until)
+                    or (self.state == HALF_OPEN and now >= self.probe_deadline)):
+                # Let exactly one probe through at a time
+                self.state = HALF_OPEN
+                self.probe_deadline = now + self.probe_timeout_seconds
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.open_seconds = self.reset_seconds
+    
+    def record_failure(self) -> bool:
+        """Count a failure; returns True if the breaker (re)opened"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.open_seconds = min(self.open_seconds * 2, self.max_reset_seconds)
+            else:
+                self.failures += 1
+                if self.state == OPEN or self.failures < self.failure_threshold:
+                    return False
+                self.open_seconds = self.reset_seconds
+            self.state = OPEN
+            self.opened_until = self.clock() + self.open_seconds
+            return True
+
+def host_key(url: str) -> str:
+    """Breaker key of a URL: lower-cased host and port"""
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    return f'{host}:{parts.port}' if parts.port else host
+
+class HostCircuitBreakers:
+    """One CircuitBreaker per feed host, shared by all calendars on that host"""
+    
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, url: str) -> CircuitBreaker:
+        key = host_key(url)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker()
+            return breaker
+    
+    def is_open(self, url: str) -> bool:
+        key = host_key(url)
+        breaker = self._breakers.get(key)
+        return breaker is not None and breaker.is_open()
+    
+    def states(self) -> Dict[str, str]:
+        with self._lock:
+            return {key: breaker.state for key, breaker in self._breakers.items()}
+    
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+# Breakers used for ICS downloads in this process
+host_breakers = HostCircuitBreakers()
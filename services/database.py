@@ -1,71 +1,317 @@
 import sqlite3
 import os
+import heapq
 import logging
+import time
 from datetime import datetime
-from typing import List
+from functools import wraps
+from itertools import islice
+from pathlib import Path
+from operator import attrgetter, itemgetter
+from typing import Dict, List, NamedTuple
+from urllib.parse import urlsplit, urlunsplit
+from .metrics import DB_LOCK_WAIT_SECONDS, DB_LOCK_RETRIES, PENDING_QUERY_SECONDS, PENDING_EVENTS
+from .metrics import NOTIFICATION_LAG_SECONDS
+from .profiling import connection_factory, current_profile, ProfiledCursor
+from .pending_signal import pending_signal
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Global variables
 _DB_PATH = os.environ.get('DB_PATH', 'icsgate.db')
+DB_JOURNAL_MODE = os.environ.get('DB_JOURNAL_MODE', 'WAL')
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+DB_WRITE_RETRIES = int(os.environ.get('DB_WRITE_RETRIES', 3))
+DB_WRITE_RETRY_DELAY = float(os.environ.get('DB_WRITE_RETRY_DELAY', 0.2))
+SYNC_RUNS_RETENTION = int(os.environ.get('SYNC_RUNS_RETENTION', 50))
+SYNC_REQUEST_STALE_SECONDS = float(os.environ.get('SYNC_REQUEST_STALE_SECONDS', 300))
+SYNC_FAILURE_BACKOFF_SECONDS = float(os.environ.get('SYNC_FAILURE_BACKOFF_SECONDS', 60))
+SYNC_FAILURE_BACKOFF_MAX_SECONDS = float(os.environ.get('SYNC_FAILURE_BACKOFF_MAX_SECONDS', 6 * 3600))
+EVENT_CHANGES_RETENTION_DAYS = float(os.environ.get('EVENT_CHANGES_RETENTION_DAYS', 7))
 
 def set_db_path(db_path: str):
     """Set the database path"""
     global _DB_PATH
     _DB_PATH = db_path
 
+# Statements before which sqlite3 implicitly opens a transaction
+_WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+def _begin_write(cursor, sql: str):
+    """Open the transaction of a first write with BEGIN IMMEDIATE, timing the wait for the write lock.
+    
+    sqlite3 would otherwise issue the BEGIN itself and the busy wait would be
+    hidden in the statement. Connections that manage their own transactions
+    (isolation_level None) are left alone.
+    """
+    conn = cursor.connection
+    if conn.in_transaction or conn.isolation_level is None:
+        return
+    if not sql.lstrip()[:7].upper().startswith(_WRITE_STATEMENTS):
+        return
+    with DB_LOCK_WAIT_SECONDS.time():
+        sqlite3.Cursor.execute(cursor, 'BEGIN IMMEDIATE')
+
+class WriteCursor(sqlite3.Cursor):
+    """Cursor that takes the write lock explicitly before the first write of a transaction"""
+    
+    def execute(self, sql, *args):
+        _begin_write(self, sql)
+        return super().execute(sql, *args)
+    
+    def executemany(self, sql, *args):
+        _begin_write(self, sql)
+        return super().executemany(sql, *args)
+
+class ProfiledWriteCursor(WriteCursor, ProfiledCursor):
+    """WriteCursor that also reports to the current request profile"""
+
+class WriteConnection(sqlite3.Connection):
+    """Connection whose cursors time the wait for the write lock"""
+    cursor_class = WriteCursor
+    
+    def cursor(self, factory=None):
+        return super().cursor(factory or self.cursor_class)
+    
+    # Connection.execute does not go through cursor(), so route it explicitly
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+    
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+class ProfiledWriteConnection(WriteConnection):
+    """WriteConnection whose cursors also report to the current request profile"""
+    cursor_class = ProfiledWriteCursor
+
 def get_db_connection():
     """Get a database connection"""
     print(f"Connecting to database: {_DB_PATH}")
-    conn = sqlite3.connect(_DB_PATH)
+    conn = sqlite3.connect(_DB_PATH, timeout=DB_BUSY_TIMEOUT_MS / 1000.0,
+                           factory=ProfiledWriteConnection if current_profile() else WriteConnection)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def get_read_connection():
+    """Get a dedicated read-only database connection for API reads.
+
+    With the database in WAL mode, readers see the last committed snapshot and
+    neither wait on nor block a running sync transaction.
+    """
+    if _DB_PATH == ':memory:':
+        return get_db_connection()
+    
+    uri = Path(_DB_PATH).resolve().as_uri() + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True, timeout=DB_BUSY_TIMEOUT_MS / 1000.0,
+                           factory=connection_factory())
     conn.row_factory = sqlite3.Row
     return conn
 
+def _is_lock_error(error: sqlite3.OperationalError) -> bool:
+    """Check whether an OperationalError was caused by lock contention"""
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+def retry_on_locked(func):
+    """Retry a write operation with exponential backoff when the database is locked.
+
+    Each attempt already waits up to DB_BUSY_TIMEOUT_MS for the lock; the
+    operation is retried at most DB_WRITE_RETRIES times before the error is
+    raised, so it must be safe to re-run from the start.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(DB_WRITE_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not _is_lock_error(e) or attempt == DB_WRITE_RETRIES:
+                    raise
+                delay = DB_WRITE_RETRY_DELAY * (2 ** attempt)
+                DB_LOCK_RETRIES.inc(operation=func.__name__)
+                logger.warning(f"Database locked in {func.__name__}, retrying in {delay:.2f}s: {e}")
+                time.sleep(delay)
+    return wrapper
+
+def configure_journal_mode():
+    """Switch the database to the configured journal mode (WAL by default)"""
+    if _DB_PATH == ':memory:':
+        return
+    
+    conn = get_db_connection()
+    try:
+        mode = conn.execute(f'PRAGMA journal_mode={DB_JOURNAL_MODE}').fetchone()[0]
+        logger.info(f"Database journal mode: {mode}")
+    finally:
+        conn.close()
+
 # Database initialization
-def init_db():
+def init_db(background_online_migrations: bool = False):
     """Initialize the database by running all migrations"""
     logger.info("Initializing database")
     
+    # Switch journal mode first, while no migration holds a transaction
+    configure_journal_mode()
+    
     # Run migrations
     try:
         from migrations.migration_manager import run_all_migrations
-        run_all_migrations()
+        run_all_migrations(background_online=background_online_migrations)
     except Exception as e:
         logger.error(f"Error running migrations: {e}")
         raise
 
 # Database models
-class User:
-    def __init__(self, id: int, user_id: str, created_at: str):
-        self.id = id
-        self.user_id = user_id
-        self.created_at = created_at
-
-class Calendar:
-    def __init__(self, id: int, user_id: int, url: str, last_sync_at: str, sync_hash: str, timezone: str = 'GMT+3'):
-        self.id = id
-        self.user_id = user_id
-        self.url = url
-        self.last_sync_at = last_sync_at
-        self.sync_hash = sync_hash
-        self.timezone = timezone
-
-class Event:
-    def __init__(self, id: int, calendar_id: int, uid: str, title: str, description: str,
-                 location: str, start_datetime: str, end_datetime: str, all_day: bool, notified: bool, user_id: str = None, calendar_timezone: str = None):
-        self.id = id
-        self.calendar_id = calendar_id
-        self.uid = uid
-        self.title = title
-        self.description = description
-        self.location = location
-        self.start_datetime = start_datetime
-        self.end_datetime = end_datetime
-        self.all_day = all_day
-        self.notified = notified
-        self.user_id = user_id
-        self.calendar_timezone = calendar_timezone
+class User(NamedTuple):
+    id: int
+    user_id: str
+    created_at: str
+    reminder_offsets: str = None
+
+class Calendar(NamedTuple):
+    id: int
+    user_id: int
+    url: str
+    last_sync_at: str
+    sync_hash: str
+    timezone: str = 'GMT+3'
+    consecutive_failures: int = 0
+    next_sync_after: float = None
+    last_error: str = None
+    feed_id: int = None
+    reminder_offsets: str = None
+
+class Event(NamedTuple):
+    id: int
+    calendar_id: int
+    uid: str
+    title: str
+    description: str
+    location: str
+    start_datetime: str
+    end_datetime: str
+    all_day: bool
+    notified: bool
+    user_id: str = None
+    calendar_timezone: str = None
+    reminder_minutes: int = None
+    start_at: float = None
+
+class SyncRun(NamedTuple):
+    calendar_id: int
+    seq: int
+    started_at: str
+    duration_ms: float
+    bytes: int
+    http_status: int
+    inserted: int
+    updated: int
+    deleted: int
+    skipped: bool
+    error: str
+
+class SyncRequest(NamedTuple):
+    calendar_id: int
+    generation: int
+    status: str
+    requested_at: float
+    started_at: float = None
+    finished_at: float = None
+    run_seq: int = None
+    error: str = None
+
+class EventChange(NamedTuple):
+    seq: int
+    event_id: int
+    calendar_id: int
+    op: str
+    changed_at: float
+    # Current content of the event; None once it was deleted
+    uid: str = None
+    title: str = None
+    description: str = None
+    location: str = None
+    start_datetime: str = None
+    end_datetime: str = None
+    all_day: bool = None
+
+class EventChangePage(NamedTuple):
+    changes: List[EventChange]
+    has_more: bool
+
+# Compiled row mappers, keyed by model and result column layout
+_row_mappers = {}
+
+def _compile_row_mapper(model, columns):
+    """Compile a mapper from a result column layout onto the model fields"""
+    key = (model, columns)
+    mapper = _row_mappers.get(key)
+    if mapper is not None:
+        return mapper
+    
+    positions = {}
+    for index, name in enumerate(columns):
+        positions.setdefault(name, index)
+    
+    if all(field in positions for field in model._fields):
+        getter = itemgetter(*(positions[field] for field in model._fields))
+        make = model._make
+        
+        def mapper(row):
+            return make(getter(row))
+    else:
+        # Older schemas may lack some columns; fill those from the model defaults
+        plan = tuple((positions.get(field), model._field_defaults.get(field))
+                     for field in model._fields)
+        make = model._make
+        
+        def mapper(row):
+            return make([row[index] if index is not None else default for index, default in plan])
+    
+    _row_mappers[key] = mapper
+    return mapper
+
+def model_row_factory(model):
+    """Build a sqlite3 row factory that maps result rows straight onto a model tuple.
+
+    The column layout is resolved once per executed statement from
+    cursor.description; columns missing from the result set fall back to the
+    model's field defaults, so the same factory works for older schemas and
+    for joined queries.
+    """
+    description = None
+    mapper = None
+
+    def factory(cursor, row):
+        nonlocal description, mapper
+        if cursor.description is not description:
+            description = cursor.description
+            mapper = _compile_row_mapper(model, tuple(column[0] for column in description))
+        return mapper(row)
+
+    return factory
+
+# User id resolution
+def resolve_user_internal_id(cursor, user_id: str) -> int:
+    """Resolve an external user_id to the internal users.id, raising if the user does not exist"""
+    cursor.execute('SELECT id FROM users WHERE user_id = ?', (user_id,))
+    user_row = cursor.fetchone()
+    if not user_row:
+        raise ValueError(f"User {user_id} not found")
+    return user_row[0]
+
+def _fetch_user_rows(cursor, user_id: str) -> list:
+    """Fetch the rows of a query filtered on users.user_id, raising if it is empty because the user does not exist.
+    
+    Reads filter by joining users in the same statement, so only an empty
+    result costs the extra existence check.
+    """
+    rows = cursor.fetchall()
+    if not rows:
+        cursor.row_factory = None
+        resolve_user_internal_id(cursor, user_id)
+    return rows
 
 # Database operations
 def create_user(user_id: str) -> User:
@@ -89,11 +335,77 @@ def create_user(user_id: str) -> User:
         return User(user_row_id, user_id, datetime.now().isoformat())
     except sqlite3.IntegrityError:
         logger.warning(f"User {user_id} already exists")
+        cursor.row_factory = model_row_factory(User)
         cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-        row = cursor.fetchone()
-        return User(row['id'], row['user_id'], row['created_at'])
+        return cursor.fetchone()
+    finally:
+        conn.close()
+
+# Feeds
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def normalize_feed_url(url: str) -> str:
+    """Normalize a feed URL so that equivalent subscriptions share one feed.
+    
+    The scheme and host are lowercased, default ports and fragments are
+    dropped and an empty path becomes '/'. The path and query are kept as
+    they are, since servers may treat them case-sensitively.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f'[{host}]'
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or port == _DEFAULT_PORTS.get(scheme) else f'{host}:{port}'
+    if parts.username is not None:
+        userinfo = parts.username + (f':{parts.password}' if parts.password is not None else '')
+        netloc = f'{userinfo}@{netloc}'
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+def _get_or_create_feed(cursor, url: str) -> int:
+    """Return the id of the feed for url, creating it if needed"""
+    feed_url = normalize_feed_url(url)
+    cursor.execute('INSERT OR IGNORE INTO feeds (url) VALUES (?)', (feed_url,))
+    return cursor.execute('SELECT id FROM feeds WHERE url = ?', (feed_url,)).fetchone()[0]
+
+@retry_on_locked
+def seed_calendars(calendars: Dict[str, str]) -> int:
+    """Idempotently create users and calendars from a {user_id: url} mapping.
+    
+    Runs as one bulk upsert in a single transaction and returns the number of
+    calendars that were newly created.
+    """
+    if not calendars:
+        return 0
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.executemany(
+            'INSERT OR IGNORE INTO users (user_id) VALUES (?)',
+            [(user_id,) for user_id in calendars]
+        )
+        cursor.executemany(
+            'INSERT OR IGNORE INTO feeds (url) VALUES (?)',
+            [(normalize_feed_url(url),) for url in calendars.values()]
+        )
+        before = conn.total_changes
+        cursor.executemany('''
+            INSERT OR IGNORE INTO calendars (user_id, url, feed_id)
+            SELECT users.id, ?, feeds.id FROM users, feeds WHERE users.user_id = ? AND feeds.url = ?
+        ''', [(url, user_id, normalize_feed_url(url)) for user_id, url in calendars.items()])
+        created = conn.total_changes - before
+        conn.commit()
     finally:
         conn.close()
+    
+    logger.info(f"Seeded {len(calendars)} configured calendars ({created} new)")
+    return created
 
 def create_calendar(user_id: int, url: str) -> Calendar:
     """Create a new calendar for a user"""
@@ -101,28 +413,26 @@ def create_calendar(user_id: int, url: str) -> Calendar:
     cursor = conn.cursor()
     
     try:
+        feed_id = _get_or_create_feed(cursor, url)
         cursor.execute(
-            'INSERT INTO calendars (user_id, url) VALUES (?, ?)',
-            (user_id, url)
+            'INSERT INTO calendars (user_id, url, feed_id) VALUES (?, ?, ?)',
+            (user_id, url, feed_id)
         )
         conn.commit()
         calendar_id = cursor.lastrowid
         logger.info(f"Created calendar {calendar_id} for user {user_id}")
-        calendar = Calendar(calendar_id, user_id, url, None, None, 'GMT+3')
+        calendar = Calendar(calendar_id, user_id, url, None, None, 'GMT+3', feed_id=feed_id)
     except sqlite3.IntegrityError as e:
         # Handle duplicate calendar entry
         conn.rollback()
         logger.warning(f"Calendar for user {user_id} with URL {url} already exists: {e}")
+        cursor.row_factory = model_row_factory(Calendar)
         cursor.execute(
             'SELECT * FROM calendars WHERE user_id = ? AND url = ?',
             (user_id, url)
         )
-        row = cursor.fetchone()
-        if row:
-            calendar = Calendar(row['id'], row['user_id'], row['url'],
-                                  row['last_sync_at'], row['sync_hash'],
-                                  row['timezone'] if 'timezone' in row.keys() else 'GMT+3')
-        else:
+        calendar = cursor.fetchone()
+        if not calendar:
             raise Exception("Failed to retrieve existing calendar")
     finally:
         conn.close()
@@ -131,28 +441,22 @@ def create_calendar(user_id: int, url: str) -> Calendar:
 
 def get_calendars(user_id: str = None) -> List[Calendar]:
     """Get all calendars, optionally filtered by user_id"""
-    conn = get_db_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     
-    if user_id:
-        # First get the user's internal ID
-        cursor.execute('SELECT id FROM users WHERE user_id = ?', (user_id,))
-        user_row = cursor.fetchone()
-        if not user_row:
-            conn.close()
-            raise ValueError(f"User {user_id} not found")
-        user_internal_id = user_row['id']
-        
-        cursor.execute('SELECT * FROM calendars WHERE user_id = ?', (user_internal_id,))
-    else:
-        cursor.execute('SELECT * FROM calendars')
-    
-    rows = cursor.fetchall()
-    conn.close()
+    try:
+        cursor.row_factory = model_row_factory(Calendar)
+        if user_id:
+            cursor.execute('SELECT c.* FROM calendars c JOIN users u ON c.user_id = u.id WHERE u.user_id = ?',
+                           (user_id,))
+            calendars = _fetch_user_rows(cursor, user_id)
+        else:
+            cursor.execute('SELECT * FROM calendars')
+            calendars = cursor.fetchall()
+    finally:
+        conn.close()
     
-    return [Calendar(row['id'], row['user_id'], row['url'],
-                 row['last_sync_at'], row['sync_hash'],
-                 row['timezone'] if 'timezone' in row.keys() else 'GMT+3') for row in rows]
+    return calendars
 
 def delete_calendar(calendar_id: int, user_id: str = None) -> bool:
     """Delete a calendar by ID, optionally checking user ownership"""
@@ -160,21 +464,42 @@ def delete_calendar(calendar_id: int, user_id: str = None) -> bool:
     cursor = conn.cursor()
     
     if user_id:
-        # First get the user's internal ID
-        cursor.execute('SELECT id FROM users WHERE user_id = ?', (user_id,))
-        user_row = cursor.fetchone()
-        if not user_row:
-            conn.close()
-            raise ValueError(f"User {user_id} not found")
-        user_internal_id = user_row['id']
-        
         # Delete only if the calendar belongs to this user
-        cursor.execute('DELETE FROM calendars WHERE id = ? AND user_id = ?', (calendar_id, user_internal_id))
+        cursor.execute('''
+            DELETE FROM calendars WHERE id = ? AND user_id = (SELECT id FROM users WHERE user_id = ?)
+            RETURNING feed_id, user_id
+        ''', (calendar_id, user_id))
     else:
         # Delete any calendar (admin access)
-        cursor.execute('DELETE FROM calendars WHERE id = ?', (calendar_id,))
+        cursor.execute('DELETE FROM calendars WHERE id = ? RETURNING feed_id, user_id', (calendar_id,))
     
-    deleted = cursor.rowcount > 0
+    row = cursor.fetchone()
+    deleted = row is not None
+    if not deleted and user_id:
+        # Only a miss needs to tell an unknown user apart from a calendar it does not own
+        try:
+            resolve_user_internal_id(cursor, user_id)
+        except ValueError:
+            conn.rollback()
+            conn.close()
+            raise
+    if deleted:
+        cursor.execute('DELETE FROM sync_runs WHERE calendar_id = ?', (calendar_id,))
+        cursor.execute('DELETE FROM sync_requests WHERE calendar_id = ?', (calendar_id,))
+        cursor.execute('''
+            DELETE FROM event_notifications WHERE event_id IN (SELECT id FROM events WHERE calendar_id = ?)
+        ''', (calendar_id,))
+        cursor.execute('''
+            DELETE FROM reminders WHERE event_id IN (SELECT id FROM events WHERE calendar_id = ?)
+        ''', (calendar_id,))
+        cursor.execute('DELETE FROM events WHERE calendar_id = ? RETURNING id', (calendar_id,))
+        log_event_changes(cursor, 'delete', [(event_id, calendar_id, row[1]) for event_id, in cursor.fetchall()])
+        # Drop the feed and its events with its last subscription
+        cursor.execute('''
+            DELETE FROM feeds WHERE id = ? AND NOT EXISTS (SELECT 1 FROM calendars WHERE feed_id = ?)
+        ''', (row[0], row[0]))
+        if cursor.rowcount:
+            cursor.execute('DELETE FROM feed_events WHERE feed_id = ?', (row[0],))
     conn.commit()
     conn.close()
     
@@ -182,157 +507,750 @@ def delete_calendar(calendar_id: int, user_id: str = None) -> bool:
 
 def get_calendar_by_id(calendar_id: int) -> Calendar:
     """Get a specific calendar by ID"""
-    conn = get_db_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
+    cursor.row_factory = model_row_factory(Calendar)
     
     cursor.execute('SELECT * FROM calendars WHERE id = ?', (calendar_id,))
-    row = cursor.fetchone()
+    calendar = cursor.fetchone()
     conn.close()
     
-    if row:
-        return Calendar(row['id'], row['user_id'], row['url'],
-                          row['last_sync_at'], row['sync_hash'],
-                          row['timezone'] if 'timezone' in row.keys() else 'GMT+3')
-    else:
-        return None
+    return calendar
 
+@retry_on_locked
 def update_calendar_sync(calendar_id: int, sync_hash: str):
     """Update calendar sync metadata"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cursor.execute(
-        'UPDATE calendars SET last_sync_at = ?, sync_hash = ? WHERE id = ?',
-        (datetime.now().isoformat(), sync_hash, calendar_id)
-    )
-    conn.commit()
-    conn.close()
+    try:
+        cursor.execute('''
+            UPDATE calendars
+            SET last_sync_at = ?, sync_hash = ?,
+                consecutive_failures = 0, next_sync_after = NULL, last_error = NULL
+            WHERE id = ?
+        ''', (datetime.now().isoformat(), sync_hash, calendar_id))
+        conn.commit()
+    finally:
+        conn.close()
     
     logger.info(f"Updated sync metadata for calendar {calendar_id}")
 
+@retry_on_locked
+def reset_calendar_failures(calendar_id: int):
+    """Clear the failure count and backoff of a calendar after a successful sync"""
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            UPDATE calendars SET consecutive_failures = 0, next_sync_after = NULL, last_error = NULL
+            WHERE id = ?
+        ''', (calendar_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+@retry_on_locked
+def record_calendar_failure(calendar_id: int, error: str) -> float:
+    """Count a failed sync and back the calendar off exponentially.
+    
+    Returns the number of seconds until the calendar is synced again by the
+    periodic sync: SYNC_FAILURE_BACKOFF_SECONDS doubled per consecutive
+    failure, capped at SYNC_FAILURE_BACKOFF_MAX_SECONDS.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            UPDATE calendars SET consecutive_failures = consecutive_failures + 1, last_error = ?
+            WHERE id = ?
+            RETURNING consecutive_failures
+        ''', (error, calendar_id))
+        row = cursor.fetchone()
+        if row is None:
+            conn.commit()
+            return 0.0
+        
+        delay = min(SYNC_FAILURE_BACKOFF_SECONDS * 2 ** min(row[0] - 1, 32), SYNC_FAILURE_BACKOFF_MAX_SECONDS)
+        cursor.execute('UPDATE calendars SET next_sync_after = ? WHERE id = ?', (time.time() + delay, calendar_id))
+        conn.commit()
+    finally:
+        conn.close()
+    
+    return delay
+
+# Reminders
+def parse_reminder_offsets(value: str) -> List[int]:
+    """Parse a stored reminder schedule such as "1440,60,10" into minutes before the start"""
+    if value is None:
+        return None
+    return [int(minutes) for minutes in value.split(',') if minutes]
+
+def format_reminder_offsets(offsets) -> str:
+    """Format reminder offsets for storage; None (inherit) is stored as NULL"""
+    if offsets is None:
+        return None
+    return ','.join(str(minutes) for minutes in sorted(set(offsets), reverse=True))
+
+def refresh_event_reminders(cursor, event_ids) -> int:
+    """Recompute the reminder fire times of events, in the caller's transaction.
+    
+    An event is reminded at the offsets of its calendar, else of its user,
+    else NOTIFY_BEFORE_MINUTES, plus the offsets of its VALARMs. Only
+    upcoming events get reminders. Delivered reminders are kept unless the
+    event was rescheduled, and no reminder earlier than a delivered one is
+    added. Returns the number of reminders scheduled.
+    """
+    from .config_service import get_notify_before_minutes
+    default_offsets = [get_notify_before_minutes()]
+    now = time.time()
+    event_ids = list(event_ids)
+    scheduled = 0
+    
+    for i in range(0, len(event_ids), 500):
+        batch = event_ids[i:i + 500]
+        placeholders = ','.join('?' * len(batch))
+        cursor.execute(f'''
+            SELECT e.id, (julianday(f.start_datetime) - 2440587.5) * 86400.0,
+                   c.reminder_offsets, u.reminder_offsets, f.alarm_offsets
+            FROM events e
+            JOIN feed_events f ON e.feed_event_id = f.id
+            JOIN calendars c ON e.calendar_id = c.id
+            LEFT JOIN users u ON c.user_id = u.id
+            WHERE e.id IN ({placeholders})
+        ''', batch)
+        rows = cursor.fetchall()
+        
+        # Drop pending reminders, and delivered ones of rescheduled events
+        cursor.executemany('''
+            DELETE FROM reminders WHERE event_id = ? AND (delivered_at IS NULL OR start_at IS NOT ?)
+        ''', [(event_id, start_at) for event_id, start_at, _, _, _ in rows])
+        cursor.execute(f'''
+            SELECT event_id, MAX(fire_at) FROM reminders
+            WHERE event_id IN ({placeholders}) GROUP BY event_id
+        ''', batch)
+        last_delivered = dict(cursor.fetchall())
+        
+        reminders = []
+        for event_id, start_at, calendar_offsets, user_offsets, alarm_offsets in rows:
+            if start_at is None or start_at <= now:
+                continue
+            offsets = parse_reminder_offsets(calendar_offsets)
+            if offsets is None:
+                offsets = parse_reminder_offsets(user_offsets)
+            if offsets is None:
+                offsets = default_offsets
+            for minutes in set(offsets).union(parse_reminder_offsets(alarm_offsets) or ()):
+                fire_at = start_at - minutes * 60
+                if fire_at > last_delivered.get(event_id, float('-inf')):
+                    reminders.append((event_id, minutes, fire_at, start_at))
+        
+        cursor.executemany('''
+            INSERT OR IGNORE INTO reminders (event_id, offset_minutes, fire_at, start_at)
+            VALUES (?, ?, ?, ?)
+        ''', reminders)
+        scheduled += len(reminders)
+        
+        # Events with reminders left to deliver are no longer notified
+        cursor.execute(f'''
+            UPDATE event_notifications SET notified = 0
+            WHERE event_id IN ({placeholders}) AND notified = 1
+              AND EXISTS (SELECT 1 FROM reminders r
+                          WHERE r.event_id = event_notifications.event_id AND r.delivered_at IS NULL)
+        ''', batch)
+    
+    return scheduled
+
+def _refresh_upcoming_reminders(cursor, condition: str, params: tuple) -> int:
+    """Refresh the reminders of upcoming events of the calendars matching condition"""
+    cursor.execute(f'''
+        SELECT e.id FROM events e
+        JOIN feed_events f ON e.feed_event_id = f.id
+        JOIN calendars c ON e.calendar_id = c.id
+        WHERE {condition} AND julianday(f.start_datetime) > julianday('now')
+    ''', params)
+    return refresh_event_reminders(cursor, [row[0] for row in cursor.fetchall()])
+
+@retry_on_locked
+def set_calendar_reminder_offsets(calendar_id: int, offsets: List[int], user_id: str = None) -> bool:
+    """Set the reminder schedule of a calendar (None to inherit the user's) and reschedule its events"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        if user_id:
+            cursor.execute('UPDATE calendars SET reminder_offsets = ? WHERE id = ? AND user_id = ?',
+                           (format_reminder_offsets(offsets), calendar_id,
+                            resolve_user_internal_id(cursor, user_id)))
+        else:
+            cursor.execute('UPDATE calendars SET reminder_offsets = ? WHERE id = ?',
+                           (format_reminder_offsets(offsets), calendar_id))
+        updated = cursor.rowcount > 0
+        if updated:
+            scheduled = _refresh_upcoming_reminders(cursor, 'c.id = ?', (calendar_id,))
+            logger.info(f"Scheduled {scheduled} reminders for calendar {calendar_id}")
+        conn.commit()
+    finally:
+        conn.close()
+    
+    if updated:
+        pending_signal.notify()
+    return updated
+
+@retry_on_locked
+def set_user_reminder_offsets(user_id: str, offsets: List[int]) -> User:
+    """Set the default reminder schedule of a user (None to inherit the global one) and reschedule its events"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        internal_id = resolve_user_internal_id(cursor, user_id)
+        cursor.execute('UPDATE users SET reminder_offsets = ? WHERE id = ?',
+                       (format_reminder_offsets(offsets), internal_id))
+        scheduled = _refresh_upcoming_reminders(cursor, 'c.user_id = ? AND c.reminder_offsets IS NULL',
+                                                (internal_id,))
+        logger.info(f"Scheduled {scheduled} reminders for user {user_id}")
+        conn.commit()
+        pending_signal.notify()
+        
+        cursor.row_factory = model_row_factory(User)
+        return cursor.execute('SELECT * FROM users WHERE id = ?', (internal_id,)).fetchone()
+    finally:
+        conn.close()
+
+@retry_on_locked
+def prune_past_reminders() -> int:
+    """Delete the reminders of events that have started"""
+    conn = get_db_connection()
+    
+    try:
+        cursor = conn.execute('DELETE FROM reminders WHERE start_at <= ?', (time.time(),))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
 def create_event(calendar_id: int, uid: str, title: str, description: str, 
                 location: str, start_datetime: str, end_datetime: str, all_day: bool) -> Event:
-    """Create a new event"""
+    """Create a new event in the calendar's feed, subscribed by this calendar only until the next sync"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cursor.execute('''
-        INSERT INTO events (calendar_id, uid, title, description, location, 
-                           start_datetime, end_datetime, all_day)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (calendar_id, uid, title, description, location, 
-          start_datetime, end_datetime, all_day))
-    
-    conn.commit()
-    event_id = cursor.lastrowid
-    conn.close()
+    try:
+        row = cursor.execute('SELECT feed_id, url, user_id FROM calendars WHERE id = ?', (calendar_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Calendar {calendar_id} not found")
+        feed_id, url, user_internal_id = row
+        if feed_id is None:
+            feed_id = _get_or_create_feed(cursor, url)
+            cursor.execute('UPDATE calendars SET feed_id = ? WHERE id = ?', (feed_id, calendar_id))
+        
+        cursor.execute('''
+            INSERT INTO feed_events (feed_id, uid, title, description, location, 
+                                     start_datetime, end_datetime, all_day)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (feed_id, uid, title, description, location, 
+              start_datetime, end_datetime, all_day))
+        cursor.execute('INSERT INTO events (calendar_id, feed_event_id) VALUES (?, ?)',
+                       (calendar_id, cursor.lastrowid))
+        event_id = cursor.lastrowid
+        cursor.execute('INSERT INTO event_notifications (event_id) VALUES (?)', (event_id,))
+        refresh_event_reminders(cursor, [event_id])
+        log_event_changes(cursor, 'insert', [(event_id, calendar_id, user_internal_id)])
+        
+        conn.commit()
+    finally:
+        conn.close()
     
+    pending_signal.notify()
     logger.info(f"Created event {event_id} for calendar {calendar_id}")
     return Event(event_id, calendar_id, uid, title, description, location,
                  start_datetime, end_datetime, all_day, False)
 
+# Event columns of a subscription (e) joined with its shared feed event (f) and delivery state (n)
+_EVENT_COLUMNS = '''e.id, e.calendar_id, f.uid, f.title, f.description, f.location,
+                    f.start_datetime, f.end_datetime, f.all_day, n.notified'''
+
 def get_pending_events(user_id: str = None) -> List[Event]:
-    """Get events that need to be notified"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    """Get events with a reminder due, driven by the index of undelivered reminder fire times.
     
-    # Calculate notification window (default 24 hours before event)
-    from .config_service import get_notify_before_minutes
-    notify_before_minutes = get_notify_before_minutes()
+    reminder_minutes is the offset of the latest due reminder, i.e. the
+    one closest to the start.
+    """
+    started = time.perf_counter()
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    now = time.time()
     
-    # Build query based on whether user_id is provided
+    # Filter by the external user_id in the same statement, as an unknown user_id matches no rows
+    conditions, params = '', (now, now)
     if user_id:
-        # First check if user exists
-        cursor.execute('SELECT id FROM users WHERE user_id = ?', (user_id,))
-        user_row = cursor.fetchone()
-        if not user_row:
-            conn.close()
-            raise ValueError(f"User {user_id} not found")
-        
-        cursor.execute('''
-            SELECT e.*, u.user_id as user_id, c.timezone as calendar_timezone FROM events e
+        conditions, params = 'AND u.user_id = ?', (now, now, user_id)
+    
+    try:
+        cursor.row_factory = model_row_factory(Event)
+        cursor.execute(f'''
+            SELECT {_EVENT_COLUMNS}, u.user_id as user_id, c.timezone as calendar_timezone,
+                   MIN(r.offset_minutes) as reminder_minutes FROM reminders r INDEXED BY idx_reminders_due
+            JOIN event_notifications n ON n.event_id = r.event_id
+            JOIN events e ON r.event_id = e.id
+            JOIN feed_events f ON e.feed_event_id = f.id
             JOIN calendars c ON e.calendar_id = c.id
             JOIN users u ON c.user_id = u.id
-            WHERE e.notified = FALSE
-              AND julianday(e.start_datetime) <= julianday(datetime('now')) + (? / 1440.0)
-              AND julianday(e.start_datetime) > julianday(datetime('now'))
-              AND u.user_id = ?
-            ORDER BY e.start_datetime ASC
-        ''', (notify_before_minutes, user_id))
-    else:
-        # Debug output for datetime calculations
-        cursor.execute("SELECT datetime('now') as now")
-        now_row = cursor.fetchone()
-        now_time = now_row['now']
-        print(f"Current time: {now_time}")
-        print(f"Notification window: {notify_before_minutes} minutes")
+            WHERE r.delivered_at IS NULL AND r.fire_at <= ? AND r.start_at > ?
+              AND n.notified = 0
+              {conditions}
+            GROUP BY r.event_id
+            ORDER BY f.start_datetime ASC
+        ''', params)
+        events = _fetch_user_rows(cursor, user_id) if user_id else cursor.fetchall()
+    finally:
+        conn.close()
+    
+    PENDING_QUERY_SECONDS.observe(time.perf_counter() - started, scope='user' if user_id else 'all')
+    if not user_id:
+        PENDING_EVENTS.set(len(events))
+    
+    logger.debug(f"Found {len(events)} pending events")
+    return events
+
+def query_events(calendar_id: int = None, user_id: str = None, start_from: float = None,
+                 start_to: float = None, q: str = None, after: tuple = None, limit: int = 100) -> List[Event]:
+    """Get events of a calendar or of a user's calendars ordered by start time, with keyset pagination.
+    
+    start_from and start_to bound the start as Unix timestamps (to is
+    exclusive), q matches title, description or location, and after is the
+    (start_at, id) of the last event of the previous page. Each calendar is
+    read through the (feed_id, start_at) index of its feed with the limit
+    applied to the scan, and the calendars of a user are merged by start
+    time, so a page reads at most limit events per calendar. Events without
+    a parseable start are not listed. Raises ValueError if neither
+    calendar_id nor user_id is given, or if the user does not exist.
+    """
+    if calendar_id is None and not user_id:
+        raise ValueError("calendar_id or user_id is required")
+    
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    
+    try:
+        if user_id:
+            sql = 'SELECT c.id FROM calendars c JOIN users u ON c.user_id = u.id WHERE u.user_id = ?'
+            if calendar_id is not None:
+                cursor.execute(sql + ' AND c.id = ?', (user_id, calendar_id))
+            else:
+                cursor.execute(sql, (user_id,))
+            calendar_ids = [row[0] for row in _fetch_user_rows(cursor, user_id)]
+        else:
+            calendar_ids = [calendar_id]
         
-        cursor.execute('''
-            SELECT *,
-                   julianday(start_datetime) as start_jd,
-                   julianday(datetime('now')) as now_jd,
-                   julianday(datetime('now')) + (? / 1440.0) as window_end_jd
-            FROM events
-            WHERE notified = FALSE
-        ''', (notify_before_minutes,))
+        conditions, params = ['c.id = ?', 'f.start_at IS NOT NULL'], []
+        if start_from is not None:
+            conditions.append('f.start_at >= ?')
+            params.append(start_from)
+        if start_to is not None:
+            conditions.append('f.start_at < ?')
+            params.append(start_to)
+        if after is not None:
+            conditions.append('(f.start_at, e.id) > (?, ?)')
+            params.extend(after)
+        if q:
+            pattern = '%' + q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            conditions.append("(f.title LIKE ? ESCAPE '\\' OR f.description LIKE ? ESCAPE '\\' "
+                              "OR f.location LIKE ? ESCAPE '\\')")
+            params.extend([pattern] * 3)
         
-        all_events = cursor.fetchall()
-        print(f"Total events: {len(all_events)}")
-        for event in all_events:
-            start_jd = event['start_jd']
-            now_jd = event['now_jd']
-            window_end_jd = event['window_end_jd']
-            print(f"  - Event {event['id']}: {event['title']} at {event['start_datetime']}")
-            print(f"    Start JD: {start_jd}, Now JD: {now_jd}, Window End JD: {window_end_jd}")
-            print(f"    Is future: {start_jd > now_jd}, Is within window: {start_jd <= window_end_jd}")
+        cursor.row_factory = model_row_factory(Event)
+        sql = f'''
+            SELECT {_EVENT_COLUMNS}, u.user_id as user_id, c.timezone as calendar_timezone, f.start_at
+            FROM calendars c
+            JOIN users u ON c.user_id = u.id
+            JOIN feed_events f ON f.feed_id = c.feed_id
+            JOIN events e ON e.calendar_id = c.id AND e.feed_event_id = f.id
+            LEFT JOIN event_notifications n ON n.event_id = e.id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY f.start_at, e.id
+            LIMIT ?
+        '''
+        pages = [cursor.execute(sql, (calendar, *params, limit)).fetchall() for calendar in calendar_ids]
+        return list(islice(heapq.merge(*pages, key=attrgetter('start_at', 'id')), limit))
+    finally:
+        conn.close()
+
+# Event change log
+def log_event_changes(cursor, op: str, events) -> None:
+    """Append an 'insert' or 'delete' of events, as (event_id, calendar_id, user_id), to the change log.
+    
+    Runs in the caller's transaction. As SQLite has a single writer, sequence
+    numbers become visible in increasing order.
+    """
+    changed_at = time.time()
+    cursor.executemany('''
+        INSERT INTO event_changes (event_id, calendar_id, user_id, op, changed_at) VALUES (?, ?, ?, ?, ?)
+    ''', [(event_id, calendar_id, user_id, op, changed_at) for event_id, calendar_id, user_id in events])
+
+def log_feed_event_updates(cursor, feed_id: int, feed_event_ids) -> None:
+    """Append an 'update' per changed feed event to the change log, in the caller's transaction.
+    
+    An update is logged once however many calendars subscribe to the feed;
+    get_event_changes lists it for each current subscription.
+    """
+    changed_at = time.time()
+    cursor.executemany('''
+        INSERT INTO event_changes (feed_id, feed_event_id, op, changed_at) VALUES (?, ?, 'update', ?)
+    ''', [(feed_id, feed_event_id, changed_at) for feed_event_id in feed_event_ids])
+
+def get_event_change_bounds() -> tuple:
+    """Get the first retained and the latest sequence number of the change log.
+    
+    A cursor below first_retained - 1 has missed pruned changes.
+    """
+    conn = get_read_connection()
+    try:
+        first_retained = conn.execute('SELECT MIN(seq) FROM event_changes').fetchone()[0]
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'event_changes'").fetchone()
+    finally:
+        conn.close()
+    
+    latest = row[0] if row else 0
+    return (first_retained if first_retained is not None else latest + 1), latest
+
+def _query_event_changes(cursor, since: int, calendar_id: int, user_id: str, seq_to: int = None,
+                         limit: int = -1) -> List[EventChange]:
+    """Query the change log, ordered by (seq, event_id).
+    
+    Inserts and deletes are logged per subscription; feed event updates are
+    logged once and listed for each current subscription of the feed.
+    """
+    row_conditions, row_params = ['ch.seq > ?', 'ch.feed_event_id IS NULL'], [since]
+    update_conditions, update_params = ['ch.seq > ?', 'ch.feed_event_id IS NOT NULL'], [since]
+    if seq_to is not None:
+        row_conditions.append('ch.seq <= ?')
+        row_params.append(seq_to)
+        update_conditions.append('ch.seq <= ?')
+        update_params.append(seq_to)
+    if calendar_id is not None:
+        row_conditions.append('ch.calendar_id = ?')
+        row_params.append(calendar_id)
+        update_conditions.append('ch.feed_id = (SELECT feed_id FROM calendars WHERE id = ?) AND e.calendar_id = ?')
+        update_params.extend([calendar_id, calendar_id])
+    if user_id:
+        row_conditions.append('ch.user_id = (SELECT id FROM users WHERE user_id = ?)')
+        row_params.append(user_id)
+        update_conditions.append('''ch.feed_id IN (SELECT c.feed_id FROM calendars c JOIN users u ON c.user_id = u.id
+                                                     WHERE u.user_id = ?)
+                                     AND e.calendar_id IN (SELECT c.id FROM calendars c JOIN users u ON c.user_id = u.id
+                                                           WHERE u.user_id = ?)''')
+        update_params.extend([user_id, user_id])
+    
+    cursor.row_factory = model_row_factory(EventChange)
+    cursor.execute(f'''
+        SELECT ch.seq, ch.event_id, ch.calendar_id, ch.op, ch.changed_at,
+               f.uid, f.title, f.description, f.location, f.start_datetime, f.end_datetime, f.all_day
+        FROM event_changes ch
+        LEFT JOIN events e ON e.id = ch.event_id AND ch.op != 'delete'
+        LEFT JOIN feed_events f ON f.id = e.feed_event_id
+        WHERE {' AND '.join(row_conditions)}
+        UNION ALL
+        SELECT ch.seq, e.id, e.calendar_id, ch.op, ch.changed_at,
+               f.uid, f.title, f.description, f.location, f.start_datetime, f.end_datetime, f.all_day
+        FROM event_changes ch
+        JOIN feed_events f ON f.id = ch.feed_event_id
+        JOIN events e ON e.feed_event_id = ch.feed_event_id
+        WHERE {' AND '.join(update_conditions)}
+        ORDER BY seq, event_id
+        LIMIT ?
+    ''', (*row_params, *update_params, limit))
+    return cursor.fetchall()
+
+def get_event_changes(since: int, limit: int, calendar_id: int = None, user_id: str = None) -> EventChangePage:
+    """Get about limit changes after sequence number since, with the current content of changed events.
+    
+    A page never ends within the changes of one sequence number, as the next
+    page starts after it; one update shared by more than limit subscriptions
+    is returned whole.
+    """
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    
+    try:
+        changes = _query_event_changes(cursor, since, calendar_id, user_id, limit=limit + 1)
+        if not changes and user_id:
+            cursor.row_factory = None
+            resolve_user_internal_id(cursor, user_id)
         
+        has_more = len(changes) > limit
+        if has_more:
+            boundary = changes[limit].seq
+            changes = [change for change in changes[:limit] if change.seq != boundary]
+            if not changes:
+                changes = _query_event_changes(cursor, since, calendar_id, user_id, seq_to=boundary)
+                has_more = bool(_query_event_changes(cursor, boundary, calendar_id, user_id, limit=1))
+        return EventChangePage(changes, has_more)
+    finally:
+        conn.close()
+
+@retry_on_locked
+def prune_event_changes() -> int:
+    """Delete changes older than EVENT_CHANGES_RETENTION_DAYS"""
+    conn = get_db_connection()
+    
+    try:
+        # Changes are appended in time order, so only the prefix up to the first recent one is read
+        cursor = conn.execute('''
+            DELETE FROM event_changes WHERE seq < COALESCE(
+                (SELECT seq FROM event_changes WHERE changed_at >= ? ORDER BY seq LIMIT 1),
+                (SELECT MAX(seq) + 1 FROM event_changes))
+        ''', (time.time() - EVENT_CHANGES_RETENTION_DAYS * 86400,))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+def get_next_reminder_time() -> float:
+    """Get the Unix time at which the next undelivered reminder falls due, or None"""
+    conn = get_read_connection()
+    try:
+        return conn.execute('''
+            SELECT MIN(fire_at) FROM reminders WHERE delivered_at IS NULL AND fire_at > ?
+        ''', (time.time(),)).fetchone()[0]
+    finally:
+        conn.close()
+
+@retry_on_locked
+def record_sync_run(calendar_id: int, started_at: str, duration_ms: float, bytes: int = None,
+                    http_status: int = None, inserted: int = 0, updated: int = 0, deleted: int = 0,
+                    skipped: bool = False, error: str = None) -> int:
+    """Record a sync run in the calendar's ring buffer and return its sequence number.
+    
+    Only the last SYNC_RUNS_RETENTION runs per calendar are kept; a new run
+    overwrites the slot of the oldest one. The sequence number is taken in
+    the INSERT itself, under the write lock, so concurrent recorders never
+    get the same one.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
         cursor.execute('''
-            SELECT e.*, u.user_id as user_id, c.timezone as calendar_timezone FROM events e
-            JOIN calendars c ON e.calendar_id = c.id
-            JOIN users u ON c.user_id = u.id
-            WHERE e.notified = FALSE
-              AND julianday(e.start_datetime) <= julianday(datetime('now')) + (? / 1440.0)
-              AND julianday(e.start_datetime) > julianday(datetime('now'))
-            ORDER BY e.start_datetime ASC
-        ''', (notify_before_minutes,))
+            INSERT OR REPLACE INTO sync_runs (calendar_id, slot, seq, started_at, duration_ms, bytes,
+                                              http_status, inserted, updated, deleted, skipped, error)
+            SELECT ?, next.seq % ?, next.seq, ?, ?, ?, ?, ?, ?, ?, ?, ?
+            FROM (SELECT COALESCE(MAX(seq), 0) + 1 AS seq FROM sync_runs WHERE calendar_id = ?) next
+            RETURNING seq
+        ''', (calendar_id, SYNC_RUNS_RETENTION, started_at, duration_ms, bytes,
+              http_status, inserted, updated, deleted, skipped, error, calendar_id))
+        seq = cursor.fetchone()[0]
+        # Drop slots left over from a larger retention setting
+        cursor.execute(
+            'DELETE FROM sync_runs WHERE calendar_id = ? AND seq <= ?',
+            (calendar_id, seq - SYNC_RUNS_RETENTION)
+        )
+        conn.commit()
+    finally:
+        conn.close()
     
-    rows = cursor.fetchall()
+    return seq
+
+def get_sync_runs(calendar_id: int, limit: int = None) -> List[SyncRun]:
+    """Get the recorded sync runs of a calendar, newest first"""
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = model_row_factory(SyncRun)
+    
+    cursor.execute('''
+        SELECT calendar_id, seq, started_at, duration_ms, bytes, http_status,
+               inserted, updated, deleted, skipped, error
+        FROM sync_runs WHERE calendar_id = ?
+        ORDER BY seq DESC LIMIT ?
+    ''', (calendar_id, limit if limit is not None else -1))
+    runs = cursor.fetchall()
+    conn.close()
+    
+    return runs
+
+@retry_on_locked
+def request_calendar_sync(calendar_id: int) -> tuple:
+    """Request an on-demand sync of a calendar.
+    
+    Returns (SyncRequest, coalesced). If a request for the calendar is
+    already pending or running, no new one is created and coalesced is True.
+    Requests stuck in running for longer than SYNC_REQUEST_STALE_SECONDS
+    (e.g. after a scheduler crash) are replaced.
+    """
+    now = time.time()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = model_row_factory(SyncRequest)
+    
+    try:
+        cursor.execute('''
+            INSERT INTO sync_requests (calendar_id, generation, status, requested_at)
+            VALUES (?, 1, 'pending', ?)
+            ON CONFLICT(calendar_id) DO UPDATE SET
+                generation = generation + 1, status = 'pending', requested_at = excluded.requested_at,
+                started_at = NULL, finished_at = NULL, run_seq = NULL, error = NULL
+            WHERE status IN ('done', 'failed') OR (status = 'running' AND started_at < ?)
+            RETURNING *
+        ''', (calendar_id, now, now - SYNC_REQUEST_STALE_SECONDS))
+        request = cursor.fetchone()
+        coalesced = request is None
+        if coalesced:
+            cursor.execute('SELECT * FROM sync_requests WHERE calendar_id = ?', (calendar_id,))
+            request = cursor.fetchone()
+        conn.commit()
+    finally:
+        conn.close()
     
-    # Debug output
-    print(f"Found {len(rows)} pending events")
-    for row in rows:
-        print(f"  - Event: {row['title']} at {row['start_datetime']}")
+    return request, coalesced
+
+def get_sync_request(calendar_id: int) -> SyncRequest:
+    """Get the latest on-demand sync request of a calendar"""
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = model_row_factory(SyncRequest)
     
+    cursor.execute('SELECT * FROM sync_requests WHERE calendar_id = ?', (calendar_id,))
+    request = cursor.fetchone()
     conn.close()
     
-    events = []
-    for row in rows:
-        event = Event(row['id'], row['calendar_id'], row['uid'], row['title'],
-                      row['description'], row['location'], row['start_datetime'],
-                      row['end_datetime'], row['all_day'], row['notified'],
-                      row['user_id'] if 'user_id' in row.keys() else None,
-                      row['calendar_timezone'] if 'calendar_timezone' in row.keys() else None)
-        events.append(event)
+    return request
+
+@retry_on_locked
+def claim_sync_requests() -> List[SyncRequest]:
+    """Mark all pending (and stale running) sync requests as running and return them"""
+    now = time.time()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = model_row_factory(SyncRequest)
     
-    return events
+    try:
+        cursor.execute('''
+            UPDATE sync_requests SET status = 'running', started_at = ?
+            WHERE status = 'pending' OR (status = 'running' AND started_at < ?)
+            RETURNING *
+        ''', (now, now - SYNC_REQUEST_STALE_SECONDS))
+        requests = cursor.fetchall()
+        conn.commit()
+    finally:
+        conn.close()
+    
+    return requests
 
-def mark_event_notified(event_id: int) -> bool:
-    """Mark an event as notified"""
+@retry_on_locked
+def complete_sync_request(calendar_id: int, generation: int, success: bool,
+                          run_seq: int = None, error: str = None) -> bool:
+    """Store the outcome of a claimed sync request"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cursor.execute(
-        'UPDATE events SET notified = TRUE WHERE id = ? AND notified = FALSE',
-        (event_id,)
-    )
+    try:
+        cursor.execute('''
+            UPDATE sync_requests SET status = ?, finished_at = ?, run_seq = ?, error = ?
+            WHERE calendar_id = ? AND generation = ? AND status = 'running'
+        ''', ('done' if success else 'failed', time.time(), run_seq, error, calendar_id, generation))
+        updated = cursor.rowcount > 0
+        conn.commit()
+    finally:
+        conn.close()
+    
+    return updated
+
+def get_sync_history_summary() -> Dict[int, tuple]:
+    """Map calendar ID to (last successful run started_at, whether the latest run failed)"""
+    conn = get_read_connection()
+    cursor = conn.cursor()
     
-    updated = cursor.rowcount > 0
-    conn.commit()
+    cursor.execute('''
+        SELECT calendar_id,
+               MAX(CASE WHEN error IS NULL THEN started_at END),
+               (SELECT latest.error IS NOT NULL FROM sync_runs latest
+                WHERE latest.calendar_id = runs.calendar_id ORDER BY latest.seq DESC LIMIT 1)
+        FROM sync_runs runs
+        GROUP BY calendar_id
+    ''')
+    summary = {row[0]: (row[1], bool(row[2])) for row in cursor.fetchall()}
     conn.close()
     
+    return summary
+
+def _observe_notification_lag(due_at: float):
+    """Record how long after its reminder fell due an event was delivered"""
+    NOTIFICATION_LAG_SECONDS.observe(max(0.0, time.time() - due_at))
+
+@retry_on_locked
+def mark_event_notified(event_id: int) -> bool:
+    """Mark the due reminders of an event as delivered.
+    
+    Only the event's reminders and event_notifications rows are written, so
+    delivery never touches the pages a sync rewrites. The event counts as
+    notified once none of its reminders are left.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    now = time.time()
+    
+    try:
+        cursor.execute('''
+            UPDATE reminders SET delivered_at = ?
+            WHERE event_id = ? AND delivered_at IS NULL AND fire_at <= ?
+              AND EXISTS (SELECT 1 FROM event_notifications WHERE event_id = ? AND notified = 0)
+            RETURNING fire_at
+        ''', (now, event_id, now, event_id))
+        
+        due_at = max((row[0] for row in cursor.fetchall()), default=None)
+        updated = due_at is not None
+        if updated:
+            cursor.execute('''
+                UPDATE event_notifications
+                SET notified = NOT EXISTS (SELECT 1 FROM reminders WHERE event_id = ? AND delivered_at IS NULL),
+                    notified_at = ?, attempts = attempts + 1, claimed_by = NULL, claimed_at = NULL
+                WHERE event_id = ?
+            ''', (event_id, datetime.now().isoformat(), event_id))
+        conn.commit()
+    finally:
+        conn.close()
+    
     if updated:
+        _observe_notification_lag(due_at)
         logger.info(f"Marked event {event_id} as notified")
     else:
-        logger.warning(f"Event {event_id} not found or already notified")
+        logger.warning(f"Event {event_id} not found or has no reminder due")
+    
+    return updated
+
+@retry_on_locked
+def try_acquire_lease(name: str, holder: str, ttl_seconds: float) -> bool:
+    """Acquire or renew a named lease; returns True if holder owns it afterwards.
+    
+    The lease is taken over only when it is free, already held by the same
+    holder, or expired, in a single atomic statement.
+    """
+    now = time.time()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            INSERT INTO scheduler_leases (name, holder, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+            WHERE scheduler_leases.holder = excluded.holder OR scheduler_leases.expires_at < ?
+        ''', (name, holder, now + ttl_seconds, now))
+        acquired = cursor.rowcount > 0
+        conn.commit()
+    finally:
+        conn.close()
+    
+    return acquired
+
+@retry_on_locked
+def release_lease(name: str, holder: str):
+    """Release a named lease if it is held by holder"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
     
-    return updated
\ No newline at end of file
+    try:
+        cursor.execute('DELETE FROM scheduler_leases WHERE name = ? AND holder = ?', (name, holder))
+        conn.commit()
+    finally:
+        conn.close()
@@ -1,16 +1,77 @@
+import os
+import time
 import logging
 import hashlib
-from datetime import datetime
-from typing import List, Dict
+from datetime import datetime, timedelta
+from typing import List, Dict, NamedTuple
 from icalendar import Calendar as ICalendar
 from dateutil import tz
 import requests
+from .circuit_breaker import host_breakers, host_key
+from .metrics import HOST_CIRCUIT_OPEN
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Global variables
 TIMEZONE_DEFAULT = None  # This will be set from the main app
+ICS_MAX_BYTES = int(os.environ.get('ICS_MAX_BYTES', 20 * 1024 * 1024))
+ICS_CONNECT_TIMEOUT_SECONDS = float(os.environ.get('ICS_CONNECT_TIMEOUT_SECONDS', 10))
+ICS_READ_TIMEOUT_SECONDS = float(os.environ.get('ICS_READ_TIMEOUT_SECONDS', 30))
+ICS_DOWNLOAD_DEADLINE_SECONDS = float(os.environ.get('ICS_DOWNLOAD_DEADLINE_SECONDS', 60))
+ICS_MIN_BYTES_PER_SECOND = float(os.environ.get('ICS_MIN_BYTES_PER_SECOND', 2048))
+ICS_SLOW_READ_GRACE_SECONDS = float(os.environ.get('ICS_SLOW_READ_GRACE_SECONDS', 10))
+ICS_READ_CHUNK_BYTES = 64 * 1024
+ICS_NORMALIZED_HASH = os.environ.get('ICS_NORMALIZED_HASH', '0') == '1'
+ICS_VOLATILE_PROPERTIES = frozenset(
+    name.strip().upper().encode()
+    for name in os.environ.get('ICS_VOLATILE_PROPERTIES', 'DTSTAMP,LAST-MODIFIED').split(',')
+    if name.strip()
+)
+
+class IcsDownloadError(Exception):
+    """Download aborted because the feed exceeded a size or time limit"""
+
+class IcsFeedTooLarge(IcsDownloadError):
+    """Feed body is larger than ICS_MAX_BYTES"""
+
+class IcsFeedTooSlow(IcsDownloadError):
+    """Feed missed the download deadline or the minimum transfer rate"""
+
+class HostCircuitOpenError(IcsDownloadError):
+    """Feed host failed repeatedly; downloads are rejected until its breaker probes again"""
+
+def _alarm_offsets(component, start, end) -> List[int]:
+    """Minutes before the event start at which its VALARM components trigger.
+    
+    Relative triggers are taken from the start, or from the end with
+    RELATED=END; absolute triggers from their UTC time. Alarms after the
+    start are ignored.
+    """
+    offsets = set()
+    for alarm in component.walk('VALARM'):
+        trigger = alarm.get('trigger')
+        if trigger is None:
+            continue
+        
+        try:
+            if isinstance(trigger.dt, timedelta):
+                before = -trigger.dt
+                if trigger.params.get('RELATED') == 'END' and start and end:
+                    before -= end - start
+            elif isinstance(start, datetime):
+                if start.tzinfo is None:
+                    start = start.replace(tzinfo=tz.gettz(TIMEZONE_DEFAULT))
+                before = start - trigger.dt
+            else:
+                continue
+        except TypeError:
+            # Mixed date and datetime values
+            continue
+        
+        if before >= timedelta(0):
+            offsets.add(int(before.total_seconds() // 60))
+    return sorted(offsets)
 
 def parse_ics_content(ics_content: str) -> List[Dict]:
     """Parse ICS content and extract events"""
@@ -30,6 +91,7 @@ def parse_ics_content(ics_content: str) -> List[Dict]:
                     'duration': component.get('duration') if component.get('duration') else None,
                     'all_day': False
                 }
+                event['alarms'] = _alarm_offsets(component, event['start'], event['end'])
                 
                 # Handle all-day events
                 if event['start'] and hasattr(event['start'], 'date'):
@@ -78,16 +140,202 @@ def parse_ics_content(ics_content: str) -> List[Dict]:
         logger.error(f"Error parsing ICS content: {e}")
         return []
 
-def download_ics_content(url: str) -> str:
-    """Download ICS content from a URL"""
+class IcsDownload(NamedTuple):
+    content: str
+    status_code: int
+    size: int
+    content_hash: str = None
+    # True if content_hash matched the known hash; content is then None
+    unchanged: bool = False
+
+class NormalizedContentHash:
+    """Incremental fingerprint of the iCalendar content of a feed rather than its bytes.
+    
+    Folded lines are unfolded and ICS_VOLATILE_PROPERTIES (DTSTAMP and
+    LAST-MODIFIED by default) are dropped, at any nesting level. Each
+    component directly inside VCALENDAR, and each calendar property, is
+    hashed on its own and the sorted digests are combined, so reordering
+    events does not change the result. Like hashlib objects it is fed
+    chunks with update(), so it runs on the raw stream and only keeps the
+    current line and one digest per component in memory. The physical lines
+    of a folded line are collected and joined once, keeping long folded
+    values linear.
+    """
+    
+    def __init__(self):
+        self._partial = b''
+        self._line_parts = []
+        self._depth = 0
+        self._component = None
+        self._digests = []
+        self._hexdigest = None
+    
+    def update(self, chunk: bytes):
+        lines = (self._partial + bytes(chunk)).split(b'\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self._add_physical_line(line.rstrip(b'\r'))
+    
+    def _add_physical_line(self, line: bytes):
+        # RFC 5545 folding: a line starting with a space or tab continues the previous one
+        if line[:1] in (b' ', b'\t') and self._line_parts:
+            self._line_parts.append(line[1:])
+            return
+        if self._line_parts:
+            self._add_content_line(b''.join(self._line_parts))
+        self._line_parts = [line]
+    
+    def _add_content_line(self, line: bytes):
+        if not line:
+            return
+        name = line.split(b':', 1)[0].split(b';', 1)[0].upper()
+        if name in ICS_VOLATILE_PROPERTIES:
+            return
+        
+        if name == b'BEGIN':
+            self._depth += 1
+            if self._depth == 2:
+                self._component = _new_byte_hash()
+        
+        if self._component is not None:
+            self._component.update(line + b'\n')
+        elif self._depth == 1 and name not in (b'BEGIN', b'END'):
+            self._digests.append(_new_byte_hash(line).digest())
+        
+        if name == b'END':
+            if self._depth == 2 and self._component is not None:
+                self._digests.append(self._component.digest())
+                self._component = None
+            self._depth = max(self._depth - 1, 0)
+    
+    def hexdigest(self) -> str:
+        if self._hexdigest is None:
+            self._add_physical_line(self._partial.rstrip(b'\r'))
+            self._add_content_line(b''.join(self._line_parts))
+            self._partial, self._line_parts = b'', []
+            
+            hasher = _new_byte_hash()
+            for digest in sorted(self._digests):
+                hasher.update(digest)
+            self._hexdigest = hasher.hexdigest()
+        return self._hexdigest
+
+def _new_byte_hash(data: bytes = b''):
+    return hashlib.blake2b(data, digest_size=16)
+
+def _new_content_hash():
+    return NormalizedContentHash() if ICS_NORMALIZED_HASH else _new_byte_hash()
+
+def _read_body(response, hasher) -> bytearray:
+    """Stream the response body into hasher, enforcing the size limit, the total deadline and a minimum rate"""
+    content_length = response.headers.get('Content-Length')
+    if content_length and content_length.isdigit() and int(content_length) > ICS_MAX_BYTES:
+        raise IcsFeedTooLarge(f"Feed too large: Content-Length {content_length} exceeds {ICS_MAX_BYTES} bytes")
+    
+    # read1 returns as soon as any data arrives, so limits are checked even
+    # when a server trickles bytes; older urllib3 versions only have read()
+    read1 = getattr(response.raw, 'read1', None)
+    if read1 is not None:
+        chunks = iter(lambda: read1(ICS_READ_CHUNK_BYTES, decode_content=True), b'')
+    else:
+        chunks = response.iter_content(chunk_size=8192)
+    
+    started = time.monotonic()
+    body = bytearray()
+    for chunk in chunks:
+        body += chunk
+        hasher.update(chunk)
+        elapsed = time.monotonic() - started
+        if len(body) > ICS_MAX_BYTES:
+            raise IcsFeedTooLarge(f"Feed too large: more than {ICS_MAX_BYTES} bytes")
+        if elapsed > ICS_DOWNLOAD_DEADLINE_SECONDS:
+            raise IcsFeedTooSlow(f"Download deadline of {ICS_DOWNLOAD_DEADLINE_SECONDS:g}s exceeded "
+                                   f"after {len(body)} bytes")
+        if elapsed > ICS_SLOW_READ_GRACE_SECONDS and len(body) / elapsed < ICS_MIN_BYTES_PER_SECOND:
+            raise IcsFeedTooSlow(f"Feed too slow: {len(body) / elapsed:.0f} bytes/s "
+                                   f"after {elapsed:.1f}s")
+    return body
+
+def _decode_body(response, body: bytearray) -> str:
+    """Decode an ICS body using the charset from Content-Type, UTF-8 (the iCalendar default) otherwise"""
+    encoding = 'utf-8'
+    content_type = response.headers.get('Content-Type', '')
+    for param in content_type.split(';')[1:]:
+        name, _, value = param.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            encoding = value.strip('"\'')
+    try:
+        return body.decode(encoding, errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+def _is_host_failure(error: Exception) -> bool:
+    """Whether an error says the host is unhealthy, rather than the single feed"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, IcsFeedTooSlow)):
+        return True
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code >= 500
+
+def download_ics(url: str, known_hash: str = None) -> IcsDownload:
+    """Download ICS content from a URL together with the HTTP status and body size in bytes.
+    
+    The raw body is hashed (BLAKE2, or the NormalizedContentHash fingerprint
+    with ICS_NORMALIZED_HASH) while it streams in. If the hash equals
+    known_hash the body is not decoded and the result has unchanged=True and
+    no content.
+    
+    The body is streamed and the download is aborted with IcsDownloadError if
+    it exceeds ICS_MAX_BYTES, takes longer than ICS_DOWNLOAD_DEADLINE_SECONDS
+    or arrives slower than ICS_MIN_BYTES_PER_SECOND. Connection errors,
+    timeouts and 5xx responses count against the host's circuit breaker;
+    while it is open, downloads from the host fail with HostCircuitOpenError.
+    """
+    breaker = host_breakers.get(url)
+    if not breaker.allow_request():
+        raise HostCircuitOpenError(f"Circuit open for host {host_key(url)}")
+    
     try:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        return response.text
+        response = requests.get(url, stream=True,
+                                timeout=(ICS_CONNECT_TIMEOUT_SECONDS, ICS_READ_TIMEOUT_SECONDS))
+        try:
+            response.raise_for_status()
+            hasher = _new_content_hash()
+            body = _read_body(response, hasher)
+            content_hash = hasher.hexdigest()
+            if known_hash is not None and content_hash == known_hash:
+                download = IcsDownload(None, response.status_code, len(body), content_hash, True)
+            else:
+                download = IcsDownload(_decode_body(response, body), response.status_code, len(body),
+                                       content_hash)
+        finally:
+            response.close()
     except Exception as e:
         logger.error(f"Error downloading ICS content from {url}: {e}")
+        if _is_host_failure(e):
+            if breaker.record_failure():
+                HOST_CIRCUIT_OPEN.set(1, host=host_key(url))
+                logger.warning(f"Circuit opened for host {host_key(url)} for {breaker.open_seconds:.0f}s")
+        else:
+            _record_host_success(breaker, url)
         raise
+    
+    _record_host_success(breaker, url)
+    return download
+
+def _record_host_success(breaker, url: str):
+    if breaker.state != 'closed':
+        HOST_CIRCUIT_OPEN.set(0, host=host_key(url))
+        logger.info(f"Circuit closed for host {host_key(url)}")
+    breaker.record_success()
+
+def download_ics_content(url: str) -> str:
+    """Download ICS content from a URL"""
+    return download_ics(url).content
 
-def calculate_content_hash(content: str) -> str:
-    """Calculate MD5 hash of content"""
-    return hashlib.md5(content.encode()).hexdigest()
\ No newline at end of file
+def calculate_content_hash(content) -> str:
+    """Calculate the hash of content (str or raw bytes) as used for sync_hash"""
+    if isinstance(content, str):
+        content = content.encode()
+    hasher = _new_content_hash()
+    hasher.update(content)
+    return hasher.hexdigest()
\ No newline at end of file
@@ -1,17 +1,16 @@
 import logging
 import os
-from .database import init_db, create_user
+import signal
+import threading
+from .database import init_db, seed_calendars
 from .config_service import load_config
-from .calendar_service import create_calendar
-from .background_service import start_background_processes
+from .background_service import start_background_processes, run_scheduler_as_leader
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def initialize_app(sync_interval_minutes: int, notify_interval_seconds: int):
-    """Initialize the application"""
-    logger.info("Initializing ICS-Gate application")
-    
+def configure_services(sync_interval_minutes: int, notify_interval_seconds: int):
+    """Set the module-level settings used by the background and parser services"""
     # Set global variables for background service
     import services.background_service as background_service
     background_service.SYNC_INTERVAL_MINUTES = sync_interval_minutes
@@ -20,22 +19,56 @@ def initialize_app(sync_interval_minutes: int, notify_interval_seconds: int):
     # Set global variables for ICS parser
     import services.ics_parser as ics_parser
     ics_parser.TIMEZONE_DEFAULT = os.environ.get('TIMEZONE_DEFAULT', 'UTC')
+
+def prepare_app(sync_interval_minutes: int, notify_interval_seconds: int):
+    """Configure services, migrate the database and seed calendars from config"""
+    logger.info("Initializing ICS-Gate application")
     
-    # Initialize database
-    init_db()
+    configure_services(sync_interval_minutes, notify_interval_seconds)
+    
+    # Initialize database; batched data migrations may finish after startup
+    init_db(background_online_migrations=os.environ.get('MIGRATIONS_ONLINE_BACKGROUND', '1') != '0')
     
     # Load configuration
     config = load_config()
     
     # Create users and calendars from config
     if 'calendars' in config:
-        for user_id, calendar_url in config['calendars'].items():
-            user = create_user(user_id)
-            create_calendar(user.id, calendar_url)
+        seed_calendars(config['calendars'])
+
+def initialize_app(sync_interval_minutes: int, notify_interval_seconds: int):
+    """Initialize the application"""
+    prepare_app(sync_interval_minutes, notify_interval_seconds)
     
     # Start background processes
     scheduler = start_background_processes()
     
     logger.info("ICS-Gate application initialized successfully")
     
-    return scheduler
\ No newline at end of file
+    return scheduler
+
+def run_scheduler_process(sync_interval_minutes: int, notify_interval_seconds: int):
+    """Entry point of the dedicated scheduler process used in production serving.
+    
+    The database is expected to be migrated already; the process runs the
+    background jobs only while it holds the scheduler lease and exits on
+    SIGTERM or SIGINT.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] %(levelname)s in %(module)s: %(message)s'
+    )
+    configure_services(sync_interval_minutes, notify_interval_seconds)
+    
+    # Sync metrics are recorded in this process, so it serves its own /metrics,
+    # unless they are merged into the API's through METRICS_MULTIPROC_DIR
+    from .metrics import METRICS_MULTIPROC_DIR, start_metrics_server
+    metrics_port = int(os.environ.get('SCHEDULER_METRICS_PORT', 5801))
+    if metrics_port and not METRICS_MULTIPROC_DIR:
+        start_metrics_server(metrics_port)
+    
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+    
+    run_scheduler_as_leader(stop_event)
@@ -0,0 +1,341 @@
+import os
+import json
+import glob
+import time
+import atexit
+import logging
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Global variables
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Default histogram buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LAG_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0, 7200.0, 86400.0)
+
+_registry: List['Metric'] = []
+
+def _format_labels(labelnames: Tuple[str, ...], labelvalues: Tuple[str, ...], extra: str = '') -> str:
+    """Format a Prometheus label set"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric(ABC):
+    """Base class for in-process metrics rendered in the Prometheus text format"""
+    type_name = 'untyped'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+        _registry.append(self)
+    
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+    
+    def snapshot(self) -> Dict[Tuple[str, ...], object]:
+        """Copy of the recorded values, by label values"""
+        with self._lock:
+            return dict(self._values)
+    
+    @abstractmethod
+    def merge(self, value, other):
+        """Combine the values of one label set recorded by two processes"""
+    
+    @abstractmethod
+    def samples(self, values: Dict[Tuple[str, ...], object]) -> List[str]:
+        """Sample lines of the given values"""
+    
+    def render(self, values: Dict[Tuple[str, ...], object] = None) -> str:
+        """Render the given values, or this process's values, with the metric's HELP and TYPE"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        lines.extend(self.samples(self.snapshot() if values is None else values))
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    """Monotonically increasing counter"""
+    type_name = 'counter'
+    
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+    
+    def merge(self, value, other):
+        return value + other
+    
+    def samples(self, values) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in values.items()]
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+    type_name = 'gauge'
+    
+    def set(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    # Processes report their own state, so the gauge shows the highest one
+    def merge(self, value, other):
+        return max(value, other)
+
+class Histogram(Metric):
+    """Cumulative histogram with fixed buckets"""
+    type_name = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (non-cumulative, last slot is +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+    
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+    
+    def snapshot(self):
+        with self._lock:
+            return {key: [list(state[0]), state[1], state[2]] for key, state in self._values.items()}
+    
+    def merge(self, value, other):
+        return [[a + b for a, b in zip(value[0], other[0])], value[1] + other[1], value[2] + other[2]]
+    
+    def samples(self, values) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text exposition format.
+    
+    With METRICS_MULTIPROC_DIR set, the values of every process sharing the
+    directory are merged, so any gunicorn worker serves the totals.
+    """
+    if not METRICS_MULTIPROC_DIR:
+        return '\n'.join(metric.render() for metric in _registry) + '\n'
+    
+    merged = collect_multiprocess_metrics()
+    return '\n'.join(metric.render(merged[metric.name]) for metric in _registry) + '\n'
+
+def reset_metrics():
+    """Clear all recorded values (used by tests)"""
+    for metric in _registry:
+        metric.clear()
+
+# Multiprocess mode: each process writes its values to METRICS_MULTIPROC_DIR
+def _process_file(pid: int) -> str:
+    return os.path.join(METRICS_MULTIPROC_DIR, f'metrics-{pid}.json')
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def flush_metrics():
+    """Write this process's values to its file in METRICS_MULTIPROC_DIR"""
+    pid = os.getpid()
+    data = {
+        'pid': pid,
+        'metrics': {metric.name: [[list(key), value] for key, value in metric.snapshot().items()]
+                    for metric in _registry},
+    }
+    path = _process_file(pid)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(data, file)
+    # Readers never see a partly written file
+    os.replace(path + '.tmp', path)
+
+def collect_multiprocess_metrics() -> Dict[str, Dict[Tuple[str, ...], object]]:
+    """Merge the values of every process in METRICS_MULTIPROC_DIR, by metric name.
+    
+    Counters and histograms of exited processes keep counting, so totals
+    never go back when a worker is replaced; gauges only come from live
+    processes.
+    """
+    flush_metrics()
+    metrics = {metric.name: metric for metric in _registry}
+    merged = {name: {} for name in metrics}
+    
+    for path in glob.glob(os.path.join(METRICS_MULTIPROC_DIR, 'metrics-*.json')):
+        try:
+            with open(path) as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping unreadable metrics file {path}: {e}")
+            continue
+        
+        alive = _process_alive(data['pid'])
+        for name, items in data['metrics'].items():
+            metric = metrics.get(name)
+            if metric is None or (isinstance(metric, Gauge) and not alive):
+                continue
+            values = merged[name]
+            for key, value in items:
+                key = tuple(key)
+                values[key] = metric.merge(values[key], value) if key in values else value
+    
+    return merged
+
+def clear_multiprocess_dir():
+    """Remove the files of earlier runs; called once before the processes start"""
+    for path in glob.glob(os.path.join(METRICS_MULTIPROC_DIR, 'metrics-*.json*')):
+        os.unlink(path)
+
+def _flush_periodically():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        try:
+            flush_metrics()
+        except OSError as e:
+            logger.warning(f"Could not write metrics file: {e}")
+
+def _start_flusher():
+    threading.Thread(target=_flush_periodically, name='metrics-flusher', daemon=True).start()
+
+def _reset_after_fork():
+    """Start a forked worker from empty values, as its parent already reports what it recorded"""
+    for metric in _registry:
+        metric._lock = threading.Lock()
+        metric._values = {}
+    _start_flusher()
+
+if METRICS_MULTIPROC_DIR:
+    os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+    _start_flusher()
+    os.register_at_fork(after_in_child=_reset_after_fork)
+    atexit.register(flush_metrics)
+
+# Calendar sync
+CALENDAR_DOWNLOAD_BYTES = Counter(
+    'icsgate_calendar_download_bytes_total', 'Bytes of ICS content downloaded', ('calendar_id',))
+# Histograms are not labelled per calendar, which would multiply their buckets by the number of calendars
+CALENDAR_DOWNLOAD_SECONDS = Histogram(
+    'icsgate_calendar_download_seconds', 'Time spent downloading ICS content')
+CALENDAR_PARSE_SECONDS = Histogram(
+    'icsgate_calendar_parse_seconds', 'Time spent parsing ICS content')
+CALENDAR_EVENTS_UPSERTED = Counter(
+    'icsgate_calendar_events_upserted_total', 'Event rows inserted or updated by syncs', ('calendar_id',))
+CALENDAR_EVENTS_DELETED = Counter(
+    'icsgate_calendar_events_deleted_total', 'Event rows deleted by syncs', ('calendar_id',))
+CALENDAR_SYNC_SKIPPED = Counter(
+    'icsgate_calendar_sync_skipped_unchanged_total', 'Syncs skipped because the feed was unchanged',
+    ('calendar_id',))
+CALENDAR_SYNC_FAILURES = Counter(
+    'icsgate_calendar_sync_failures_total', 'Failed calendar syncs', ('calendar_id',))
+SYNC_BACKOFF_SKIPPED = Counter(
+    'icsgate_sync_backoff_skipped_total', 'Calendars left out of a sync cycle because they are backing off')
+SYNC_CIRCUIT_OPEN_SKIPPED = Counter(
+    'icsgate_sync_circuit_open_skipped_total', 'Calendars left out of a sync cycle because their host circuit is open')
+HOST_CIRCUIT_OPEN = Gauge(
+    'icsgate_host_circuit_open', '1 while the circuit breaker of a feed host is open', ('host',))
+SYNC_CYCLE_SECONDS = Histogram(
+    'icsgate_sync_cycle_seconds', 'Duration of a full sync of all calendars')
+
+# Pending events and notifications
+PENDING_QUERY_SECONDS = Histogram(
+    'icsgate_pending_query_seconds', 'Latency of the pending events query', ('scope',))
+PENDING_EVENTS = Gauge(
+    'icsgate_pending_events', 'Events in the notification window at the last unscoped query')
+NOTIFICATION_LAG_SECONDS = Histogram(
+    'icsgate_notification_lag_seconds', 'Time from an event becoming due to its delivery',
+    buckets=LAG_BUCKETS)
+
+# Database
+DB_LOCK_WAIT_SECONDS = Histogram(
+    'icsgate_db_lock_wait_seconds', 'Time spent waiting for the database write lock',
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0))
+DB_LOCK_RETRIES = Counter(
+    'icsgate_db_lock_retries_total', 'Writes retried because the database was locked', ('operation',))
+
+def start_metrics_server(port: int, host: str = '0.0.0.0'):
+    """Serve /metrics from a background thread, for processes without the Flask API"""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render_metrics().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f"Serving metrics on {host}:{server.server_address[1]}/metrics")
+    return server
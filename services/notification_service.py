@@ -1,26 +1,82 @@
+import os
+import time
 import logging
 from datetime import datetime
-from .database import get_pending_events, mark_event_notified
+from .database import get_pending_events, mark_event_notified, prune_past_reminders
+from .database import get_next_reminder_time, get_read_connection
+from .pending_signal import pending_signal
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Global variables
+PENDING_WAIT_POLL_SECONDS = float(os.environ.get('PENDING_WAIT_POLL_SECONDS', 1))
+
 def check_pending_notifications():
     """Check for pending notifications"""
     logger.info("Checking for pending notifications")
     
+    pruned = prune_past_reminders()
+    if pruned:
+        logger.info(f"Pruned {pruned} reminders of started events")
+    
     pending_events = get_pending_events()
     logger.info(f"Found {len(pending_events)} pending events")
     
     # In a real implementation, this would trigger external notifications
     # For now, we just log them
     for event in pending_events:
-        logger.info(f"Pending notification: {event.title} at {event.start_datetime}")
+        logger.info(f"Pending notification: {event.title} at {event.start_datetime} "
+                    f"({event.reminder_minutes} minutes reminder)")
 
 def get_pending_events_for_api(user_id=None):
     """Get pending events for API response"""
     return get_pending_events(user_id)
 
+def pending_event_key(event) -> tuple:
+    """Identify a pending event by the reminder it is pending for"""
+    return (event.id, event.reminder_minutes)
+
+def wait_for_pending_events(user_id=None, timeout: float = 0, seen=frozenset()):
+    """Get pending events, waiting up to timeout seconds for one not in seen to become due.
+    
+    seen holds pending_event_key()s already handed out. Between queries the
+    wait sleeps on pending_signal (writes of this process) until the next
+    reminder fire time, checking PRAGMA data_version every
+    PENDING_WAIT_POLL_SECONDS for commits of other processes such as the
+    scheduler. The pending query only runs again when one of these fires.
+    """
+    deadline = time.monotonic() + timeout
+    conn = get_read_connection()
+    
+    try:
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        while True:
+            version = pending_signal.version
+            events = get_pending_events(user_id)
+            if any(pending_event_key(event) not in seen for event in events):
+                return events
+            
+            next_fire_at = get_next_reminder_time()
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return events
+                
+                wake = min(remaining, PENDING_WAIT_POLL_SECONDS)
+                if next_fire_at is not None:
+                    wake = min(wake, max(0.0, next_fire_at - time.time()))
+                if pending_signal.wait(version, wake):
+                    break
+                if next_fire_at is not None and time.time() >= next_fire_at:
+                    break
+                current = conn.execute('PRAGMA data_version').fetchone()[0]
+                if current != data_version:
+                    data_version = current
+                    break
+    finally:
+        conn.close()
+
 def mark_notification_delivered(event_id: int) -> bool:
     """Mark notification as delivered"""
     return mark_event_notified(event_id)
\ No newline at end of file
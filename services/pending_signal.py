@@ -0,0 +1,25 @@
+import threading
+
+class PendingSignal:
+    """In-process signal that the set of pending events may have changed.
+    
+    Writers call notify() after committing new or rescheduled reminders.
+    Waiters read version before querying and then wait() for it to move on,
+    so a change committed between the query and the wait is not missed.
+    """
+    
+    def __init__(self):
+        self.version = 0
+        self._condition = threading.Condition()
+    
+    def notify(self):
+        with self._condition:
+            self.version += 1
+            self._condition.notify_all()
+    
+    def wait(self, version: int, timeout: float) -> bool:
+        """Wait until the version differs from the given one; False on timeout"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.version != version, timeout)
+
+pending_signal = PendingSignal()
\ No newline at end of file
@@ -0,0 +1,221 @@
+"""
+Opt-in per-request profiling for the API.
+
+A profiled request records the time spent in SQL (and the number of
+statements), in named spans such as response serialization, and the total
+request time. The breakdown is returned in a Server-Timing header. With
+PROFILING_DUMP_DIR set, a sample of the profiled requests
+(PROFILING_CPROFILE_SAMPLE_RATE) also runs under cProfile, one request at a
+time per process, and the profiles of the slowest ones are kept as .prof
+files.
+
+Requests are profiled when PROFILING_ENABLED is set and the request is
+sampled (PROFILING_SAMPLE_RATE), or when it carries an X-Profile: 1 header
+together with a valid API key. Unprofiled requests only pay for one
+context variable lookup per connection and span.
+"""
+
+import os
+import re
+import time
+import heapq
+import random
+import sqlite3
+import logging
+import threading
+import cProfile
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Global variables
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '0') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.01))
+PROFILING_HEADER = 'X-Profile'
+PROFILING_DUMP_DIR = os.environ.get('PROFILING_DUMP_DIR', '')
+PROFILING_KEEP_SLOWEST = int(os.environ.get('PROFILING_KEEP_SLOWEST', 10))
+PROFILING_CPROFILE_SAMPLE_RATE = float(os.environ.get('PROFILING_CPROFILE_SAMPLE_RATE', 0.1))
+
+_current_profile: ContextVar[Optional['RequestProfile']] = ContextVar('request_profile', default=None)
+
+# Min-heap of (duration, path) of the dumped profiles of the slowest requests
+_slowest = []
+_slowest_lock = threading.Lock()
+
+# Held by the request running under cProfile; in a threaded worker the other
+# requests are profiled without it
+_cprofile_lock = threading.Lock()
+
+class RequestProfile:
+    """Timing breakdown of one profiled request"""
+    
+    def __init__(self, use_cprofile: bool = False):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.query_count = 0
+        self.spans: Dict[str, float] = {}
+        self.profiler = cProfile.Profile() if use_cprofile else None
+    
+    def add_span(self, name: str, seconds: float):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+    
+    def server_timing(self, total_seconds: float) -> str:
+        """Format the breakdown as a Server-Timing header value"""
+        parts = [f'db;dur={self.db_seconds * 1000:.3f};desc="{self.query_count} queries"']
+        parts.extend(f'{name};dur={seconds * 1000:.3f}' for name, seconds in self.spans.items())
+        parts.append(f'total;dur={total_seconds * 1000:.3f}')
+        return ', '.join(parts)
+
+def current_profile() -> Optional[RequestProfile]:
+    """Profile of the request being handled in this context, if it is profiled"""
+    return _current_profile.get()
+
+def span(name: str):
+    """Context manager adding the duration of the block to a named span of the current profile"""
+    profile = _current_profile.get()
+    if profile is None:
+        return nullcontext()
+    return _timed_span(profile, name)
+
+@contextmanager
+def _timed_span(profile: RequestProfile, name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_span(name, time.perf_counter() - started)
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that accounts statement and fetch time to the current request profile"""
+    
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            profile = _current_profile.get()
+            if profile is not None:
+                profile.db_seconds += time.perf_counter() - started
+    
+    def execute(self, *args):
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.query_count += 1
+        return self._timed(super().execute, *args)
+    
+    def executemany(self, *args):
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.query_count += 1
+        return self._timed(super().executemany, *args)
+    
+    def fetchone(self):
+        return self._timed(super().fetchone)
+    
+    def fetchmany(self, *args):
+        return self._timed(super().fetchmany, *args)
+    
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection whose cursors report to the current request profile"""
+    
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+    
+    # Connection.execute does not go through cursor(), so route it explicitly
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+    
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+def connection_factory():
+    """sqlite3 connection class to use for a new connection in this context"""
+    return ProfiledConnection if _current_profile.get() is not None else sqlite3.Connection
+
+def _should_profile(request) -> bool:
+    if request.headers.get(PROFILING_HEADER) == '1':
+        from .api_utils import validate_api_key
+        return validate_api_key()
+    return PROFILING_ENABLED and random.random() < PROFILING_SAMPLE_RATE
+
+def _claim_cprofile() -> bool:
+    """Whether a profiled request also runs under cProfile: sampled, and one request at a time"""
+    if not PROFILING_DUMP_DIR or random.random() >= PROFILING_CPROFILE_SAMPLE_RATE:
+        return False
+    return _cprofile_lock.acquire(blocking=False)
+
+def _stop_cprofile(profile: RequestProfile):
+    if profile.profiler:
+        profile.profiler.disable()
+        _cprofile_lock.release()
+
+def _dump_if_slowest(profile: RequestProfile, total_seconds: float, request):
+    """Keep the cProfile output if the request is among the slowest seen by this process"""
+    with _slowest_lock:
+        if len(_slowest) >= PROFILING_KEEP_SLOWEST and total_seconds <= _slowest[0][0]:
+            return
+        
+        os.makedirs(PROFILING_DUMP_DIR, exist_ok=True)
+        name = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'root'
+        path = os.path.join(PROFILING_DUMP_DIR,
+                            f'{total_seconds * 1000:010.3f}ms-{request.method}-{name}-{os.getpid()}-{time.time_ns()}.prof')
+        profile.profiler.dump_stats(path)
+        
+        heapq.heappush(_slowest, (total_seconds, path))
+        if len(_slowest) > PROFILING_KEEP_SLOWEST:
+            _, evicted = heapq.heappop(_slowest)
+            try:
+                os.unlink(evicted)
+            except OSError:
+                pass
+
+def init_profiling(app):
+    """Register the request hooks that profile sampled requests"""
+    from flask import g, request
+    
+    @app.before_request
+    def start_request_profile():
+        if not _should_profile(request):
+            return
+        profile = RequestProfile(use_cprofile=_claim_cprofile())
+        g.request_profile = profile
+        g.request_profile_token = _current_profile.set(profile)
+        if profile.profiler:
+            profile.profiler.enable()
+    
+    @app.after_request
+    def finish_request_profile(response):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return response
+        _stop_cprofile(profile)
+        
+        total_seconds = time.perf_counter() - profile.started
+        response.headers['Server-Timing'] = profile.server_timing(total_seconds)
+        logger.info(f"Profiled {request.method} {request.path}: {response.headers['Server-Timing']}")
+        
+        if profile.profiler:
+            try:
+                _dump_if_slowest(profile, total_seconds, request)
+            except OSError as e:
+                logger.warning(f"Could not write request profile: {e}")
+        return response
+    
+    @app.teardown_request
+    def reset_request_profile(exc=None):
+        # Only still set if after_request did not run, e.g. on an unhandled error
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            _stop_cprofile(profile)
+
+        token = g.pop('request_profile_token', None)
+        if token is not None:
+            _current_profile.reset(token)
+    
+    return app
@@ -0,0 +1,46 @@
+import unittest
+import tempfile
+import os
+from flask import Flask
+from flask_smorest import Api
+from services.api_service import initialize_api
+from services.database import init_db, set_db_path, create_user, create_calendar
+from services.ics_parser import IcsDownload
+
+def make_download(*vevents):
+    """An IcsDownload of a calendar with one VEVENT per string of properties"""
+    content = "BEGIN:VCALENDAR\nVERSION:2.0\n"
+    for vevent in vevents:
+        content += f"BEGIN:VEVENT\n{vevent}END:VEVENT\n"
+    content += "END:VCALENDAR\n"
+    return IcsDownload(content, 200, len(content.encode()))
+
+class DatabaseTestCase(unittest.TestCase):
+    """Runs each test on a fresh temporary database with test_user subscribed to one calendar"""
+    def setUp(self):
+        os.environ['ICS_GATE_API_KEY'] = 'test-api-key'
+        
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+        self.user = create_user("test_user")
+        self.calendar = create_calendar(self.user.id, "https://example.com/calendar.ics")
+
+    def tearDown(self):
+        # Clean up the temporary database and its WAL side files
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+
+    def make_client(self):
+        app = Flask(__name__)
+        app.config["TESTING"] = True
+        app.config["API_TITLE"] = "ICS Bot API"
+        app.config["API_VERSION"] = "v1"
+        app.config["OPENAPI_VERSION"] = "3.0.2"
+        initialize_api(Api(app))
+        return app.test_client()
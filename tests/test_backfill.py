@@ -0,0 +1,76 @@
+import unittest
+import tempfile
+import os
+from services.database import init_db, set_db_path, get_db_connection
+from migrations.backfill import BatchedMigration
+
+class TestBackfill(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+
+        # Add events whose calendars do not exist
+        conn = get_db_connection()
+        conn.executemany(
+            'INSERT INTO events (calendar_id, feed_event_id) VALUES (?, ?)',
+            [(999, i) for i in range(25)]
+        )
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        # Clean up the temporary database
+        os.unlink(self.temp_db.name)
+
+    def count_events(self):
+        conn = get_db_connection()
+        count = conn.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+        conn.close()
+        return count
+
+    def test_backfill_resumes_from_checkpoint(self):
+        """Test that an interrupted backfill resumes after the last committed batch"""
+        processed_ranges = []
+
+        def delete_batch(conn, first_id, last_id):
+            if len(processed_ranges) == 2:
+                raise RuntimeError("interrupted")
+            processed_ranges.append((first_id, last_id))
+            return conn.execute('DELETE FROM events WHERE id BETWEEN ? AND ?', (first_id, last_id)).rowcount
+
+        migration = BatchedMigration('test_backfill', 'events', delete_batch, batch_size=10, pause_seconds=0)
+
+        with self.assertRaises(RuntimeError):
+            migration.run()
+
+        # Two batches were committed before the interruption
+        self.assertEqual(self.count_events(), 5)
+        self.assertEqual(migration.get_checkpoint(), (20, False))
+
+        processed_ranges.clear()
+        migration.run()
+        self.assertEqual(processed_ranges, [(21, 25)])
+        self.assertEqual(self.count_events(), 0)
+        self.assertEqual(migration.get_checkpoint(), (25, True))
+
+    def test_orphan_event_migration_is_batched(self):
+        """Test that the orphan event cleanup runs as an online batched migration"""
+        from migrations import m202602021223_event_fix_calendsar as migration
+        self.assertTrue(migration.ONLINE)
+
+        migration.BatchedMigration('orphans', 'events', migration.delete_orphan_events,
+                                   batch_size=7, pause_seconds=0).run()
+        self.assertEqual(self.count_events(), 0)
+
+    def test_calendar_dedup_runs_before_unique_constraint(self):
+        """Test that calendar deduplication is part of the schema batch that builds the unique index"""
+        from migrations import remove_calendar_duplicates as migration
+        self.assertFalse(getattr(migration, 'ONLINE', False))
+
+if __name__ == '__main__':
+    unittest.main()
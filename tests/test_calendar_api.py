@@ -167,5 +167,16 @@ class TestCalendarAPI(unittest.TestCase):
         self.assertIn('error', data)
         self.assertEqual(data['error']['code'], 401)
 
+    def test_list_calendars_fields(self):
+        """Test that listed calendars expose only the public fields"""
+        user = create_user('test_user')
+        create_calendar(user.id, 'https://example.com/calendar.ics')
+        
+        response = self.client.get('/calendars?user_id=test_user', headers={'X-API-Key': 'test-api-key'})
+        
+        self.assertEqual(response.status_code, 200)
+        calendar, = json.loads(response.data)['calendars']
+        self.assertEqual(set(calendar), {'id', 'user_id', 'url', 'timezone', 'last_sync_at', 'sync_hash'})
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,129 @@
+import unittest
+import tempfile
+import os
+import socket
+from unittest.mock import patch
+import services.circuit_breaker as circuit_breaker
+from services.circuit_breaker import CircuitBreaker, host_breakers, host_key, CLOSED, OPEN, HALF_OPEN
+from services.ics_parser import download_ics, HostCircuitOpenError
+from services.database import init_db, set_db_path, create_user, create_calendar, get_calendars, get_sync_runs
+from services.calendar_service import sync_calendar, sync_all_calendars
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def unused_port():
+    """A local port with nothing listening, so connections are refused"""
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_threshold_and_probes_once(self):
+        """Test the closed -> open -> half-open -> closed cycle"""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10, max_reset_seconds=25, clock=clock)
+
+        self.assertFalse(breaker.record_failure())
+        self.assertTrue(breaker.record_failure())
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        clock.now += 10
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+    def test_failed_probe_backs_off_exponentially(self):
+        """Test that each failed probe doubles the open period up to the cap"""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, max_reset_seconds=25, clock=clock)
+        breaker.record_failure()
+
+        for expected in (20, 25, 25):
+            clock.now = breaker.opened_until
+            self.assertTrue(breaker.allow_request())
+            self.assertTrue(breaker.record_failure())
+            self.assertEqual(breaker.open_seconds, expected)
+
+    def test_lost_probe_is_replaced_after_its_deadline(self):
+        """Test that a probe that never reports back does not keep the breaker half-open forever"""
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, probe_timeout_seconds=30, clock=clock)
+        breaker.record_failure()
+
+        clock.now += 10
+        self.assertTrue(breaker.allow_request())
+        clock.now += 29
+        self.assertTrue(breaker.is_open())
+        self.assertFalse(breaker.allow_request())
+
+        clock.now += 1
+        self.assertFalse(breaker.is_open())
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+
+    def test_host_key(self):
+        """Test that calendars on the same host share a breaker"""
+        self.assertEqual(host_key('https://Calendar.Example.com/a.ics'), 'calendar.example.com')
+        self.assertEqual(host_key('http://127.0.0.1:8080/b.ics'), '127.0.0.1:8080')
+
+class TestHostCircuitInSync(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+        host_breakers.reset()
+
+        self.base_url = f'http://127.0.0.1:{unused_port()}'
+        for index in range(4):
+            user = create_user(f"user_{index}")
+            create_calendar(user.id, f'{self.base_url}/{index}.ics')
+
+    def tearDown(self):
+        host_breakers.reset()
+        # Clean up the temporary database and its WAL side files
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+
+    def test_dead_host_stops_costing_sync_attempts(self):
+        """Test that a sync cycle stops contacting a host once its circuit opens"""
+        with patch.object(circuit_breaker, 'HOST_BREAKER_FAILURE_THRESHOLD', 2):
+            sync_all_calendars()
+
+        attempted = [c for c in get_calendars() if get_sync_runs(c.id)]
+        self.assertEqual(len(attempted), 2)
+        self.assertTrue(host_breakers.is_open(self.base_url))
+
+        with self.assertRaises(HostCircuitOpenError):
+            download_ics(self.base_url + '/0.ics')
+
+    def test_rejected_download_does_not_back_off_calendar(self):
+        """Test that an open host circuit is not counted as a calendar failure"""
+        with patch.object(circuit_breaker, 'HOST_BREAKER_FAILURE_THRESHOLD', 1):
+            first, second = get_calendars()[:2]
+            self.assertFalse(sync_calendar(first))
+            self.assertFalse(sync_calendar(second))
+
+        first, second = get_calendars()[:2]
+        self.assertEqual(first.consecutive_failures, 1)
+        self.assertEqual(second.consecutive_failures, 0)
+        self.assertIn('Circuit open', get_sync_runs(second.id)[0].error)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import patch
+import services.ics_parser as ics_parser
+from services.ics_parser import NormalizedContentHash, calculate_content_hash
+
+EVENT_A = (
+    "BEGIN:VEVENT\r\n"
+    "UID:a@example.com\r\n"
+    "DTSTAMP:20261019T100000Z\r\n"
+    "SUMMARY:Planning\r\n"
+    "DTSTART:20261020T090000Z\r\n"
+    "END:VEVENT\r\n"
+)
+EVENT_B = (
+    "BEGIN:VEVENT\r\n"
+    "UID:b@example.com\r\n"
+    "LAST-MODIFIED:20261019T100000Z\r\n"
+    "SUMMARY:Retro\r\n"
+    "DTSTART:20261021T090000Z\r\n"
+    "END:VEVENT\r\n"
+)
+
+def make_calendar(*events):
+    return "BEGIN:VCALENDAR\r\nVERSION:2.0\r\n" + "".join(events) + "END:VCALENDAR\r\n"
+
+def normalized_hash(content, chunk_size=None):
+    hasher = NormalizedContentHash()
+    data = content.encode('utf-8')
+    chunk_size = chunk_size or len(data)
+    for i in range(0, len(data), chunk_size):
+        hasher.update(data[i:i + chunk_size])
+    return hasher.hexdigest()
+
+class TestNormalizedContentHash(unittest.TestCase):
+    def test_ignores_volatile_properties(self):
+        """Test that DTSTAMP and LAST-MODIFIED do not change the fingerprint"""
+        restamped = make_calendar(EVENT_A.replace('20261019T100000Z', '20261019T110000Z'),
+                                  EVENT_B.replace('20261019T100000Z', '20261019T110000Z'))
+        self.assertEqual(normalized_hash(make_calendar(EVENT_A, EVENT_B)), normalized_hash(restamped))
+
+    def test_ignores_component_order(self):
+        """Test that reordering events does not change the fingerprint"""
+        self.assertEqual(normalized_hash(make_calendar(EVENT_A, EVENT_B)),
+                         normalized_hash(make_calendar(EVENT_B, EVENT_A)))
+
+    def test_detects_real_changes(self):
+        """Test that a changed or removed event changes the fingerprint"""
+        original = normalized_hash(make_calendar(EVENT_A, EVENT_B))
+        self.assertNotEqual(original, normalized_hash(make_calendar(EVENT_A, EVENT_B.replace('Retro', 'Review'))))
+        self.assertNotEqual(original, normalized_hash(make_calendar(EVENT_A)))
+        self.assertNotEqual(original, normalized_hash(make_calendar(EVENT_A, EVENT_A, EVENT_B)))
+
+    def test_unfolds_lines_across_chunks(self):
+        """Test that folding and chunk boundaries do not change the fingerprint"""
+        folded = make_calendar(EVENT_A.replace('SUMMARY:Planning', 'SUMMARY:Plan\r\n ning'), EVENT_B)
+        expected = normalized_hash(make_calendar(EVENT_A, EVENT_B))
+        for chunk_size in (1, 3, 7, 64):
+            self.assertEqual(normalized_hash(folded, chunk_size), expected)
+
+    def test_long_folded_value(self):
+        """Test that a value folded over many lines hashes like the unfolded value"""
+        description = 'x' * 74 * 20000
+        folded_description = '\r\n '.join(description[i:i + 74] for i in range(0, len(description), 74))
+        folded = make_calendar(EVENT_A.replace('SUMMARY:Planning', f'DESCRIPTION:{folded_description}'))
+        unfolded = make_calendar(EVENT_A.replace('SUMMARY:Planning', f'DESCRIPTION:{description}'))
+        self.assertEqual(normalized_hash(folded, 65536), normalized_hash(unfolded))
+
+    def test_calculate_content_hash_follows_setting(self):
+        """Test that sync hashes use the fingerprint only when enabled"""
+        content = make_calendar(EVENT_A, EVENT_B)
+        with patch.object(ics_parser, 'ICS_NORMALIZED_HASH', True):
+            self.assertEqual(calculate_content_hash(content), normalized_hash(content))
+        with patch.object(ics_parser, 'ICS_NORMALIZED_HASH', False):
+            self.assertNotEqual(calculate_content_hash(content), normalized_hash(content))
+            self.assertNotEqual(calculate_content_hash(content),
+                                calculate_content_hash(make_calendar(EVENT_B, EVENT_A)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import unittest
+import tempfile
+import os
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from unittest.mock import patch
+import services.ics_parser as ics_parser
+from services.ics_parser import download_ics, IcsDownloadError, calculate_content_hash
+from services.database import init_db, set_db_path, create_user, create_calendar, get_calendars
+from services.calendar_service import sync_calendar, sync_all_calendars
+from services.circuit_breaker import host_breakers
+
+ICS_CONTENT = "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nX-WR-CALNAME:Café\r\nEND:VCALENDAR\r\n"
+
+class FeedHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/ok.ics':
+            body = ICS_CONTENT.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/calendar')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == '/declared-large.ics':
+            self.send_response(200)
+            self.send_header('Content-Length', str(10 * 1024 * 1024))
+            self.end_headers()
+        elif self.path == '/streamed-large.ics':
+            self.send_response(200)
+            self.end_headers()
+            for _ in range(64):
+                self.wfile.write(b'X' * 1024)
+        elif self.path == '/slow.ics':
+            self.send_response(200)
+            self.end_headers()
+            for _ in range(20):
+                self.wfile.write(b'X')
+                self.wfile.flush()
+                time.sleep(0.05)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestDownloadLimits(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FeedHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+        host_breakers.reset()
+
+    def tearDown(self):
+        # Clean up the temporary database and its WAL side files
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+
+    def test_download_decodes_utf8_by_default(self):
+        """Test a normal streamed download"""
+        download = download_ics(self.base_url + '/ok.ics')
+        self.assertEqual(download.content, ICS_CONTENT)
+        self.assertEqual(download.size, len(ICS_CONTENT.encode('utf-8')))
+        self.assertEqual(download.status_code, 200)
+
+    def test_unchanged_body_is_not_decoded(self):
+        """Test that the streamed raw-byte hash short-circuits decoding"""
+        first = download_ics(self.base_url + '/ok.ics')
+        self.assertEqual(first.content_hash, calculate_content_hash(ICS_CONTENT.encode('utf-8')))
+        self.assertFalse(first.unchanged)
+
+        with patch.object(ics_parser, '_decode_body') as mock_decode:
+            second = download_ics(self.base_url + '/ok.ics', known_hash=first.content_hash)
+        mock_decode.assert_not_called()
+        self.assertTrue(second.unchanged)
+        self.assertIsNone(second.content)
+        self.assertEqual(second.size, first.size)
+
+    def test_unchanged_sync_skips_decoding_and_parsing(self):
+        """Test that a sync of an unchanged feed neither decodes nor parses it"""
+        user = create_user("test_user")
+        calendar = create_calendar(user.id, self.base_url + '/ok.ics')
+        self.assertTrue(sync_calendar(calendar))
+
+        with patch.object(ics_parser, '_decode_body') as mock_decode, \
+                patch('services.calendar_service.parse_ics_content') as mock_parse:
+            self.assertTrue(sync_calendar(get_calendars()[0]))
+        mock_decode.assert_not_called()
+        mock_parse.assert_not_called()
+
+    def test_declared_size_over_limit(self):
+        """Test that an oversized Content-Length is rejected before reading"""
+        with patch.object(ics_parser, 'ICS_MAX_BYTES', 1024 * 1024):
+            with self.assertRaisesRegex(IcsDownloadError, 'too large'):
+                download_ics(self.base_url + '/declared-large.ics')
+
+    def test_streamed_size_over_limit(self):
+        """Test that a body without Content-Length is cut off at the limit"""
+        with patch.object(ics_parser, 'ICS_MAX_BYTES', 16 * 1024):
+            with self.assertRaisesRegex(IcsDownloadError, 'too large'):
+                download_ics(self.base_url + '/streamed-large.ics')
+
+    def test_slow_feed_is_aborted(self):
+        """Test slow-read detection and the total deadline"""
+        with patch.object(ics_parser, 'ICS_SLOW_READ_GRACE_SECONDS', 0.2), \
+                patch.object(ics_parser, 'ICS_MIN_BYTES_PER_SECOND', 1000):
+            with self.assertRaisesRegex(IcsDownloadError, 'too slow'):
+                download_ics(self.base_url + '/slow.ics')
+
+        with patch.object(ics_parser, 'ICS_DOWNLOAD_DEADLINE_SECONDS', 0.2), \
+                patch.object(ics_parser, 'ICS_MIN_BYTES_PER_SECOND', 0):
+            with self.assertRaisesRegex(IcsDownloadError, 'deadline'):
+                download_ics(self.base_url + '/slow.ics')
+
+    def test_failed_calendar_backs_off(self):
+        """Test that a failing feed is backed off and reset after a successful sync"""
+        user = create_user("test_user")
+        calendar = create_calendar(user.id, self.base_url + '/missing.ics')
+
+        self.assertFalse(sync_calendar(calendar))
+        calendar = get_calendars()[0]
+        self.assertEqual(calendar.consecutive_failures, 1)
+        self.assertGreater(calendar.next_sync_after, time.time())
+        self.assertIn('404', calendar.last_error)
+
+        # The periodic sync leaves the calendar alone while it backs off
+        with patch('services.calendar_service.sync_feed') as mock_sync:
+            sync_all_calendars()
+        mock_sync.assert_not_called()
+
+        self.assertTrue(sync_calendar(calendar._replace(url=self.base_url + '/ok.ics')))
+        calendar = get_calendars()[0]
+        self.assertEqual(calendar.consecutive_failures, 0)
+        self.assertIsNone(calendar.next_sync_after)
+
+if __name__ == '__main__':
+    unittest.main()
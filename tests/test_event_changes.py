@@ -0,0 +1,128 @@
+import unittest
+import time
+from unittest.mock import patch
+from services.database import create_user, create_calendar, delete_calendar
+from services.database import get_event_changes, get_db_connection, prune_event_changes
+from services.calendar_service import sync_calendar
+from tests.helpers import DatabaseTestCase, make_download
+
+class TestEventChanges(DatabaseTestCase):
+    def sync(self, calendar, *events):
+        download = make_download(*(f"UID:{uid}\nSUMMARY:{summary}\nDTSTART:20300101T100000Z\n"
+                                     for uid, summary in events))
+        with patch('services.calendar_service.download_ics', return_value=download):
+            self.assertTrue(sync_calendar(calendar._replace(sync_hash='stale')))
+
+    def test_sync_logs_inserts_updates_and_deletes(self):
+        """Test that each subscription change is logged once, in order"""
+        self.sync(self.calendar, ('a', 'Standup'), ('b', 'Review'))
+        self.sync(self.calendar, ('a', 'Moved standup'), ('b', 'Review'))
+        self.sync(self.calendar, ('a', 'Moved standup'))
+        
+        # Changes carry the current content, so 'b' has none after its delete
+        changes = get_event_changes(0, 100).changes
+        self.assertEqual([(change.op, change.uid) for change in changes],
+                         [('insert', 'a'), ('insert', None), ('update', 'a'), ('delete', None)])
+        self.assertEqual([change.seq for change in changes], sorted(change.seq for change in changes))
+        self.assertEqual(changes[2].title, 'Moved standup')
+        self.assertEqual(changes[3].event_id, changes[1].event_id)
+        
+        # Unchanged syncs add nothing
+        self.sync(self.calendar, ('a', 'Moved standup'))
+        self.assertEqual(get_event_changes(changes[-1].seq, 100).changes, [])
+
+    def test_shared_feed_logs_each_subscription(self):
+        """Test that calendars sharing a feed each see the change, filterable by user"""
+        other = create_user("other_user")
+        other_calendar = create_calendar(other.id, "https://example.com/calendar.ics")
+        self.sync(self.calendar, ('a', 'Standup'))
+        self.sync(self.calendar, ('a', 'Moved'))
+        
+        changes = get_event_changes(0, 100).changes
+        self.assertEqual([(change.op, change.calendar_id) for change in changes],
+                         [('insert', self.calendar.id), ('insert', other_calendar.id),
+                          ('update', self.calendar.id), ('update', other_calendar.id)])
+        changes = get_event_changes(0, 100, user_id='other_user').changes
+        self.assertEqual([(change.op, change.calendar_id, change.title) for change in changes],
+                         [('insert', other_calendar.id, 'Moved'), ('update', other_calendar.id, 'Moved')])
+        changes = get_event_changes(0, 100, calendar_id=self.calendar.id).changes
+        self.assertEqual([(change.op, change.calendar_id) for change in changes],
+                         [('insert', self.calendar.id), ('update', self.calendar.id)])
+        
+        delete_calendar(other_calendar.id)
+        changes = get_event_changes(changes[-1].seq, 100, user_id='other_user').changes
+        self.assertEqual([change.op for change in changes], ['delete'])
+
+    def test_update_is_logged_once_per_feed_event(self):
+        """Test that an update of a shared feed event adds one log row and pages never split it"""
+        for i in range(3):
+            user = create_user(f"user_{i}")
+            create_calendar(user.id, "https://example.com/calendar.ics")
+        self.sync(self.calendar, ('a', 'Standup'))
+        self.sync(self.calendar, ('a', 'Moved'))
+        
+        conn = get_db_connection()
+        rows = conn.execute("SELECT COUNT(*) FROM event_changes WHERE op = 'update'").fetchone()[0]
+        conn.close()
+        self.assertEqual(rows, 1)
+        
+        # The four inserts fill the first page; the update of four subscriptions is returned whole
+        page = get_event_changes(0, 5)
+        self.assertEqual([change.op for change in page.changes], ['insert'] * 4)
+        self.assertTrue(page.has_more)
+        page = get_event_changes(page.changes[-1].seq, 2)
+        self.assertEqual([change.op for change in page.changes], ['update'] * 4)
+        self.assertFalse(page.has_more)
+
+    def test_migration_keeps_sequence_of_pruned_log(self):
+        """Test that rebuilding the change log does not reuse the sequence numbers of pruned changes"""
+        from migrations import m202610192000_event_change_feed_updates as migration
+        conn = get_db_connection()
+        conn.execute('DROP TABLE event_changes')
+        conn.execute('''
+            CREATE TABLE event_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT, event_id INTEGER NOT NULL, calendar_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL, op TEXT NOT NULL, changed_at REAL NOT NULL
+            )
+        ''')
+        conn.execute("INSERT INTO event_changes VALUES (9, 1, 1, 1, 'insert', 0)")
+        conn.execute('DELETE FROM event_changes')
+        conn.commit()
+        conn.close()
+        
+        migration.run()
+        self.sync(self.calendar, ('a', 'Standup'))
+        self.assertEqual([change.seq for change in get_event_changes(0, 100).changes], [10])
+
+    def test_changes_endpoint_pages_with_cursor(self):
+        """Test keyset paging, the end-of-log cursor and pruned cursors"""
+        client = self.make_client()
+        headers = {'X-API-Key': 'test-api-key'}
+        self.sync(self.calendar, ('a', 'A'), ('b', 'B'), ('c', 'C'))
+        
+        response = client.get('/events/changes?since=0&limit=2', headers=headers)
+        data = response.get_json()
+        self.assertEqual([change['event']['uid'] for change in data['changes']], ['a', 'b'])
+        self.assertTrue(data['has_more'])
+        
+        response = client.get(f"/events/changes?since={data['next_since']}&limit=2", headers=headers)
+        data = response.get_json()
+        self.assertEqual([change['op'] for change in data['changes']], ['insert'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(data['next_since'], data['latest_seq'])
+        
+        response = client.get('/events/changes?since=0&user_id=nobody', headers=headers)
+        self.assertEqual(response.status_code, 404)
+        response = client.get('/events/changes', headers=headers)
+        self.assertEqual(response.status_code, 422)
+        
+        # Once the log is pruned, old cursors have to start over
+        with patch('services.database.time.time', return_value=time.time() + 30 * 86400):
+            self.assertEqual(prune_event_changes(), 3)
+        response = client.get('/events/changes?since=1', headers=headers)
+        self.assertEqual(response.status_code, 410)
+        response = client.get(f"/events/changes?since={data['latest_seq']}", headers=headers)
+        self.assertEqual(response.get_json()['changes'], [])
+
+if __name__ == '__main__':
+    unittest.main()
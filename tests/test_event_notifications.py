@@ -0,0 +1,98 @@
+import unittest
+import tempfile
+import os
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from services.database import init_db, set_db_path, create_user, create_calendar, create_event
+from services.database import get_pending_events, mark_event_notified, get_db_connection
+from services.calendar_service import sync_calendar
+from services.ics_parser import IcsDownload
+
+def make_download(start, summary):
+    content = ("BEGIN:VCALENDAR\nVERSION:2.0\nBEGIN:VEVENT\nUID:standup\n"
+               f"SUMMARY:{summary}\nDTSTART:{start}\nDTEND:{start}\nEND:VEVENT\nEND:VCALENDAR\n")
+    return IcsDownload(content, 200, len(content.encode()))
+
+class TestEventNotifications(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+        self.user = create_user("test_user")
+        self.calendar = create_calendar(self.user.id, "https://example.com/calendar.ics")
+
+    def tearDown(self):
+        # Clean up the temporary database and its WAL side files
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+
+    def get_notification(self, event_id):
+        conn = get_db_connection()
+        try:
+            return conn.execute('SELECT * FROM event_notifications WHERE event_id = ?', (event_id,)).fetchone()
+        finally:
+            conn.close()
+
+    def test_delivery_is_recorded_in_event_notifications(self):
+        """Test that marking an event notified only writes its notification row"""
+        start = (datetime.now(timezone.utc) + timedelta(minutes=30)).isoformat()
+        event = create_event(self.calendar.id, 'event-1', 'Soon', '', '', start, start, False)
+        self.assertEqual(self.get_notification(event.id)['notified'], 0)
+
+        self.assertTrue(mark_event_notified(event.id))
+        self.assertFalse(mark_event_notified(event.id))
+        self.assertFalse(mark_event_notified(event.id + 100))
+
+        notification = self.get_notification(event.id)
+        self.assertEqual((notification['notified'], notification['attempts']), (1, 1))
+        self.assertIsNotNone(notification['notified_at'])
+        self.assertEqual(get_pending_events(), [])
+
+    def test_sync_updates_keep_delivery_state(self):
+        """Test that content updates from a sync leave delivery state alone"""
+        start = (datetime.now(timezone.utc) + timedelta(minutes=30)).strftime('%Y%m%dT%H%M%SZ')
+        with patch('services.calendar_service.download_ics', return_value=make_download(start, 'Standup')):
+            self.assertTrue(sync_calendar(self.calendar))
+        event, = get_pending_events()
+        self.assertTrue(mark_event_notified(event.id))
+
+        with patch('services.calendar_service.download_ics', return_value=make_download(start, 'Moved')):
+            self.assertTrue(sync_calendar(self.calendar._replace(sync_hash='stale')))
+        self.assertEqual(get_pending_events(), [])
+        self.assertEqual(self.get_notification(event.id)['notified'], 1)
+
+    def test_migration_moves_notified_flags(self):
+        """Test that the migration copies notified flags and drops the events column"""
+        from migrations import m202610191600_event_notifications as migration
+        start = (datetime.now(timezone.utc) + timedelta(minutes=30)).isoformat()
+        delivered = create_event(self.calendar.id, 'event-1', 'Done', '', '', start, start, False)
+        pending = create_event(self.calendar.id, 'event-2', 'Soon', '', '', start, start, False)
+
+        # Restore the previous layout, with the flag on events
+        conn = get_db_connection()
+        conn.executescript('''
+            DROP TABLE event_notifications;
+            ALTER TABLE events ADD COLUMN notified BOOLEAN DEFAULT FALSE;
+        ''')
+        conn.execute('UPDATE events SET notified = TRUE WHERE id = ?', (delivered.id,))
+        conn.commit()
+        conn.close()
+
+        migration.run()
+
+        self.assertEqual([event.id for event in get_pending_events()], [pending.id])
+        self.assertEqual(self.get_notification(delivered.id)['notified'], 1)
+        conn = get_db_connection()
+        try:
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(events)')}
+        finally:
+            conn.close()
+        self.assertNotIn('notified', columns)
+
+if __name__ == '__main__':
+    unittest.main()
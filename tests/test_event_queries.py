@@ -0,0 +1,119 @@
+import unittest
+import sqlite3
+from unittest.mock import patch
+from services.database import create_user, create_calendar, create_event
+from services.database import query_events, get_db_connection
+from tests.helpers import DatabaseTestCase
+
+class TestEventQueries(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_calendar = create_calendar(self.user.id, "https://example.com/home.ics")
+        other_user = create_user("other_user")
+        self.foreign_calendar = create_calendar(other_user.id, "https://example.com/other.ics")
+        
+        # Same wall-clock times with different offsets: 10:00+02:00 is 08:00 UTC
+        create_event(self.calendar.id, 'standup', 'Standup', '', 'Room 1',
+                     '2030-01-01T10:00:00+02:00', '2030-01-01T10:15:00+02:00', False)
+        create_event(self.calendar.id, 'review', 'Review', '100% done', '',
+                     '2030-01-01T09:00:00+00:00', '2030-01-01T10:00:00+00:00', False)
+        create_event(self.calendar.id, 'retro', 'Retro', '', '',
+                     '2030-01-02 09:00:00', '2030-01-02 10:00:00', False)
+        create_event(self.other_calendar.id, 'dentist', 'Dentist', '', '',
+                     '2030-01-01T12:00:00+00:00', '2030-01-01T13:00:00+00:00', False)
+        create_event(self.foreign_calendar.id, 'standup', 'Standup', '', '',
+                     '2030-01-01T08:30:00+00:00', '2030-01-01T08:45:00+00:00', False)
+
+    def list_uids(self, client, query):
+        response = client.get(f'/events?{query}', headers={'X-API-Key': 'test-api-key'})
+        self.assertEqual(response.status_code, 200)
+        return [event['uid'] for event in response.get_json()['events']]
+
+    def test_filters(self):
+        """Test the calendar, user, time range and text filters"""
+        client = self.make_client()
+        
+        self.assertEqual(self.list_uids(client, f'calendar_id={self.calendar.id}'), ['standup', 'review', 'retro'])
+        self.assertEqual(self.list_uids(client, 'user_id=test_user&to=2030-01-02T00:00:00Z'),
+                         ['standup', 'review', 'dentist'])
+        self.assertEqual(self.list_uids(client, 'user_id=test_user&from=2030-01-01T08:15:00Z&to=2030-01-01T12:00:00Z'),
+                         ['review'])
+        self.assertEqual(self.list_uids(client, f'user_id=other_user&calendar_id={self.calendar.id}'), [])
+        self.assertEqual(self.list_uids(client, 'user_id=other_user&q=STAND'), ['standup'])
+        self.assertEqual(self.list_uids(client, 'user_id=test_user&q=room'), ['standup'])
+        self.assertEqual(self.list_uids(client, 'user_id=test_user&q=100%25'), ['review'])
+        self.assertEqual(self.list_uids(client, 'user_id=test_user&q=_'), [])
+        
+        response = client.get('/events?user_id=nobody', headers={'X-API-Key': 'test-api-key'})
+        self.assertEqual(response.status_code, 404)
+        response = client.get('/events?q=STAND', headers={'X-API-Key': 'test-api-key'})
+        self.assertEqual(response.status_code, 400)
+        response = client.get('/events')
+        self.assertEqual(response.status_code, 401)
+
+    def test_keyset_pagination(self):
+        """Test that pages over a user's calendars follow each other without gaps or repeats"""
+        client = self.make_client()
+        headers = {'X-API-Key': 'test-api-key'}
+        
+        uids, cursor = [], ''
+        while True:
+            response = client.get(f'/events?user_id=test_user&limit=2{cursor}', headers=headers)
+            data = response.get_json()
+            self.assertLessEqual(len(data['events']), 2)
+            uids += [(event['calendar_id'], event['uid']) for event in data['events']]
+            if not data['next_cursor']:
+                break
+            cursor = f"&cursor={data['next_cursor']}"
+        
+        self.assertEqual([uid for _, uid in uids], ['standup', 'review', 'dentist', 'retro'])
+        self.assertEqual(len(set(uids)), 4)
+        
+        response = client.get('/events?user_id=test_user&cursor=garbage', headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_calendar_range_uses_start_index(self):
+        """Test that a calendar's range query is served by the (feed_id, start_at) index"""
+        events = query_events(calendar_id=self.calendar.id, limit=1)
+        self.assertEqual([event.uid for event in events], ['standup'])
+        
+        conn = get_db_connection()
+        try:
+            plan = ' '.join(row[3] for row in conn.execute('''
+                EXPLAIN QUERY PLAN
+                SELECT e.id FROM calendars c
+                JOIN feed_events f ON f.feed_id = c.feed_id
+                JOIN events e ON e.calendar_id = c.id AND e.feed_event_id = f.id
+                WHERE c.id = ? AND f.start_at >= ? AND f.start_at < ?
+                ORDER BY f.start_at, e.id
+            ''', (self.calendar.id, 0, 1)))
+        finally:
+            conn.close()
+        self.assertIn('idx_feed_events_feed_start', plan)
+
+    def test_user_query_scans_each_calendar_by_start(self):
+        """Test that a user's events are read by a limited index scan per calendar, without sorting"""
+        conn = get_db_connection()
+        statements = []
+        # Capture the statements query_events runs, with their parameters expanded
+        with patch('services.database.get_read_connection', return_value=conn):
+            conn.close = lambda: None
+            conn.set_trace_callback(statements.append)
+            events = query_events(user_id='test_user', start_from=0, limit=2)
+            conn.set_trace_callback(None)
+        self.assertEqual([event.uid for event in events], ['standup', 'review'])
+        
+        event_queries = [sql for sql in statements if 'feed_events' in sql]
+        self.assertEqual(len(event_queries), 2)
+        try:
+            for sql in event_queries:
+                self.assertIn('LIMIT 2', sql)
+                plan = ' '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql))
+                self.assertIn('idx_feed_events_feed_start', plan)
+                # Only events sharing a start time are sorted by ID ("RIGHT PART OF ORDER BY")
+                self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+        finally:
+            sqlite3.Connection.close(conn)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+import unittest
+import tempfile
+import os
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from services.database import init_db, set_db_path, create_user, create_calendar, get_calendars
+from services.database import delete_calendar, seed_calendars, get_sync_runs, get_db_connection
+from services.database import normalize_feed_url, get_pending_events, mark_event_notified
+from services.calendar_service import sync_all_calendars
+from services.ics_parser import IcsDownload, parse_ics_content
+
+ICS_CONTENT = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:holiday-1
+SUMMARY:Holiday
+DTSTART:20300101T000000Z
+DTEND:20300102T000000Z
+END:VEVENT
+END:VCALENDAR
+"""
+DOWNLOAD = IcsDownload(ICS_CONTENT, 200, len(ICS_CONTENT.encode()))
+
+def make_download(start, summary='Standup'):
+    content = ICS_CONTENT.replace('20300101T000000Z', start).replace('Holiday', summary)
+    return IcsDownload(content, 200, len(content.encode()))
+
+class TestFeeds(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+
+    def tearDown(self):
+        # Clean up the temporary database and its WAL side files
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+
+    def count_rows(self, table):
+        conn = get_db_connection()
+        try:
+            return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        finally:
+            conn.close()
+
+    def count_feeds(self):
+        return self.count_rows('feeds')
+
+    def test_normalize_feed_url(self):
+        """Test that equivalent URLs normalize to the same feed URL"""
+        self.assertEqual(normalize_feed_url('HTTPS://Example.COM:443/Holidays.ics#top'),
+                         'https://example.com/Holidays.ics')
+        self.assertEqual(normalize_feed_url('http://example.com'), 'http://example.com/')
+        self.assertEqual(normalize_feed_url('http://example.com:8080/a?b=C'), 'http://example.com:8080/a?b=C')
+
+    def test_subscriptions_share_one_feed(self):
+        """Test that calendars of equivalent URLs reference one feed"""
+        alice = create_user('alice')
+        bob = create_user('bob')
+        first = create_calendar(alice.id, 'https://example.com/holidays.ics')
+        second = create_calendar(bob.id, 'https://EXAMPLE.com:443/holidays.ics')
+        seed_calendars({'carol': 'https://example.com/holidays.ics#x'})
+
+        feed_ids = {calendar.feed_id for calendar in get_calendars()}
+        self.assertEqual(feed_ids, {first.feed_id})
+        self.assertEqual(second.feed_id, first.feed_id)
+        self.assertEqual(self.count_feeds(), 1)
+
+        # The feed goes away with its last subscription
+        for calendar in get_calendars():
+            delete_calendar(calendar.id)
+            self.assertEqual(self.count_feeds(), 1 if get_calendars() else 0)
+
+    def test_sync_fetches_each_feed_once(self):
+        """Test that a sync cycle downloads a shared feed once and stores it for every subscription"""
+        calendars = [create_calendar(create_user(f'user-{i}').id, 'https://example.com/holidays.ics')
+                     for i in range(3)]
+
+        with patch('services.calendar_service.download_ics', return_value=DOWNLOAD) as mock_download, \
+                patch('services.calendar_service.parse_ics_content', wraps=parse_ics_content) as mock_parse:
+            sync_all_calendars()
+
+        self.assertEqual(mock_download.call_count, 1)
+        self.assertEqual(mock_parse.call_count, 1)
+        for calendar in calendars:
+            run, = get_sync_runs(calendar.id)
+            self.assertEqual(run.inserted, 1)
+
+        # A new subscriber to an unchanged feed still gets its events
+        late = create_calendar(create_user('late').id, 'https://example.com/holidays.ics')
+        with patch('services.calendar_service.download_ics', return_value=DOWNLOAD) as mock_download:
+            sync_all_calendars()
+
+        mock_download.assert_called_once_with('https://example.com/holidays.ics', None)
+        run, = get_sync_runs(late.id)
+        self.assertEqual(run.inserted, 1)
+        for calendar in calendars:
+            self.assertTrue(get_sync_runs(calendar.id, 1)[0].skipped)
+
+    def test_events_are_stored_once_per_feed(self):
+        """Test that subscriptions share event content but keep their own notification state"""
+        for user_id in ('alice', 'bob'):
+            create_calendar(create_user(user_id).id, 'https://example.com/team.ics')
+        soon = (datetime.now(timezone.utc) + timedelta(minutes=30)).strftime('%Y%m%dT%H%M%SZ')
+
+        with patch('services.calendar_service.download_ics', return_value=make_download(soon)):
+            sync_all_calendars()
+        self.assertEqual(self.count_rows('feed_events'), 1)
+        self.assertEqual(self.count_rows('events'), 2)
+
+        alice_event, = get_pending_events('alice')
+        bob_event, = get_pending_events('bob')
+        self.assertNotEqual(alice_event.id, bob_event.id)
+        self.assertEqual(alice_event.uid, bob_event.uid)
+
+        # Delivery to one subscriber leaves the other pending
+        self.assertTrue(mark_event_notified(alice_event.id))
+        self.assertEqual(get_pending_events('alice'), [])
+        self.assertEqual([event.id for event in get_pending_events('bob')], [bob_event.id])
+
+        # A content change rewrites the shared row once, under the same event ids
+        with patch('services.calendar_service.download_ics', return_value=make_download(soon, 'Sync')):
+            sync_all_calendars()
+        self.assertEqual(self.count_rows('feed_events'), 1)
+        bob_event, = get_pending_events('bob')
+        self.assertEqual(bob_event.title, 'Sync')
+        for calendar in get_calendars():
+            self.assertEqual(get_sync_runs(calendar.id, 1)[0].updated, 1)
+
+    def test_migration_moves_events_to_feed_events(self):
+        """Test that per-calendar event copies collapse into feed events, keeping event ids"""
+        from migrations import m202610191500_feed_events as migration
+        first = create_calendar(create_user('alice').id, 'https://example.com/team.ics')
+        second = create_calendar(create_user('bob').id, 'https://example.com/team.ics')
+
+        # Recreate the per-calendar events table of the previous schema
+        conn = get_db_connection()
+        conn.executescript('''
+            DROP TABLE events;
+            DROP TABLE feed_events;
+            CREATE TABLE events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                calendar_id INTEGER NOT NULL,
+                uid TEXT NOT NULL,
+                title TEXT,
+                description TEXT,
+                location TEXT,
+                start_datetime TIMESTAMP NOT NULL,
+                end_datetime TIMESTAMP NOT NULL,
+                all_day BOOLEAN DEFAULT FALSE,
+                notified BOOLEAN DEFAULT FALSE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        ''')
+        conn.executemany('''
+            INSERT INTO events (id, calendar_id, uid, title, start_datetime, end_datetime, notified)
+            VALUES (?, ?, 'standup', 'Standup', '2030-01-01T10:00:00+00:00', '2030-01-01T10:15:00+00:00', ?)
+        ''', [(10, first.id, True), (11, second.id, False), (12, 999, False)])
+        conn.execute("UPDATE calendars SET sync_hash = 'old'")
+        conn.commit()
+        conn.close()
+
+        migration.run()
+
+        conn = get_db_connection()
+        try:
+            rows = conn.execute('SELECT id, calendar_id, notified FROM events ORDER BY id').fetchall()
+            self.assertEqual([tuple(row) for row in rows], [(10, first.id, 1), (11, second.id, 0)])
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM feed_events').fetchone()[0], 1)
+            self.assertEqual(conn.execute('SELECT COUNT(sync_hash) FROM calendars').fetchone()[0], 0)
+        finally:
+            conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
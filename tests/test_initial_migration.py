@@ -47,18 +47,34 @@ class TestInitialMigration(unittest.TestCase):
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='events'")
         self.assertIsNotNone(cursor.fetchone(), "events table should exist")
         
+        # Check feed_events table
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='feed_events'")
+        self.assertIsNotNone(cursor.fetchone(), "feed_events table should exist")
+        
         # Check indexes
         cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name='idx_calendars_user_id'")
         self.assertIsNotNone(cursor.fetchone(), "idx_calendars_user_id index should exist")
         
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name='idx_events_calendar_id'")
-        self.assertIsNotNone(cursor.fetchone(), "idx_events_calendar_id index should exist")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name='idx_calendars_events_unique'")
+        self.assertIsNotNone(cursor.fetchone(), "idx_calendars_events_unique index should exist")
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name='idx_events_feed_event_id'")
+        self.assertIsNotNone(cursor.fetchone(), "idx_events_feed_event_id index should exist")
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name='idx_feed_events_start_datetime'")
+        self.assertIsNone(cursor.fetchone(), "idx_feed_events_start_datetime index should not exist")
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name='idx_event_notifications_pending'")
+        self.assertIsNone(cursor.fetchone(), "idx_event_notifications_pending index should be dropped")
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name='idx_reminders_due'")
+        self.assertIsNotNone(cursor.fetchone(), "idx_reminders_due index should exist")
         
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name='idx_events_start_datetime'")
-        self.assertIsNotNone(cursor.fetchone(), "idx_events_start_datetime index should exist")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name='idx_event_changes_user_seq'")
+        self.assertIsNotNone(cursor.fetchone(), "idx_event_changes_user_seq index should exist")
         
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name='idx_events_notified'")
-        self.assertIsNotNone(cursor.fetchone(), "idx_events_notified index should exist")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name='idx_feed_events_feed_start'")
+        self.assertIsNotNone(cursor.fetchone(), "idx_feed_events_feed_start index should exist")
         
         conn.close()
 
@@ -0,0 +1,121 @@
+import unittest
+import tempfile
+import os
+import io
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import manual_sync
+from manual_sync import select_calendars, sync_all_calendars_manual, parse_since, Progress
+from services.database import init_db, set_db_path, create_user, create_calendar, get_calendars
+from services.database import record_sync_run, get_sync_runs, get_db_connection
+from services.ics_parser import IcsDownload
+
+ICS_CONTENT = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:event-1
+SUMMARY:Test Event
+DTSTART:20300101T100000Z
+DTEND:20300101T110000Z
+END:VEVENT
+END:VCALENDAR
+"""
+DOWNLOAD = IcsDownload(ICS_CONTENT, 200, len(ICS_CONTENT.encode()))
+
+class TestManualSync(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+
+        self.calendars = []
+        for index in range(3):
+            user = create_user(f"user_{index}")
+            self.calendars.append(create_calendar(user.id, f"https://example.com/{index}.ics"))
+
+    def tearDown(self):
+        # Clean up the temporary database and its WAL side files
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+
+    def count_events(self):
+        conn = get_db_connection()
+        count = conn.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+        conn.close()
+        return count
+
+    def test_parse_since(self):
+        """Test duration and timestamp forms of --since"""
+        cutoff = parse_since('2h')
+        self.assertAlmostEqual((datetime.now() - cutoff).total_seconds(), 7200, delta=5)
+        self.assertEqual(parse_since('2024-01-01T00:00:00'), datetime(2024, 1, 1))
+
+    def test_filters_use_sync_history(self):
+        """Test --since and --failed-only selection"""
+        first, second, third = self.calendars
+        recent = datetime.now().isoformat()
+        old = (datetime.now() - timedelta(days=3)).isoformat()
+        record_sync_run(first.id, recent, 1.0)
+        record_sync_run(second.id, old, 1.0)
+        record_sync_run(second.id, recent, 1.0, error='timeout')
+
+        since = parse_since('1d')
+        self.assertEqual([c.id for c in select_calendars(get_calendars(), since=since)], [second.id, third.id])
+        self.assertEqual([c.id for c in select_calendars(get_calendars(), failed_only=True)], [second.id])
+
+    def test_parallel_sync_with_checkpoint_resume(self):
+        """Test that a checkpointed run skips calendars finished by an earlier run"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            checkpoint = os.path.join(temp_dir, 'sync.checkpoint')
+            with open(checkpoint, 'w') as f:
+                f.write(f"{self.calendars[0].id} ok\n{self.calendars[1].id} failed\n")
+
+            with patch('services.calendar_service.download_ics', return_value=DOWNLOAD):
+                self.assertTrue(sync_all_calendars_manual(workers=3, checkpoint_path=checkpoint,
+                                                          show_progress=False))
+
+            self.assertEqual(get_sync_runs(self.calendars[0].id), [])
+            self.assertEqual(len(get_sync_runs(self.calendars[1].id)), 1)
+            with open(checkpoint) as f:
+                self.assertEqual(len(f.read().splitlines()), 4)
+
+    def test_failed_sync_is_not_checkpointed_as_ok(self):
+        """Test that failed syncs fail the run and are recorded as failed for a resumed run"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            checkpoint = os.path.join(temp_dir, 'sync.checkpoint')
+            with patch('services.calendar_service.download_ics', side_effect=RuntimeError('down')):
+                self.assertFalse(sync_all_calendars_manual(workers=3, checkpoint_path=checkpoint,
+                                                           show_progress=False))
+
+            with open(checkpoint) as f:
+                self.assertEqual(sorted(f.read().splitlines()),
+                                 sorted(f"{calendar.id} failed" for calendar in self.calendars))
+
+    def test_dry_run_does_not_write(self):
+        """Test that --dry-run downloads and diffs without touching events or history"""
+        with patch('services.calendar_service.download_ics', return_value=DOWNLOAD), \
+                self.assertLogs(manual_sync.__name__, level='INFO') as logs:
+            self.assertTrue(sync_all_calendars_manual(workers=2, dry_run=True, show_progress=False))
+
+        self.assertEqual(self.count_events(), 0)
+        self.assertEqual(get_sync_runs(self.calendars[0].id), [])
+        self.assertTrue(any('would insert 1, update 0, delete 0' in line for line in logs.output))
+
+    def test_progress_reports_throughput(self):
+        """Test the progress line"""
+        stream = io.StringIO()
+        progress = Progress(2, stream=stream)
+        progress.update(True)
+        progress.update(False)
+        output = stream.getvalue()
+        self.assertIn('2/2', output)
+        self.assertIn('cal/s', output)
+        self.assertIn('failed 1', output)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import unittest
+import tempfile
+import os
+import sqlite3
+import threading
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from flask import Flask
+from flask_smorest import Api
+from services.api_service import initialize_api
+from services.database import init_db, set_db_path, create_user, create_calendar, get_calendars
+from services.database import create_event, get_pending_events, mark_event_notified
+from services.calendar_service import sync_calendar
+from services.ics_parser import IcsDownload
+from services.metrics import Histogram, render_metrics, reset_metrics
+from services import metrics
+
+ICS_CONTENT = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:event-1
+SUMMARY:Test Event
+DTSTART:20300101T100000Z
+DTEND:20300101T110000Z
+END:VEVENT
+END:VCALENDAR
+"""
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+        reset_metrics()
+
+        user = create_user("test_user")
+        self.calendar = create_calendar(user.id, "https://example.com/calendar.ics")
+
+    def tearDown(self):
+        # Clean up the temporary database and its WAL side files
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+
+    def test_histogram_renders_cumulative_buckets(self):
+        """Test the Prometheus text format of a histogram"""
+        histogram = Histogram('test_latency_seconds', 'Test latency', buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        text = histogram.render()
+        self.assertIn('# TYPE test_latency_seconds histogram', text)
+        self.assertIn('test_latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('test_latency_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn('test_latency_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn('test_latency_seconds_count 3', text)
+
+    def test_sync_records_download_parse_and_upserts(self):
+        """Test that a sync records its hot-path metrics per calendar"""
+        calendar_id = self.calendar.id
+        download = IcsDownload(ICS_CONTENT, 200, len(ICS_CONTENT.encode()))
+        with patch('services.calendar_service.download_ics', return_value=download):
+            self.assertTrue(sync_calendar(self.calendar))
+            self.assertTrue(sync_calendar(get_calendars()[0]))
+
+        self.assertEqual(metrics.CALENDAR_DOWNLOAD_BYTES.value(calendar_id=calendar_id),
+                         2 * len(ICS_CONTENT.encode()))
+        self.assertEqual(metrics.CALENDAR_DOWNLOAD_SECONDS.count(), 2)
+        self.assertEqual(metrics.CALENDAR_PARSE_SECONDS.count(), 1)
+        self.assertEqual(metrics.CALENDAR_EVENTS_UPSERTED.value(calendar_id=calendar_id), 1)
+        self.assertEqual(metrics.CALENDAR_SYNC_SKIPPED.value(calendar_id=calendar_id), 1)
+
+    def test_pending_query_and_notification_lag(self):
+        """Test pending-query latency and notification lag metrics"""
+        start = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+        event = create_event(self.calendar.id, 'lag-event', 'Soon', '', '', start, start, False)
+
+        self.assertEqual(len(get_pending_events()), 1)
+        self.assertEqual(metrics.PENDING_QUERY_SECONDS.count(scope='all'), 1)
+        self.assertEqual(metrics.PENDING_EVENTS.value(), 1)
+
+        self.assertTrue(mark_event_notified(event.id))
+        self.assertEqual(metrics.NOTIFICATION_LAG_SECONDS.count(), 1)
+
+    def test_write_lock_wait_is_timed(self):
+        """Test that the write lock wait covers the time another writer holds the lock"""
+        reset_metrics()
+        holder = sqlite3.connect(self.temp_db.name, check_same_thread=False)
+        holder.execute('BEGIN IMMEDIATE')
+        timer = threading.Timer(0.2, holder.commit)
+        timer.start()
+        try:
+            self.assertFalse(mark_event_notified(0))
+        finally:
+            timer.join()
+            holder.close()
+
+        self.assertEqual(metrics.DB_LOCK_WAIT_SECONDS.count(), 1)
+        self.assertIn('icsgate_db_lock_wait_seconds_bucket{le="0.1"} 0', render_metrics())
+
+    def test_metrics_endpoint(self):
+        """Test that /metrics serves the text exposition format"""
+        app = Flask(__name__)
+        app.config["TESTING"] = True
+        app.config["API_TITLE"] = "ICS Bot API"
+        app.config["API_VERSION"] = "v1"
+        app.config["OPENAPI_VERSION"] = "3.0.2"
+        initialize_api(Api(app))
+
+        get_pending_events()
+        response = app.test_client().get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        self.assertIn('icsgate_pending_query_seconds_count{scope="all"} 1', response.get_data(as_text=True))
+        self.assertEqual(response.get_data(as_text=True), render_metrics())
+
+    def test_multiprocess_values_are_merged(self):
+        """Test that /metrics merges the values other processes wrote to METRICS_MULTIPROC_DIR"""
+        metrics.CALENDAR_DOWNLOAD_BYTES.inc(100, calendar_id=1)
+        metrics.PENDING_EVENTS.set(2)
+        metrics.SYNC_CYCLE_SECONDS.observe(0.5)
+
+        # A worker that has exited since it wrote its values
+        exited = {'pid': 2 ** 22 + 1, 'metrics': {
+            metrics.CALENDAR_DOWNLOAD_BYTES.name: [[['1'], 50]],
+            metrics.PENDING_EVENTS.name: [[[], 7]],
+            metrics.SYNC_CYCLE_SECONDS.name: [[[], metrics.SYNC_CYCLE_SECONDS.snapshot()[()]]],
+        }}
+
+        with tempfile.TemporaryDirectory() as directory, \
+                patch.object(metrics, 'METRICS_MULTIPROC_DIR', directory):
+            with open(os.path.join(directory, f"metrics-{exited['pid']}.json"), 'w') as file:
+                json.dump(exited, file)
+
+            text = render_metrics()
+
+        self.assertIn('icsgate_calendar_download_bytes_total{calendar_id="1"} 150', text)
+        self.assertIn('icsgate_pending_events 2', text)
+        self.assertIn('icsgate_sync_cycle_seconds_count 2', text)
+        self.assertIn('icsgate_sync_cycle_seconds_bucket{le="0.5"} 2', text)
+
+    def test_metric_requires_samples(self):
+        """Test that a metric type without samples cannot be instantiated"""
+        with self.assertRaises(TypeError):
+            metrics.Metric('test_untyped', 'Untyped')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -171,10 +171,59 @@ def test_remove_calendar_duplicates_migration():
         except:
             pass  # Ignore errors during cleanup
 
+def test_migration_runner_batches_pending_migrations():
+    """Test that pending migrations run in one transaction and legacy names count as applied"""
+    from unittest.mock import patch
+    from migrations import migration_manager
+    from migrations.migration_manager import run_all_migrations, get_schema_version, SCHEMA_VERSION
+    
+    temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+    temp_db.close()
+    
+    try:
+        set_db_path(temp_db.name)
+        
+        # Simulate a database migrated by an older runner that recorded a legacy name
+        init_migration_table()
+        record_migration("migrations/m20260201_unique_event")
+        
+        # A failing migration rolls back every migration of the batch
+        failing = migration_manager.MIGRATIONS + [("broken", "broken")]
+        with patch.object(migration_manager, 'MIGRATIONS', failing), \
+                patch.object(migration_manager, 'SCHEMA_VERSION', SCHEMA_VERSION + 1):
+            with pytest.raises(ModuleNotFoundError):
+                run_all_migrations()
+        
+        conn = sqlite3.connect(temp_db.name)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        conn.close()
+        assert 'users' not in tables, "Failed batch should be rolled back"
+        
+        # A successful run applies everything once, skipping the legacy-named migration
+        run_all_migrations()
+        executed = [m.name for m in get_executed_migrations()]
+        assert "m20260201_unique_event" not in executed, "Legacy-named migration should not run again"
+        assert "initial_schema" in executed
+        assert len(executed) == len(set(executed))
+        assert get_schema_version() == SCHEMA_VERSION
+        
+    finally:
+        try:
+            os.unlink(temp_db.name)
+        except:
+            pass  # Ignore errors during cleanup
+
+def test_schema_version_is_bumped_with_migrations():
+    """Test that SCHEMA_VERSION was bumped for every migration in MIGRATIONS"""
+    from migrations.migration_manager import MIGRATIONS, SCHEMA_VERSION
+    
+    assert SCHEMA_VERSION >= len(MIGRATIONS), "Bump SCHEMA_VERSION when adding a migration"
+
 if __name__ == "__main__":
     try:
         test_migration_framework()
         test_remove_calendar_duplicates_migration()
+        test_migration_runner_batches_pending_migrations()
         print("All migration tests passed!")
     except Exception as e:
         print(f"Migration tests failed: {e}")
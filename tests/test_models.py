@@ -0,0 +1,64 @@
+import unittest
+import tempfile
+import os
+import sqlite3
+from services.database import init_db, set_db_path, create_user, create_calendar, get_calendars
+from services.database import Calendar, Event, model_row_factory, _compile_row_mapper
+
+class TestModels(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+
+    def tearDown(self):
+        # Clean up the temporary database
+        os.unlink(self.temp_db.name)
+
+    def test_models_have_no_instance_dict(self):
+        """Test that models are compact tuples without a per-instance __dict__"""
+        user = create_user("test_user")
+        calendar = create_calendar(user.id, "https://example.com/calendar.ics")
+
+        calendars = get_calendars()
+        self.assertEqual(len(calendars), 1)
+        self.assertIsInstance(calendars[0], Calendar)
+        self.assertFalse(hasattr(calendars[0], '__dict__'))
+        self.assertEqual(calendars[0].id, calendar.id)
+
+    def test_row_factory_uses_defaults_for_missing_columns(self):
+        """Test that the row factory falls back to model defaults for missing columns"""
+        conn = sqlite3.connect(':memory:')
+        cursor = conn.cursor()
+        cursor.row_factory = model_row_factory(Calendar)
+        cursor.execute("SELECT 1 AS id, 2 AS user_id, 'https://example.com' AS url, "
+                       "NULL AS last_sync_at, NULL AS sync_hash")
+        calendar = cursor.fetchone()
+        conn.close()
+
+        self.assertEqual(calendar.id, 1)
+        self.assertEqual(calendar.url, 'https://example.com')
+        self.assertEqual(calendar.timezone, 'GMT+3')
+
+    def test_row_mapper_compiled_once_per_layout(self):
+        """Test that the same column layout reuses one compiled mapper"""
+        columns = ('id', 'user_id', 'url', 'last_sync_at', 'sync_hash', 'timezone', 'created_at')
+        mapper = _compile_row_mapper(Calendar, columns)
+        self.assertIs(mapper, _compile_row_mapper(Calendar, columns))
+
+        calendar = mapper((7, 1, 'https://example.com', None, None, 'UTC', '2024-01-01'))
+        self.assertEqual(calendar, Calendar(7, 1, 'https://example.com', None, None, 'UTC'))
+
+    def test_event_keeps_positional_constructor(self):
+        """Test that Event can still be built positionally with optional trailing fields"""
+        event = Event(1, 2, 'uid', 'Title', '', '', '2024-01-01T10:00:00', '2024-01-01T11:00:00', False, False)
+        self.assertIsNone(event.user_id)
+        self.assertIsNone(event.calendar_timezone)
+        self.assertEqual(event._asdict()['title'], 'Title')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+import json
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from services.database import create_event
+from services.database import set_calendar_reminder_offsets, get_db_connection
+from services.notification_service import wait_for_pending_events
+from services.api_endpoints.pending_events_endpoint import stream_pending_events
+from services import notification_service
+from tests.helpers import DatabaseTestCase
+
+class TestPendingWait(DatabaseTestCase):
+    def create_event_in(self, seconds, uid='event-1'):
+        start = (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat()
+        return create_event(self.calendar.id, uid, 'Soon', '', '', start, start, False)
+
+    def create_event_later(self, delay, uid='event-1'):
+        timer = threading.Timer(delay, self.create_event_in, (600, uid))
+        timer.start()
+        self.addCleanup(timer.join)
+
+    def test_wait_returns_when_an_event_is_created(self):
+        """Test that a long poll is woken by the in-process signal"""
+        self.create_event_later(0.2)
+        
+        started = time.monotonic()
+        with patch.object(notification_service, 'PENDING_WAIT_POLL_SECONDS', 30):
+            events = wait_for_pending_events(timeout=10)
+        self.assertEqual([event.uid for event in events], ['event-1'])
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_wait_times_out_without_requerying(self):
+        """Test that an idle long poll runs the pending query only once"""
+        with patch('services.notification_service.get_pending_events', return_value=[]) as mock_pending:
+            started = time.monotonic()
+            self.assertEqual(wait_for_pending_events(timeout=0.5), [])
+        self.assertGreaterEqual(time.monotonic() - started, 0.5)
+        mock_pending.assert_called_once()
+
+    def test_wait_sees_commits_of_other_processes(self):
+        """Test that writes without the in-process signal are picked up via data_version"""
+        set_calendar_reminder_offsets(self.calendar.id, [])
+        event = self.create_event_in(600)
+        
+        def schedule_reminder():
+            conn = get_db_connection()
+            conn.execute('INSERT INTO reminders (event_id, offset_minutes, fire_at, start_at) VALUES (?, 60, ?, ?)',
+                         (event.id, time.time(), time.time() + 600))
+            conn.commit()
+            conn.close()
+        timer = threading.Timer(0.2, schedule_reminder)
+        timer.start()
+        self.addCleanup(timer.join)
+        
+        with patch.object(notification_service, 'PENDING_WAIT_POLL_SECONDS', 0.05):
+            events = wait_for_pending_events(timeout=10)
+        self.assertEqual([pending.id for pending in events], [event.id])
+
+    def test_wait_wakes_at_the_next_fire_time(self):
+        """Test that a reminder falling due ends the wait without any write"""
+        set_calendar_reminder_offsets(self.calendar.id, [1])
+        event = self.create_event_in(60.5)
+        
+        with patch.object(notification_service, 'PENDING_WAIT_POLL_SECONDS', 30):
+            events = wait_for_pending_events(timeout=10)
+        self.assertEqual([pending.id for pending in events], [event.id])
+
+    def test_stream_sends_each_reminder_once(self):
+        """Test that the stream pushes new events and keeps the connection alive"""
+        event = self.create_event_in(600)
+        stream = stream_pending_events(events=wait_for_pending_events(), heartbeat_seconds=0.2)
+        try:
+            first = next(stream)
+            self.assertTrue(first.startswith('event: pending\n'))
+            self.assertEqual(json.loads(first.split('data: ', 1)[1])['id'], event.id)
+            
+            self.assertEqual(next(stream), ': keepalive\n\n')
+            
+            self.create_event_later(0.1, 'event-2')
+            second = next(stream)
+            self.assertEqual(json.loads(second.split('data: ', 1)[1])['uid'], 'event-2')
+        finally:
+            stream.close()
+
+    def test_pending_endpoints(self):
+        """Test the wait parameter and the stream endpoint"""
+        client = self.make_client()
+        headers = {'X-API-Key': 'test-api-key'}
+        
+        response = client.get('/events/pending?wait=0.2', headers=headers)
+        self.assertEqual(response.get_json(), {'events': []})
+        response = client.get('/events/pending?wait=1&user_id=nobody', headers=headers)
+        self.assertEqual(response.status_code, 404)
+        response = client.get('/events/pending/stream?user_id=nobody', headers=headers)
+        self.assertEqual(response.status_code, 404)
+        
+        event = self.create_event_in(600)
+        response = client.get('/events/pending?wait=30', headers=headers)
+        self.assertEqual([pending['id'] for pending in response.get_json()['events']], [event.id])
+        
+        response = client.get('/events/pending/stream?user_id=test_user', headers=headers, buffered=False)
+        try:
+            self.assertEqual(response.mimetype, 'text/event-stream')
+            chunk = next(response.response)
+            self.assertIn(f'"id": {event.id}'.encode(), chunk)
+        finally:
+            response.close()
+
+if __name__ == '__main__':
+    unittest.main()
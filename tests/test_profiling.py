@@ -0,0 +1,105 @@
+import unittest
+import tempfile
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from flask import Flask
+from flask_smorest import Api
+import services.profiling as profiling
+from services.api_service import initialize_api
+from services.profiling import init_profiling
+from services.database import init_db, set_db_path, create_user, create_calendar, create_event
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        os.environ['ICS_GATE_API_KEY'] = 'test-api-key'
+
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+
+        user = create_user("test_user")
+        calendar = create_calendar(user.id, "https://example.com/calendar.ics")
+        start = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+        create_event(calendar.id, 'event-1', 'Soon', '', '', start, start, False)
+
+        # Set up Flask app for testing
+        self.app = Flask(__name__)
+        self.app.config["TESTING"] = True
+        self.app.config["API_TITLE"] = "ICS Bot API"
+        self.app.config["API_VERSION"] = "v1"
+        self.app.config["OPENAPI_VERSION"] = "3.0.2"
+        initialize_api(Api(self.app))
+        init_profiling(self.app)
+        self.client = self.app.test_client()
+        self.headers = {'X-API-Key': 'test-api-key'}
+
+    def tearDown(self):
+        # Clean up the temporary database and its WAL side files
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+
+    def test_unprofiled_request_has_no_server_timing(self):
+        """Test that profiling is off by default"""
+        response = self.client.get('/events/pending', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response.headers)
+
+    def test_profile_header_returns_breakdown(self):
+        """Test that X-Profile returns DB, query count and serialization timings"""
+        response = self.client.get('/events/pending', headers=dict(self.headers, **{'X-Profile': '1'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()['events']), 1)
+
+        timing = response.headers['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertGreater(int(re.search(r'"(\d+) queries"', timing).group(1)), 0)
+        self.assertIn('convert;dur=', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_profile_header_requires_api_key(self):
+        """Test that the header cannot be used to profile unauthenticated requests"""
+        response = self.client.get('/events/pending', headers={'X-Profile': '1'})
+        self.assertNotIn('Server-Timing', response.headers)
+
+    def test_sampled_requests_keep_slowest_cprofile_dumps(self):
+        """Test config-enabled sampling and retention of the slowest profiles"""
+        with tempfile.TemporaryDirectory() as dump_dir, \
+                patch.object(profiling, 'PROFILING_ENABLED', True), \
+                patch.object(profiling, 'PROFILING_SAMPLE_RATE', 1.0), \
+                patch.object(profiling, 'PROFILING_DUMP_DIR', dump_dir), \
+                patch.object(profiling, 'PROFILING_CPROFILE_SAMPLE_RATE', 1.0), \
+                patch.object(profiling, 'PROFILING_KEEP_SLOWEST', 2), \
+                patch.object(profiling, '_slowest', []):
+            for _ in range(4):
+                response = self.client.get('/events/pending', headers=self.headers)
+                self.assertIn('Server-Timing', response.headers)
+
+            dumps = os.listdir(dump_dir)
+            self.assertEqual(len(dumps), 2)
+            self.assertTrue(all(name.endswith('.prof') for name in dumps))
+
+    def test_one_request_at_a_time_runs_under_cprofile(self):
+        """Test that a request profiled while another one runs under cProfile gets no cProfile dump"""
+        with tempfile.TemporaryDirectory() as dump_dir, \
+                patch.object(profiling, 'PROFILING_DUMP_DIR', dump_dir), \
+                patch.object(profiling, 'PROFILING_CPROFILE_SAMPLE_RATE', 1.0), \
+                patch.object(profiling, '_slowest', []):
+            with profiling._cprofile_lock:
+                response = self.client.get('/events/pending', headers=dict(self.headers, **{'X-Profile': '1'}))
+                self.assertIn('Server-Timing', response.headers)
+                self.assertEqual(os.listdir(dump_dir), [])
+
+            self.client.get('/events/pending', headers=dict(self.headers, **{'X-Profile': '1'}))
+            self.assertEqual(len(os.listdir(dump_dir)), 1)
+            self.assertFalse(profiling._cprofile_lock.locked())
+
+if __name__ == '__main__':
+    unittest.main()
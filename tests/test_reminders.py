@@ -0,0 +1,152 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from services.database import create_event
+from services.database import get_pending_events, mark_event_notified, get_db_connection
+from services.database import set_calendar_reminder_offsets, set_user_reminder_offsets
+from services.calendar_service import sync_calendar
+from services.ics_parser import parse_ics_content
+from tests.helpers import DatabaseTestCase, make_download
+
+def standup(start, alarms=''):
+    return f"UID:standup\nSUMMARY:Standup\nDTSTART:{start}\nDTEND:{start}\n{alarms}"
+
+def valarm(trigger):
+    return f"BEGIN:VALARM\nACTION:DISPLAY\nDESCRIPTION:Reminder\nTRIGGER{trigger}\nEND:VALARM\n"
+
+class TestReminders(DatabaseTestCase):
+    def get_reminders(self, event_id):
+        conn = get_db_connection()
+        try:
+            return conn.execute('''
+                SELECT offset_minutes, delivered_at IS NOT NULL FROM reminders
+                WHERE event_id = ? ORDER BY offset_minutes DESC
+            ''', (event_id,)).fetchall()
+        finally:
+            conn.close()
+
+    def create_event_in(self, minutes):
+        start = (datetime.now(timezone.utc) + timedelta(minutes=minutes)).isoformat()
+        return create_event(self.calendar.id, f'event-{minutes}', 'Soon', '', '', start, start, False)
+
+    def test_default_schedule(self):
+        """Test that events inherit the global NOTIFY_BEFORE_MINUTES offset"""
+        event = self.create_event_in(90)
+        self.assertEqual([tuple(row) for row in self.get_reminders(event.id)], [(1440, 0)])
+        
+        pending, = get_pending_events()
+        self.assertEqual(pending.reminder_minutes, 1440)
+
+    def test_each_offset_is_delivered_once(self):
+        """Test that a calendar schedule fires one reminder per due offset"""
+        set_calendar_reminder_offsets(self.calendar.id, [1440, 60, 10])
+        event = self.create_event_in(90)
+        
+        # The one-day reminder is already due, the others are not
+        pending, = get_pending_events()
+        self.assertEqual(pending.reminder_minutes, 1440)
+        self.assertTrue(mark_event_notified(event.id))
+        self.assertFalse(mark_event_notified(event.id))
+        self.assertEqual(get_pending_events(), [])
+        self.assertEqual([tuple(row) for row in self.get_reminders(event.id)], [(1440, 1), (60, 0), (10, 0)])
+        
+        # Half an hour later the one-hour reminder is due
+        with patch('services.database.time.time', return_value=datetime.now().timestamp() + 1800):
+            pending, = get_pending_events()
+            self.assertEqual(pending.reminder_minutes, 60)
+            self.assertTrue(mark_event_notified(event.id))
+
+    def test_calendar_schedule_overrides_user_schedule(self):
+        """Test the resolution order calendar, user, global default"""
+        event = self.create_event_in(600)
+        
+        set_user_reminder_offsets('test_user', [120, 30])
+        self.assertEqual([row[0] for row in self.get_reminders(event.id)], [120, 30])
+        
+        set_calendar_reminder_offsets(self.calendar.id, [])
+        self.assertEqual(self.get_reminders(event.id), [])
+        
+        set_calendar_reminder_offsets(self.calendar.id, None)
+        set_user_reminder_offsets('test_user', None)
+        self.assertEqual([row[0] for row in self.get_reminders(event.id)], [1440])
+
+    def test_valarm_offsets_are_parsed(self):
+        """Test relative, end-related and absolute VALARM triggers"""
+        start = datetime(2030, 1, 1, 12, 0, tzinfo=timezone.utc)
+        download = make_download(standup(
+            '20300101T120000Z',
+            valarm(':-PT15M') + valarm(';RELATED=END:-PT1H') + valarm(';VALUE=DATE-TIME:20300101T100000Z')
+            + valarm(':PT5M')
+        ))
+        event, = parse_ics_content(download.content)
+        self.assertEqual(event['start'], start.isoformat())
+        self.assertEqual(event['alarms'], [15, 60, 120])
+
+    def test_sync_schedules_valarms_and_reschedules_moved_events(self):
+        """Test that feed alarms add reminders and a moved event is reminded again"""
+        start = (datetime.now(timezone.utc) + timedelta(minutes=30)).strftime('%Y%m%dT%H%M%SZ')
+        with patch('services.calendar_service.download_ics', return_value=make_download(standup(start, valarm(':-PT45M')))):
+            self.assertTrue(sync_calendar(self.calendar))
+        event, = get_pending_events()
+        self.assertEqual([tuple(row) for row in self.get_reminders(event.id)], [(1440, 0), (45, 0)])
+        self.assertTrue(mark_event_notified(event.id))
+        self.assertEqual(get_pending_events(), [])
+        
+        later = (datetime.now(timezone.utc) + timedelta(minutes=90)).strftime('%Y%m%dT%H%M%SZ')
+        with patch('services.calendar_service.download_ics', return_value=make_download(standup(later))):
+            self.assertTrue(sync_calendar(self.calendar._replace(sync_hash='stale')))
+        self.assertEqual([tuple(row) for row in self.get_reminders(event.id)], [(1440, 0)])
+        self.assertEqual([pending.id for pending in get_pending_events()], [event.id])
+
+    def test_reminder_endpoints(self):
+        """Test the calendar and user schedule endpoints"""
+        client = self.make_client()
+        headers = {'X-API-Key': 'test-api-key'}
+        
+        response = client.put(f'/calendars/{self.calendar.id}/reminders', json={'offsets': [10, 1440, 60]},
+                              headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['reminder_offsets'], [1440, 60, 10])
+        
+        response = client.put(f'/calendars/{self.calendar.id}/reminders?user_id=other', json={'offsets': None},
+                              headers=headers)
+        self.assertEqual(response.status_code, 404)
+        response = client.put('/calendars/999/reminders', json={'offsets': None}, headers=headers)
+        self.assertEqual(response.status_code, 404)
+        response = client.put(f'/calendars/{self.calendar.id}/reminders', json={'offsets': [-5]}, headers=headers)
+        self.assertEqual(response.status_code, 422)
+        
+        response = client.put('/users/test_user/reminders', json={'offsets': [30]}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {'user_id': 'test_user', 'reminder_offsets': [30]})
+        response = client.put('/users/nobody/reminders', json={'offsets': [30]}, headers=headers)
+        self.assertEqual(response.status_code, 404)
+        response = client.put('/users/test_user/reminders', json={'offsets': [30]})
+        self.assertEqual(response.status_code, 401)
+
+    def test_migration_keeps_delivered_events_delivered(self):
+        """Test that the migration schedules upcoming events and marks notified ones delivered"""
+        from migrations import m202610191700_reminders as migration
+        delivered = self.create_event_in(30)
+        pending = self.create_event_in(60)
+        
+        # Restore the previous layout, without reminder schedules
+        conn = get_db_connection()
+        conn.executescript('''
+            DROP TABLE reminders;
+            ALTER TABLE users DROP COLUMN reminder_offsets;
+            ALTER TABLE calendars DROP COLUMN reminder_offsets;
+            ALTER TABLE feed_events DROP COLUMN alarm_offsets;
+        ''')
+        conn.execute('UPDATE event_notifications SET notified = 1 WHERE event_id = ?', (delivered.id,))
+        conn.commit()
+        conn.close()
+
+        migration.run()
+
+        self.assertEqual([event.id for event in get_pending_events()], [pending.id])
+        self.assertEqual([tuple(row) for row in self.get_reminders(delivered.id)], [(1440, 1)])
+        self.assertFalse(mark_event_notified(delivered.id))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import tempfile
+import os
+import time
+import sqlite3
+import threading
+from unittest.mock import patch, MagicMock
+import services.background_service as background_service
+from services.database import init_db, set_db_path, try_acquire_lease, release_lease
+
+class TestSchedulerLease(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+
+    def tearDown(self):
+        # Clean up the temporary database
+        os.unlink(self.temp_db.name)
+
+    def test_only_one_holder_at_a_time(self):
+        """Test that a held lease cannot be taken by another holder"""
+        self.assertTrue(try_acquire_lease('scheduler', 'worker-a', 30))
+        self.assertFalse(try_acquire_lease('scheduler', 'worker-b', 30))
+
+        # The holder can renew its own lease
+        self.assertTrue(try_acquire_lease('scheduler', 'worker-a', 30))
+
+    def test_expired_lease_can_be_taken_over(self):
+        """Test that another holder takes over an expired lease"""
+        self.assertTrue(try_acquire_lease('scheduler', 'worker-a', 0.05))
+        time.sleep(0.1)
+        self.assertTrue(try_acquire_lease('scheduler', 'worker-b', 30))
+        self.assertFalse(try_acquire_lease('scheduler', 'worker-a', 30))
+
+    def test_release_lease(self):
+        """Test that a released lease is free for the next holder"""
+        self.assertTrue(try_acquire_lease('scheduler', 'worker-a', 30))
+        release_lease('scheduler', 'worker-a')
+        self.assertTrue(try_acquire_lease('scheduler', 'worker-b', 30))
+
+    def run_leader(self, renewals, seconds, shutdown=None):
+        """Run run_scheduler_as_leader for a while with renewal results taken from renewals"""
+        scheduler = MagicMock()
+        scheduler.shutdown.side_effect = shutdown
+        renewals = iter(renewals)
+        
+        def renew(*args):
+            result = next(renewals, True)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        
+        stop_event = threading.Event()
+        with patch.object(background_service, 'SCHEDULER_LEASE_TTL_SECONDS', 0.3), \
+                patch.object(background_service, 'try_acquire_lease', side_effect=renew) as mock_renew, \
+                patch.object(background_service, 'release_lease') as mock_release, \
+                patch.object(background_service, 'start_background_processes', return_value=scheduler) as mock_start:
+            leader = threading.Thread(target=background_service.run_scheduler_as_leader, args=(stop_event,))
+            leader.start()
+            time.sleep(seconds)
+            stop_event.set()
+            leader.join()
+        return scheduler, mock_start, mock_renew, mock_release
+
+    def test_locked_renewal_keeps_leadership(self):
+        """Test that a renewal failing on a locked database does not stop the jobs"""
+        locked = sqlite3.OperationalError('database is locked')
+        scheduler, mock_start, _, mock_release = self.run_leader([True, locked], 0.45)
+        
+        mock_start.assert_called_once()
+        scheduler.shutdown.assert_called_once_with(wait=True)
+        mock_release.assert_called_once()
+
+    def test_lost_lease_waits_for_jobs(self):
+        """Test that losing the lease stops the jobs after the running ones finish"""
+        scheduler, mock_start, _, mock_release = self.run_leader([True, False, False, False, False], 0.25)
+        
+        mock_start.assert_called_once()
+        scheduler.shutdown.assert_called_once_with(wait=True)
+        mock_release.assert_not_called()
+
+    def test_lease_is_renewed_until_jobs_finish(self):
+        """Test that the lease is kept while running jobs finish on shutdown"""
+        scheduler, _, mock_renew, mock_release = self.run_leader([], 0.05, shutdown=lambda wait: time.sleep(0.35))
+        
+        self.assertGreaterEqual(mock_renew.call_count, 3)
+        mock_release.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import tempfile
+import os
+import sys
+import subprocess
+from unittest.mock import patch
+from services.database import init_db, set_db_path, seed_calendars, get_calendars
+from migrations import migration_manager
+from migrations.migration_manager import SCHEMA_VERSION, get_schema_version, run_all_migrations
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+
+    def tearDown(self):
+        # Clean up the temporary database
+        os.unlink(self.temp_db.name)
+
+    def test_schema_version_fast_path(self):
+        """Test that a current schema skips the migration runner entirely"""
+        self.assertEqual(get_schema_version(), SCHEMA_VERSION)
+
+        with patch.object(migration_manager, 'init_migration_table') as init_migration_table:
+            run_all_migrations()
+        init_migration_table.assert_not_called()
+
+    def test_seed_calendars_is_idempotent(self):
+        """Test that config seeding can run on every start without duplicates"""
+        config_calendars = {
+            'user1': 'https://example.com/calendar1.ics',
+            'user2': 'https://example.com/calendar2.ics',
+        }
+
+        self.assertEqual(seed_calendars(config_calendars), 2)
+        self.assertEqual(seed_calendars(config_calendars), 0)
+        self.assertEqual(len(get_calendars()), 2)
+        self.assertEqual(len(get_calendars('user1')), 1)
+
+    def test_importing_app_has_no_side_effects(self):
+        """Test that importing app.py does not build the Flask app"""
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        result = subprocess.run(
+            [sys.executable, '-c', "import app; print(app._app is None)"],
+            cwd=root, capture_output=True, text=True, timeout=60
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), 'True')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+import tempfile
+import os
+import time
+import threading
+from unittest.mock import patch
+import requests
+from flask import Flask
+from flask_smorest import Api
+import services.database as database
+from services.api_service import initialize_api
+from services.database import init_db, set_db_path, create_user, create_calendar, get_calendars
+from services.database import record_sync_run, get_sync_runs
+from services.calendar_service import sync_calendar, store_calendar_events
+from services.ics_parser import IcsDownload
+
+ICS_TEMPLATE = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:event-1
+SUMMARY:{title}
+DTSTART:20300101T100000Z
+DTEND:20300101T110000Z
+END:VEVENT
+END:VCALENDAR
+"""
+
+def make_download(title):
+    content = ICS_TEMPLATE.format(title=title)
+    return IcsDownload(content, 200, len(content.encode()))
+
+class TestSyncHistory(unittest.TestCase):
+    def setUp(self):
+        os.environ['ICS_GATE_API_KEY'] = 'test-api-key'
+
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+
+        user = create_user("test_user")
+        self.calendar = create_calendar(user.id, "https://example.com/calendar.ics")
+
+    def tearDown(self):
+        # Clean up the temporary database and its WAL side files
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+
+    def test_store_events_counts_real_changes(self):
+        """Test that unchanged events are not counted or rewritten as updates"""
+        event = {'uid': 'a', 'summary': 'A', 'description': '', 'location': '',
+                 'start': '2030-01-01T10:00:00+00:00', 'end': '2030-01-01T11:00:00+00:00', 'all_day': False}
+
+        self.assertEqual(tuple(store_calendar_events(self.calendar.id, [event])), (1, 0, 0))
+        self.assertEqual(tuple(store_calendar_events(self.calendar.id, [event])), (0, 0, 0))
+        self.assertEqual(tuple(store_calendar_events(self.calendar.id, [dict(event, summary='B')])), (0, 1, 0))
+        self.assertEqual(tuple(store_calendar_events(self.calendar.id, [])), (0, 0, 1))
+
+    def test_sync_runs_are_recorded(self):
+        """Test that successful, unchanged and failed syncs are recorded"""
+        with patch('services.calendar_service.download_ics', return_value=make_download('First')):
+            self.assertTrue(sync_calendar(self.calendar))
+            self.assertTrue(sync_calendar(get_calendars()[0]))
+
+        error = requests.HTTPError('404 Client Error')
+        error.response = type('Response', (), {'status_code': 404})()
+        with patch('services.calendar_service.download_ics', side_effect=error):
+            self.assertFalse(sync_calendar(self.calendar))
+
+        failed, unchanged, first = get_sync_runs(self.calendar.id)
+        self.assertEqual((first.seq, first.inserted, first.http_status, first.skipped), (1, 1, 200, 0))
+        self.assertEqual(first.bytes, make_download('First').size)
+        self.assertTrue(unchanged.skipped)
+        self.assertEqual(failed.http_status, 404)
+        self.assertIn('404', failed.error)
+
+    def test_ring_buffer_keeps_last_runs(self):
+        """Test that only the most recent SYNC_RUNS_RETENTION runs are kept"""
+        with patch.object(database, 'SYNC_RUNS_RETENTION', 3):
+            for index in range(7):
+                record_sync_run(self.calendar.id, f'2030-01-01T10:00:0{index}', float(index))
+
+        runs = get_sync_runs(self.calendar.id)
+        self.assertEqual([run.seq for run in runs], [7, 6, 5])
+
+        conn = database.get_db_connection()
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM sync_runs').fetchone()[0], 3)
+        conn.close()
+
+    def test_concurrent_recorders_get_distinct_seqs(self):
+        """Test that recorders waiting on the same write lock do not reuse a sequence number"""
+        blocker = database.get_db_connection()
+        blocker.execute('BEGIN IMMEDIATE')
+        recorders = [threading.Thread(target=record_sync_run, args=(self.calendar.id, started_at, 1.0))
+                     for started_at in ('2030-01-01T10:00:00', '2030-01-01T10:00:01')]
+        for recorder in recorders:
+            recorder.start()
+        # Both recorders reach the write while the lock is held
+        time.sleep(0.3)
+        blocker.commit()
+        blocker.close()
+        for recorder in recorders:
+            recorder.join()
+
+        runs = get_sync_runs(self.calendar.id)
+        self.assertEqual([run.seq for run in runs], [2, 1])
+        self.assertEqual({run.started_at for run in runs}, {'2030-01-01T10:00:00', '2030-01-01T10:00:01'})
+
+    def test_syncs_endpoint(self):
+        """Test the per-calendar sync history endpoint"""
+        app = Flask(__name__)
+        app.config["TESTING"] = True
+        app.config["API_TITLE"] = "ICS Bot API"
+        app.config["API_VERSION"] = "v1"
+        app.config["OPENAPI_VERSION"] = "3.0.2"
+        initialize_api(Api(app))
+        client = app.test_client()
+        headers = {'X-API-Key': 'test-api-key'}
+
+        with patch('services.calendar_service.download_ics', return_value=make_download('First')):
+            sync_calendar(self.calendar)
+
+        response = client.get(f'/calendars/{self.calendar.id}/syncs', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data['stats']['runs'], 1)
+        self.assertEqual(data['stats']['events']['inserted'], 1)
+        self.assertEqual(len(data['runs']), 1)
+        self.assertIs(data['runs'][0]['skipped'], False)
+
+        self.assertEqual(client.get('/calendars/9999/syncs', headers=headers).status_code, 404)
+        self.assertEqual(client.get(f'/calendars/{self.calendar.id}/syncs').status_code, 401)
+
+if __name__ == '__main__':
+    unittest.main()
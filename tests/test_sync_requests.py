@@ -0,0 +1,175 @@
+import unittest
+import tempfile
+import os
+import threading
+import time
+from unittest.mock import patch
+from flask import Flask
+from flask_smorest import Api
+import services.database as database
+import services.calendar_service as calendar_service
+from services.api_service import initialize_api
+from services.database import init_db, set_db_path, create_user, create_calendar
+from services.database import request_calendar_sync, claim_sync_requests, complete_sync_request, get_sync_request
+from services.calendar_service import sync_calendar_coalesced, process_sync_requests
+from services.ics_parser import IcsDownload
+
+ICS_CONTENT = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:event-1
+SUMMARY:Test Event
+DTSTART:20300101T100000Z
+DTEND:20300101T110000Z
+END:VEVENT
+END:VCALENDAR
+"""
+DOWNLOAD = IcsDownload(ICS_CONTENT, 200, len(ICS_CONTENT.encode()))
+
+class TestSyncRequests(unittest.TestCase):
+    def setUp(self):
+        os.environ['ICS_GATE_API_KEY'] = 'test-api-key'
+
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+
+        user = create_user("test_user")
+        self.calendar = create_calendar(user.id, "https://example.com/calendar.ics")
+
+    def tearDown(self):
+        # Clean up the temporary database and its WAL side files
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+
+    def make_client(self):
+        app = Flask(__name__)
+        app.config["TESTING"] = True
+        app.config["API_TITLE"] = "ICS Bot API"
+        app.config["API_VERSION"] = "v1"
+        app.config["OPENAPI_VERSION"] = "3.0.2"
+        initialize_api(Api(app))
+        return app.test_client()
+
+    def test_triggers_coalesce_until_finished(self):
+        """Test that triggers join the pending or running request"""
+        first, coalesced = request_calendar_sync(self.calendar.id)
+        self.assertFalse(coalesced)
+        self.assertEqual((first.generation, first.status), (1, 'pending'))
+
+        second, coalesced = request_calendar_sync(self.calendar.id)
+        self.assertTrue(coalesced)
+        self.assertEqual(second.generation, 1)
+
+        self.assertEqual(len(claim_sync_requests()), 1)
+        self.assertTrue(request_calendar_sync(self.calendar.id)[1])
+        self.assertEqual(claim_sync_requests(), [])
+
+        complete_sync_request(self.calendar.id, 1, True)
+        third, coalesced = request_calendar_sync(self.calendar.id)
+        self.assertFalse(coalesced)
+        self.assertEqual((third.generation, third.status), (2, 'pending'))
+
+    def test_stale_running_request_is_replaced(self):
+        """Test that a request orphaned in running state does not block new triggers"""
+        request_calendar_sync(self.calendar.id)
+        claim_sync_requests()
+
+        with patch.object(database, 'SYNC_REQUEST_STALE_SECONDS', -1):
+            request, coalesced = request_calendar_sync(self.calendar.id)
+        self.assertFalse(coalesced)
+        self.assertEqual(request.generation, 2)
+
+    def test_concurrent_syncs_share_one_fetch(self):
+        """Test that concurrent syncs of one calendar in a process run a single fetch"""
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_sync(calendars):
+            calls.extend(calendar.id for calendar in calendars)
+            started.set()
+            release.wait(5)
+            return {calendar.id: calendar_service.SyncResult(True, 7) for calendar in calendars}
+
+        results = []
+        with patch.object(calendar_service, 'sync_feed', slow_sync):
+            threads = [threading.Thread(target=lambda: results.append(sync_calendar_coalesced(self.calendar)))
+                       for _ in range(3)]
+            threads[0].start()
+            started.wait(5)
+            for thread in threads[1:]:
+                thread.start()
+            time.sleep(0.1)
+            release.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(calls, [self.calendar.id])
+        self.assertEqual(results, [calendar_service.SyncResult(True, 7)] * 3)
+
+    def test_process_sync_requests_records_result(self):
+        """Test that the background job runs pending requests and links the sync run"""
+        request_calendar_sync(self.calendar.id)
+
+        with patch('services.calendar_service.download_ics', return_value=DOWNLOAD):
+            self.assertEqual(process_sync_requests(), 1)
+
+        request = get_sync_request(self.calendar.id)
+        self.assertEqual(request.status, 'done')
+        self.assertEqual(request.run_seq, 1)
+        self.assertEqual(process_sync_requests(), 0)
+
+    def test_sync_request_links_its_own_run(self):
+        """Test that a run recorded by another sync right after the request's run is not linked"""
+        def record_then_race(calendar_id, *args, **kwargs):
+            seq = database.record_sync_run(calendar_id, *args, **kwargs)
+            database.record_sync_run(calendar_id, 'concurrent', 1.0, skipped=True)
+            return seq
+
+        request_calendar_sync(self.calendar.id)
+        with patch('services.calendar_service.download_ics', return_value=DOWNLOAD), \
+                patch.object(calendar_service, 'record_sync_run', record_then_race):
+            self.assertEqual(process_sync_requests(), 1)
+
+        self.assertEqual(get_sync_request(self.calendar.id).run_seq, 1)
+
+    def test_sync_endpoint_wait_and_poll(self):
+        """Test triggering, polling and waiting through the API"""
+        client = self.make_client()
+        headers = {'X-API-Key': 'test-api-key'}
+        url = f'/calendars/{self.calendar.id}/sync'
+
+        self.assertEqual(client.get(url, headers=headers).status_code, 404)
+
+        response = client.post(url, headers=headers)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.get_json()['sync']['status'], 'pending')
+        self.assertEqual(client.get(url, headers=headers).get_json()['sync']['status'], 'pending')
+
+        # A worker picks the request up while the caller waits
+        def worker():
+            time.sleep(0.3)
+            with patch('services.calendar_service.download_ics', return_value=DOWNLOAD):
+                process_sync_requests()
+        thread = threading.Thread(target=worker)
+        thread.start()
+        response = client.post(url + '?wait=10', headers=headers)
+        thread.join()
+
+        self.assertEqual(response.status_code, 200)
+        sync = response.get_json()['sync']
+        self.assertTrue(sync['coalesced'])
+        self.assertEqual(sync['status'], 'done')
+        self.assertEqual(sync['run']['inserted'], 1)
+
+        self.assertEqual(client.post('/calendars/9999/sync', headers=headers).status_code, 404)
+        self.assertEqual(client.post(url).status_code, 401)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -48,7 +48,7 @@ def test_user_filtering_direct():
     for event in all_events:
         print(f"  - {event.title}")
         # Print all attributes of the event
-        print(f"    Attributes: {vars(event)}")
+        print(f"    Attributes: {event._asdict()}")
     
     # Test getting pending events for user1
     user1_events = get_pending_events('user1')
@@ -56,7 +56,7 @@ def test_user_filtering_direct():
     for event in user1_events:
         print(f"  - {event.title}")
         # Print all attributes of the event
-        print(f"    Attributes: {vars(event)}")
+        print(f"    Attributes: {event._asdict()}")
     
     # Test getting pending events for user2
     user2_events = get_pending_events('user2')
@@ -64,7 +64,7 @@ def test_user_filtering_direct():
     for event in user2_events:
         print(f"  - {event.title}")
         # Print all attributes of the event
-        print(f"    Attributes: {vars(event)}")
+        print(f"    Attributes: {event._asdict()}")
     
     # Test getting pending events for nonexistent user
     try:
@@ -83,7 +83,7 @@ def test_user_filtering_direct():
     # Check that user_id is included in the events
     if api_user1_events:
         event = api_user1_events[0]
-        print(f"API event attributes: {vars(event)}")
+        print(f"API event attributes: {event._asdict()}")
         if hasattr(event, 'user_id'):
             print(f"Event includes user_id: {event.user_id}")
         else:
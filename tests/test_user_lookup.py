@@ -0,0 +1,85 @@
+import unittest
+import tempfile
+import os
+import sqlite3
+from unittest.mock import patch
+import services.database as database
+from services.database import init_db, set_db_path, create_user, create_calendar, get_calendars, get_pending_events
+from services.database import delete_calendar
+
+class TestUserLookup(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+
+        self.user = create_user("test_user")
+        self.calendar = create_calendar(self.user.id, "https://example.com/calendar.ics")
+
+    def tearDown(self):
+        # Clean up the temporary database
+        os.unlink(self.temp_db.name)
+
+    def trace_queries(self, func, *args):
+        """Run func and return the SQL statements it executed"""
+        statements = []
+
+        def traced(get_connection):
+            def traced_connection():
+                conn = get_connection()
+                conn.set_trace_callback(statements.append)
+                return conn
+            return traced_connection
+
+        with patch.object(database, 'get_db_connection', traced(database.get_db_connection)), \
+                patch.object(database, 'get_read_connection', traced(database.get_read_connection)):
+            func(*args)
+        return statements
+
+    def count_queries(self, func, *args):
+        """Run func and return the number of SQL statements it executed"""
+        return len(self.trace_queries(func, *args))
+
+    def test_user_scoped_listing_costs_one_query(self):
+        """Test that a user-scoped listing filters by user_id in a single statement"""
+        self.assertEqual(self.count_queries(get_calendars, "test_user"), 1)
+        self.assertEqual(self.count_queries(get_pending_events, "test_user"), 2)
+
+    def test_user_scoped_delete_looks_up_user_in_statement(self):
+        """Test that an owned delete resolves the user inside the DELETE, and only a miss checks the user"""
+        other = create_user("other_user")
+        self.assertFalse(delete_calendar(self.calendar.id, "other_user"))
+        
+        statements = self.trace_queries(delete_calendar, self.calendar.id, "test_user")
+        self.assertEqual(len([sql for sql in statements if 'FROM users' in sql]), 1)
+        self.assertEqual(get_calendars("test_user"), [])
+        self.assertEqual(get_calendars(other.user_id), [])
+
+    def test_unknown_user_raises(self):
+        """Test that an empty result for an unknown user still raises"""
+        with self.assertRaises(ValueError):
+            get_calendars("unknown_user")
+        with self.assertRaises(ValueError):
+            get_pending_events("unknown_user")
+        with self.assertRaises(ValueError):
+            delete_calendar(self.calendar.id, "unknown_user")
+
+    def test_sees_users_changed_by_another_process(self):
+        """Test that a user recreated through another connection is resolved to its new id"""
+        get_calendars("test_user")
+        conn = sqlite3.connect(self.temp_db.name)
+        conn.execute("DELETE FROM users")
+        conn.execute("INSERT INTO users (id, user_id) VALUES (999, 'test_user')")
+        conn.execute("UPDATE calendars SET user_id = 999")
+        conn.commit()
+        conn.close()
+
+        calendars = get_calendars("test_user")
+        self.assertEqual([calendar.user_id for calendar in calendars], [999])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import tempfile
+import os
+import sqlite3
+import time
+import services.database as database
+from services.database import init_db, set_db_path, create_user, create_calendar, get_calendars
+from services.database import get_read_connection, retry_on_locked
+
+class TestWalReads(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary database for testing
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        set_db_path(self.temp_db.name)
+
+        # Initialize the database
+        init_db()
+
+        user = create_user("test_user")
+        create_calendar(user.id, "https://example.com/calendar.ics")
+
+    def tearDown(self):
+        # Clean up the temporary database and its WAL side files
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.temp_db.name + suffix):
+                os.unlink(self.temp_db.name + suffix)
+
+    def test_database_uses_wal(self):
+        """Test that init_db switches the database to WAL mode"""
+        conn = sqlite3.connect(self.temp_db.name)
+        mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+        conn.close()
+        self.assertEqual(mode.lower(), 'wal')
+
+    def test_reads_not_blocked_by_open_write_transaction(self):
+        """Test that API reads see the last committed snapshot during a write"""
+        writer = sqlite3.connect(self.temp_db.name)
+        writer.execute('BEGIN IMMEDIATE')
+        writer.execute("INSERT INTO users (user_id) VALUES ('pending_user')")
+
+        try:
+            started = time.monotonic()
+            calendars = get_calendars()
+            self.assertLess(time.monotonic() - started, 1.0)
+            self.assertEqual(len(calendars), 1)
+        finally:
+            writer.rollback()
+            writer.close()
+
+    def test_read_connection_is_read_only(self):
+        """Test that the read path cannot write"""
+        conn = get_read_connection()
+        try:
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("INSERT INTO users (user_id) VALUES ('x')")
+        finally:
+            conn.close()
+
+    def test_retry_on_locked(self):
+        """Test that writers retry a bounded number of times on lock errors"""
+        calls = []
+
+        @retry_on_locked
+        def flaky_write():
+            calls.append(1)
+            if len(calls) < 2:
+                raise sqlite3.OperationalError('database is locked')
+            return 'ok'
+
+        original_delay = database.DB_WRITE_RETRY_DELAY
+        database.DB_WRITE_RETRY_DELAY = 0
+        try:
+            self.assertEqual(flaky_write(), 'ok')
+            self.assertEqual(len(calls), 2)
+        finally:
+            database.DB_WRITE_RETRY_DELAY = original_delay
+
+if __name__ == '__main__':
+    unittest.main()
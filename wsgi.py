@@ -0,0 +1,12 @@
+"""
+WSGI entry point for production serving of ICS-Gate.
+
+Run with a multi-worker WSGI server, for example:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Workers only serve the API. The gunicorn master prepares the database once
+and the background jobs run in the dedicated scheduler process (scheduler.py).
+"""
+
+from app import app